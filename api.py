@@ -0,0 +1,206 @@
+"""
+Headless HTTP API for the sales assistant, streaming replies as Server-Sent Events.
+
+Every request is independent: the conversation lives in the checkpointer and profiles
+are read from SQLite on every request (no per-process profile cache or write-behind
+queue), so any number of worker processes can serve the same sessions.
+
+    uvicorn api:app --workers 4
+"""
+
+import json
+import os
+import uuid
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from langchain_core.messages import AIMessageChunk, BaseMessage, ToolMessage
+from pydantic import BaseModel
+
+from src import instrumentation
+from src.async_database import acreate_or_update_user
+from src.database import create_database, disable_profile_cache
+
+GREETING = "Como eu posso ajudar?"
+
+
+class NewSession(BaseModel):
+    user_id: str
+
+
+class UserMessage(BaseModel):
+    content: str
+    language: str = "Portuguese"
+
+
+class Denial(BaseModel):
+    reason: str
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    create_database()
+    # Another worker may write a profile at any time; a cached or queued copy here
+    # would be stale for that worker until it expires or is committed.
+    disable_profile_cache()
+    if os.environ.get("OPENAI_API_KEY"):
+        # Build the graph before serving so the first request does not pay for it.
+        get_graph()
+    yield
+
+
+app = FastAPI(title="Assistente de Vendas", lifespan=lifespan)
+
+
+def get_graph():
+    # Imported on first use; the graph is built once per process.
+    from src.agent import get_graph
+
+    return get_graph()
+
+
+def session_config(session_id: str) -> dict:
+    """Config of a session; its id is "session_<user id>_<random token>"."""
+    prefix, _, rest = session_id.partition("_")
+    user_id, _, token = rest.rpartition("_")
+    if prefix != "session" or not user_id or not token:
+        raise HTTPException(status_code=404, detail="Unknown session.")
+    return {"configurable": {"thread_id": session_id, "user_id": user_id}}
+
+
+def message_to_dict(message: BaseMessage) -> dict:
+    return {
+        "id": message.id,
+        "type": message.type,
+        "content": message.content,
+        "tool_calls": getattr(message, "tool_calls", []),
+    }
+
+
+def sse(event: str, data: dict) -> str:
+    return (
+        f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+    )
+
+
+async def stream_events(input: Optional[dict], config: dict) -> AsyncIterator[str]:
+    """
+    Run the graph and stream what happens as SSE events.
+
+    "token" carries a piece of a reply that is still being generated, "message" each
+    message a node added, "interrupt" the nodes waiting for approval and "done" ends
+    the stream.
+    """
+    from src.agent import STREAMED_NODES
+
+    graph = get_graph()
+    try:
+        async for mode, event in graph.astream(
+            input, config, stream_mode=["messages", "updates"]
+        ):
+            if mode == "messages":
+                chunk, metadata = event
+                node = metadata.get("langgraph_node")
+                if (
+                    node in STREAMED_NODES
+                    and isinstance(chunk, AIMessageChunk)
+                    and isinstance(chunk.content, str)
+                    and chunk.content
+                ):
+                    yield sse(
+                        "token",
+                        {"node": node, "id": chunk.id, "content": chunk.content},
+                    )
+                continue
+            for node, update in event.items():
+                if not isinstance(update, dict) or not update.get("messages"):
+                    continue
+                new_messages = update["messages"]
+                if not isinstance(new_messages, list):
+                    new_messages = [new_messages]
+                for message in new_messages:
+                    yield sse("message", {"node": node, **message_to_dict(message)})
+        snapshot = await graph.aget_state(config)
+        if snapshot.next:
+            yield sse("interrupt", {"next": list(snapshot.next)})
+    except Exception as e:
+        yield sse("error", {"detail": str(e)})
+    yield sse("done", {})
+
+
+def event_stream(input: Optional[dict], config: dict) -> StreamingResponse:
+    return StreamingResponse(
+        stream_events(input, config), media_type="text/event-stream"
+    )
+
+
+async def pending_tool_call(config: dict) -> Optional[dict]:
+    """The tool call waiting for approval, or None if the session is not interrupted."""
+    snapshot = await get_graph().aget_state(config)
+    if not snapshot.next:
+        return None
+    return snapshot.values["messages"][-1].tool_calls[0]
+
+
+@app.post("/sessions")
+async def start_session(body: NewSession) -> dict:
+    await acreate_or_update_user(body.user_id)
+    session_id = f"session_{body.user_id}_{uuid.uuid4().hex[:12]}"
+    return {"session_id": session_id, "user_id": body.user_id, "message": GREETING}
+
+
+@app.get("/sessions/{session_id}")
+async def get_session(session_id: str) -> dict:
+    config = session_config(session_id)
+    snapshot = await get_graph().aget_state(config)
+    values = snapshot.values or {}
+    return {
+        "session_id": session_id,
+        "user_info": values.get("user_info") or {},
+        "messages": [message_to_dict(m) for m in values.get("messages", [])],
+        "next": list(snapshot.next),
+    }
+
+
+@app.post("/sessions/{session_id}/messages")
+async def send_message(session_id: str, body: UserMessage) -> StreamingResponse:
+    config = session_config(session_id)
+    if await pending_tool_call(config) is not None:
+        raise HTTPException(
+            status_code=409, detail="Approve or deny the pending action first."
+        )
+    input = {
+        "user_message": body.content,
+        "messages": [("user", body.content)],
+        "language": body.language,
+    }
+    return event_stream(input, config)
+
+
+@app.post("/sessions/{session_id}/approve")
+async def approve(session_id: str) -> StreamingResponse:
+    config = session_config(session_id)
+    if await pending_tool_call(config) is None:
+        raise HTTPException(status_code=409, detail="Nothing to approve.")
+    return event_stream(None, config)
+
+
+@app.post("/sessions/{session_id}/deny")
+async def deny(session_id: str, body: Denial) -> StreamingResponse:
+    config = session_config(session_id)
+    if (tool_call := await pending_tool_call(config)) is None:
+        raise HTTPException(status_code=409, detail="Nothing to deny.")
+    denial = ToolMessage(
+        tool_call_id=tool_call["id"],
+        content=f"API call denied by user. Reasoning: '{body.reason}'. Continue assisting, "
+        f"accounting for the user's input.",
+    )
+    return event_stream({"messages": [denial]}, config)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> str:
+    """Timers and counters in the Prometheus format (needs INSTRUMENTATION=prometheus)."""
+    return instrumentation.render_prometheus()
@@ -1,27 +1,99 @@
 import os
-from collections import defaultdict
+import threading
+import time
+from typing import Optional
 
 import streamlit as st
 from langchain_core.messages import ToolMessage, AIMessage
-from openai import OpenAI
 
+from src.chat_log import CHAT_PAGE, CHAT_TAIL, ChatLog
+from src.connection import ConnectionManager
 from src.database import (
     create_database,
-    get_user_by_id,
+    get_profile,
     create_or_update_user,
     delete_user_by_id,
+    enable_write_behind,
+    user_version,
+    filename as database_filename,
+    PROFILE_LABELS,
 )
+from src.persona import languages
+
+# The sidebar fragment reruns every MIN seconds but only re-reads the profile when its
+# version moves; a safety read (for writers in other processes) backs off up to MAX.
+USER_INFO_MIN_REFRESH = 5.0
+USER_INFO_MAX_REFRESH = 120.0
 
 if "run_database" not in st.session_state:
     st.session_state["run_database"] = True
 
 if st.session_state["run_database"]:
     create_database()
+    if interval := os.environ.get("WRITE_BEHIND_INTERVAL"):
+        enable_write_behind(interval=float(interval))
     st.session_state["run_database"] = False
 if "start" not in st.session_state:
     st.session_state["start"] = True
 
 
+@st.cache_resource(show_spinner="Loading the assistant...")
+def load_graph(api_key: str):
+    """The compiled graph, built once per process and shared by every session."""
+    from src.agent import get_graph
+
+    return get_graph(api_key)
+
+
+@st.cache_resource(show_spinner=False)
+def warm_up(api_key: str) -> threading.Thread:
+    """Import the agent and build its graph in the background, before the first message."""
+
+    def build() -> None:
+        from src.agent import get_graph
+
+        get_graph(api_key)
+
+    thread = threading.Thread(target=build, daemon=True)
+    thread.start()
+    return thread
+
+
+@st.cache_resource(show_spinner=False)
+def prewarm(api_key: str) -> threading.Thread:
+    """Fill the per-language response cache off the request path, once per process."""
+    from src.agent import get_llm, prewarm_responses
+    from src.llm_scheduler import BACKGROUND
+
+    # Queued behind the clients' turns.
+    llm = get_llm(api_key).with_priority(BACKGROUND)
+    thread = threading.Thread(target=prewarm_responses, args=(llm,), daemon=True)
+    thread.start()
+    return thread
+
+
+@st.cache_resource(show_spinner=False)
+def chat_db() -> ConnectionManager:
+    """Chat transcripts are kept next to the clients database."""
+    return ConnectionManager(
+        os.path.join(os.path.dirname(database_filename), "chat.db")
+    )
+
+
+def chat_log(user_id: str) -> ChatLog:
+    """The transcript of the user's conversation, with the greeting on a new one."""
+    logs = st.session_state.setdefault("messages", {})
+    if user_id not in logs:
+        logs[user_id] = ChatLog(chat_db(), "session_" + user_id)
+        if not len(logs[user_id]):
+            logs[user_id].append("assistant", "Como eu posso ajudar?")
+    return logs[user_id]
+
+
+def load_earlier_messages() -> None:
+    st.session_state["chat_pages"] = st.session_state.get("chat_pages", 0) + 1
+
+
 def start_or_stop_conversation() -> None:
     state = st.session_state["start"]
     if state:
@@ -32,12 +104,133 @@ def start_or_stop_conversation() -> None:
         st.session_state["start"] = True
 
 
-@st.fragment(run_every="5s")
+@st.fragment(run_every=USER_INFO_MIN_REFRESH)
 def user_info_fragment():
+    user_id = st.session_state["user_id"]
+    view = st.session_state.get("user_info_view")
+    version = user_version(id=user_id)
+    now = time.monotonic()
+
+    if view is None or view["user_id"] != user_id or view["version"] != version:
+        view = {"user_id": user_id, "interval": USER_INFO_MIN_REFRESH, "row": ()}
+    elif now >= view["refresh_at"]:
+        # No change in this process: check for other writers half as often from now on.
+        view["interval"] = min(view["interval"] * 2, USER_INFO_MAX_REFRESH)
+    else:
+        view = None
+
+    if view is not None:
+        # pandas is only needed to draw the table, keep it off the import path.
+        import pandas as pd
+
+        # Past the profile cache, which only sees this process's writes.
+        profile = get_profile(id=user_id, cached=False)
+        row = tuple(profile) if profile else None
+        if row != view["row"]:
+            # Changed, maybe by another process: watch it closely again.
+            view["interval"] = USER_INFO_MIN_REFRESH
+            view["row"] = row
+            view["df"] = pd.DataFrame(
+                [profile.to_record()] if profile else [], columns=PROFILE_LABELS
+            )
+        view["version"] = version
+        view["refresh_at"] = now + view["interval"]
+        st.session_state["user_info_view"] = view
+
     with st.status("Loading User Info...", expanded=True):
-        user_id = st.session_state["user_id"]
-        df = get_user_by_id(id=user_id)
-        st.dataframe(df, key="user_info")
+        # Fragment reruns must re-emit their elements; this reuses the cached frame.
+        st.dataframe(st.session_state["user_info_view"]["df"], key="user_info")
+
+
+def show_graph_message(
+    message, user_id: str, debug: bool, streamed: bool = False
+) -> None:
+    if isinstance(message, ToolMessage):
+        msg = message.content
+        if debug:
+            chat_log(user_id).append("assistant", msg)
+            st.chat_message("", avatar="🧰").write(msg)
+
+    elif isinstance(message, AIMessage):
+        if message.tool_calls:
+            for tool in message.tool_calls:
+                name = tool["name"]
+                args = tool["args"]
+                if debug:
+                    msg = f"Chamando a função {name} com os argumentos {args}"
+                    chat_log(user_id).append("assistant", msg)
+                    st.chat_message("", avatar="🧰").write(msg)
+        else:
+            msg = message.content
+            chat_log(user_id).append("assistant", msg)
+            if not streamed:
+                st.chat_message("assistant").write(msg)
+
+
+def show_graph_stream(events, user_id: str, debug: bool) -> Optional[float]:
+    """
+    Render the events of graph.stream(stream_mode=["messages", "updates", "values"]).
+
+    Replies of the nodes in STREAMED_NODES are written token by token; everything
+    else is written when its node finishes. Returns the time to the first token.
+    """
+    started = time.perf_counter()
+    events = iter(events)
+    deferred = []
+    streamed = set()
+    first_token = None
+
+    def show_update(event):
+        for update in event.values():
+            if isinstance(update, dict) and update.get("messages"):
+                new_messages = update["messages"]
+                if not isinstance(new_messages, list):
+                    new_messages = [new_messages]
+                for message in new_messages:
+                    show_graph_message(message, user_id, debug, message.id in streamed)
+
+    def tokens(chunk, node, above):
+        yield chunk.content
+        for mode, event in events:
+            if mode == "messages":
+                message, metadata = event
+                if message.id == chunk.id:
+                    if isinstance(message.content, str):
+                        yield message.content
+                elif metadata.get("langgraph_node") in STREAMED_NODES:
+                    deferred.append((mode, event))
+            elif mode == "updates" and node in event:
+                # The node is done, so is its reply.
+                deferred.append((mode, event))
+                return
+            elif mode == "updates":
+                # Nodes running alongside, e.g. the interim message, go above the reply.
+                with above:
+                    show_update(event)
+            else:
+                st.session_state["event"] = event
+
+    while (item := deferred.pop(0) if deferred else next(events, None)) is not None:
+        mode, event = item
+        if mode == "values":
+            st.session_state["event"] = event
+        elif mode == "updates":
+            show_update(event)
+        else:
+            chunk, metadata = event
+            node = metadata.get("langgraph_node")
+            if (
+                node in STREAMED_NODES
+                and chunk.id not in streamed
+                and isinstance(chunk.content, str)
+                and chunk.content
+            ):
+                if first_token is None:
+                    first_token = time.perf_counter() - started
+                streamed.add(chunk.id)
+                above = st.container()
+                st.chat_message("assistant").write_stream(tokens(chunk, node, above))
+    return first_token
 
 
 with st.sidebar:
@@ -63,16 +256,6 @@ with st.sidebar:
         disabled=st.session_state["start"],
         key="user_id",
     )
-    languages = [
-        "Portuguese",
-        "English",
-        "Spanish",
-        "French",
-        "German",
-        "Chinese",
-        "Japanese",
-        "Korean",
-    ]
     selected_language = st.selectbox(
         label="Choose your preferred language:",
         options=languages,
@@ -96,12 +279,8 @@ with st.sidebar:
     if st.session_state["start"]:
         user_info_fragment()
 
-if "messages" not in st.session_state:
-    user_id = st.session_state["user_id"]
-    st.session_state["messages"] = defaultdict(list)
-    st.session_state["messages"][user_id] = [
-        {"role": "assistant", "content": "Como eu posso ajudar?"}
-    ]
+if openai_api_key:
+    warm_up(openai_api_key)
 
 if "sensitive_check" not in st.session_state:
     st.session_state["sensitive_check"] = False
@@ -117,7 +296,15 @@ if not st.session_state["start"]:
 st.title("💬 Assistente de Vendas!")
 
 user_id = st.session_state["user_id"]
-for message in st.session_state["messages"][user_id]:
+# Only the latest messages are drawn on a rerun; earlier ones a page at a time.
+shown = CHAT_TAIL + st.session_state.get("chat_pages", 0) * CHAT_PAGE
+if len(chat_log(user_id)) > shown:
+    st.button(
+        "Carregar mensagens anteriores",
+        key="load_earlier",
+        on_click=load_earlier_messages,
+    )
+for message in chat_log(user_id).latest(shown):
     st.chat_message(message["role"]).write(message["content"])
 
 if prompt := st.chat_input(placeholder="Converse com o vendedor automático..."):
@@ -125,23 +312,28 @@ if prompt := st.chat_input(placeholder="Converse com o vendedor automático...")
         st.info("Por favor, adicione sua chave da OpenAI para continuar.")
         st.stop()
     else:
-        os.environ["OPENAI_API_KEY"] = openai_api_key
-        from src.agent import graph
+        from src.agent import STREAMED_NODES
+
+        graph = load_graph(openai_api_key)
+        prewarm(openai_api_key)
 
         config = {
             "configurable": {
                 "thread_id": "session_" + user_id,
                 "user_id": user_id,
+                # Returning clients confirm their saved profile once before the
+                # recommendation.
+                "confirm_profile": True,
             },
         }
         snapshot = graph.get_state(config)
 
         if not snapshot.next or st.session_state["sensitive_check"]:
-            client = OpenAI(api_key=openai_api_key)
-            st.session_state["messages"][user_id].append(
-                {"role": "user", "content": prompt}
-            )
+            st.session_state["chat_pages"] = 0
+            chat_log(user_id).append("user", prompt)
             st.chat_message("user").write(prompt)
+            # "messages" yields model tokens while a node is still running and
+            # "updates" each node's output as soon as that node finishes.
             events = graph.stream(
                 input={
                     "user_message": prompt,
@@ -149,38 +341,12 @@ if prompt := st.chat_input(placeholder="Converse com o vendedor automático...")
                     "language": selected_language,
                 },
                 config=config,
-                stream_mode="values",
+                stream_mode=["messages", "updates", "values"],
             )
             if not st.session_state["sensitive_check"]:
-                for event in events:
-                    st.session_state["event"] = event
-                    if isinstance(event["messages"][-1], ToolMessage):
-                        msg = event["messages"][-1].content
-                        if debug:
-                            st.session_state["messages"][user_id].append(
-                                {"role": "assistant", "content": msg}
-                            )
-                            st.chat_message("", avatar="🧰").write(msg)
-
-                    elif isinstance(event["messages"][-1], AIMessage):
-                        if tools := event["messages"][-1].additional_kwargs.get(
-                            "tool_calls"
-                        ):
-                            for tool in tools:
-                                name = tool["function"]["name"]
-                                args = tool["function"]["arguments"]
-                                if debug:
-                                    msg = f"Chamando a função {name} com os argumentos {args}"
-                                    st.session_state["messages"][user_id].append(
-                                        {"role": "assistant", "content": msg}
-                                    )
-                                    st.chat_message("", avatar="🧰").write(msg)
-                        else:
-                            msg = event["messages"][-1].content
-                            st.session_state["messages"][user_id].append(
-                                {"role": "assistant", "content": msg}
-                            )
-                            st.chat_message("assistant").write(msg)
+                first_token = show_graph_stream(events, user_id, debug)
+                if debug and first_token is not None:
+                    st.caption(f"Time to first token: {first_token * 1000:.0f} ms")
 
             if st.session_state["sensitive_check"]:
                 if prompt.strip() == "yes":
@@ -204,9 +370,7 @@ if prompt := st.chat_input(placeholder="Converse com o vendedor automático...")
                         config,
                     )
                 msg = result["messages"][-1].content
-                st.session_state["messages"][user_id].append(
-                    {"role": "assistant", "content": msg}
-                )
+                chat_log(user_id).append("assistant", msg)
                 st.chat_message("assistant").write(msg)
                 st.session_state["sensitive_check"] = False
             snapshot = graph.get_state(config)
@@ -215,9 +379,7 @@ if prompt := st.chat_input(placeholder="Converse com o vendedor automático...")
                     "Do you approve of the above actions? Type 'yes' to continue;"
                     " otherwise, explain the requested change.\n\n"
                 )
-                st.session_state["messages"][user_id].append(
-                    {"role": "assistant", "content": sensitive_check}
-                )
+                chat_log(user_id).append("assistant", sensitive_check)
                 st.chat_message("assistant").write(sensitive_check)
                 st.session_state["sensitive_check"] = True
 
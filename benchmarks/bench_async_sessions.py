@@ -0,0 +1,130 @@
+"""
+Concurrent simulated sessions on one worker: graph.stream on a thread pool vs
+graph.astream on a single event loop.
+
+    python -m benchmarks.bench_async_sessions --sessions 300 --latency 0.2
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.scripted_model import (
+    DIALOGUES,
+    ScriptedChatModel,
+    ScriptedPolicy,
+)
+from src import agent, database
+from src.checkpointer import SQLiteCheckpointer
+from src.connection import ConnectionManager
+from src.response_cache import ResponseCache
+
+
+class PeakThreads:
+    """Sample the number of live threads in the background."""
+
+    def __init__(self) -> None:
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(0.01):
+            self.peak = max(self.peak, threading.active_count())
+
+    def __enter__(self) -> "PeakThreads":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def session_inputs(session: int, offset: int) -> tuple:
+    user_id = str(offset + session)
+    config = {"configurable": {"thread_id": user_id, "user_id": user_id}}
+    inputs = [
+        {"messages": [("user", utterance)], "language": "Portuguese"}
+        for utterance, _ in DIALOGUES[session % len(DIALOGUES)]
+    ]
+    return config, inputs
+
+
+def run_threaded(graph, sessions: int, threads: int, offset: int) -> int:
+    def run(session: int) -> int:
+        config, inputs = session_inputs(session, offset)
+        for input in inputs:
+            for _ in graph.stream(input, config, stream_mode="updates"):
+                pass
+        return len(inputs)
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return sum(executor.map(run, range(sessions)))
+
+
+async def run_async(graph, sessions: int, offset: int) -> int:
+    async def run(session: int) -> int:
+        config, inputs = session_inputs(session, offset)
+        for input in inputs:
+            async for _ in graph.astream(input, config, stream_mode="updates"):
+                pass
+        return len(inputs)
+
+    return sum(await asyncio.gather(*(run(session) for session in range(sessions))))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--threads", type=int, default=16)
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(
+        io.StringIO()
+    ):
+        database.db = ConnectionManager(os.path.join(tmp, "bench.db"))
+        database.create_database()
+        model = ScriptedChatModel(policy=ScriptedPolicy(), latency=args.latency)
+        agent.response_cache = ResponseCache(
+            ConnectionManager(os.path.join(tmp, "responses.db"))
+        )
+        agent.prewarm_responses(model, ["Portuguese"])
+        checkpointer = SQLiteCheckpointer(os.path.join(tmp, "checkpoints.db"))
+        graph = agent.build_workflow(model, model).compile(checkpointer=checkpointer)
+
+        for name, run in (
+            (
+                f"graph.stream, {args.threads} threads",
+                lambda: run_threaded(graph, args.sessions, args.threads, 0),
+            ),
+            (
+                "graph.astream, 1 event loop",
+                lambda: asyncio.run(run_async(graph, args.sessions, args.sessions)),
+            ),
+        ):
+            with PeakThreads() as threads:
+                start = time.perf_counter()
+                turns = run()
+                elapsed = time.perf_counter() - start
+            results[name] = (elapsed, turns / elapsed, threads.peak)
+        database.db.close_all()
+
+    print(f"{args.sessions} sessions, {args.latency * 1e3:.0f} ms per model call")
+    for name, (elapsed, rate, peak) in results.items():
+        print(
+            f"{name:30s}: {elapsed:6.2f} s, {rate:7.1f} turns/s, "
+            f"peak {peak} threads"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Throughput of the batch mode over a synthetic archive of the scripted dialogues,
+with one worker vs several, and a run interrupted halfway and resumed.
+
+    python -m benchmarks.bench_batch --conversations 50000 --workers 4
+    python -m benchmarks.bench_batch --graph 200
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import tempfile
+
+from benchmarks.scripted_model import DIALOGUES, ScriptedChatModel, ScriptedPolicy
+from src import database
+from src.batch import run_batch
+from src.connection import ConnectionManager
+
+
+def scripted_model() -> ScriptedChatModel:
+    # Module level so the worker processes can unpickle it.
+    return ScriptedChatModel(policy=ScriptedPolicy())
+
+
+def write_archive(path: str, conversations: int) -> None:
+    with open(path, "w") as file:
+        for user_id in range(1, conversations + 1):
+            dialogue = DIALOGUES[user_id % len(DIALOGUES)]
+            messages = [{"role": "user", "content": text} for text, _ in dialogue]
+            conversation = {"user_id": user_id, "messages": messages}
+            file.write(json.dumps(conversation, ensure_ascii=False) + "\n")
+
+
+def run(tmp: str, label: str, archive: str, **kwargs) -> tuple:
+    """A fresh Clients table filled from `archive`: the totals and every profile."""
+    database.db = ConnectionManager(os.path.join(tmp, f"{label}.db"))
+    checkpoint = os.path.join(tmp, f"{label}.checkpoint")
+    results = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for limit in kwargs.pop("limits", [None]):
+            results.append(
+                run_batch(archive, checkpoint=checkpoint, limit=limit, **kwargs)
+            )
+        profiles = list(database.iter_users())
+    return results, profiles
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--conversations", type=int, default=50_000)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--graph", type=int, default=200, help="0 to skip")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = os.path.join(tmp, "conversations.jsonl")
+        write_archive(archive, args.conversations)
+        size = os.path.getsize(archive) / 2**20
+        print(f"{args.conversations} conversations ({size:.1f} MB)")
+
+        _, expected = run(tmp, "single", archive, workers=1)
+        for label, kwargs in [
+            ("nlu, 1 worker", {"workers": 1}),
+            (f"nlu, {args.workers} workers", {"workers": args.workers}),
+            (
+                "nlu, resumed",
+                {
+                    "workers": args.workers,
+                    "limits": [args.conversations // 2, None],
+                },
+            ),
+        ]:
+            results, profiles = run(tmp, label.replace(" ", ""), archive, **kwargs)
+            seconds = sum(result["seconds"] for result in results)
+            processed = sum(result["processed"] for result in results)
+            assert profiles == expected, label
+            print(
+                f"{label:18}: {processed / seconds:8.0f} conversations/s  "
+                f"({seconds:.2f}s, {len(results)} run(s), {len(profiles)} profiles)"
+            )
+
+        if args.graph:
+            graph_archive = os.path.join(tmp, "graph.jsonl")
+            write_archive(graph_archive, args.graph)
+            results, profiles = run(
+                tmp,
+                "graph",
+                graph_archive,
+                mode="graph",
+                workers=args.workers,
+                batch_size=10,
+                model_factory=scripted_model,
+            )
+            complete = sum(all(value is not None for value in p) for p in profiles)
+            print(
+                f"{'graph, scripted':18}: {results[0]['throughput']:8.0f} "
+                f"conversations/s  ({results[0]['seconds']:.2f}s, "
+                f"{complete}/{args.graph} complete profiles)"
+            )
+
+
+if __name__ == "__main__":
+    main()
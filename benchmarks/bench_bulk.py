@@ -0,0 +1,50 @@
+"""
+Import/export throughput of the bulk client API.
+
+    python -m benchmarks.bench_bulk --rows 200000
+"""
+
+import argparse
+import contextlib
+import csv
+import io
+import os
+import tempfile
+import time
+
+from src import database
+from src.bulk import export_clients, import_clients
+from src.connection import ConnectionManager
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "clients.csv")
+        with open(source, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(database.COLUMNS)
+            for i in range(1, args.rows + 1):
+                writer.writerow([i, f"Client {i}", 20 + i % 50, "work", "16GB", "No"])
+
+        database.db = ConnectionManager(os.path.join(tmp, "bench.db"))
+        for label, fn, path in [
+            ("import csv  ", import_clients, source),
+            ("re-import   ", import_clients, source),
+            ("export jsonl", export_clients, os.path.join(tmp, "clients.jsonl")),
+        ]:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                total = fn(path)
+            elapsed = time.perf_counter() - start
+            print(
+                f"{label}: {total} rows in {elapsed:.2f}s ({total / elapsed:,.0f} rows/s)"
+            )
+        database.db.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Catalog scoring on a synthetic catalog: import and load time, then top-k latency of
+the vectorized scorer vs scoring product by product in Python.
+
+    python -m benchmarks.bench_catalog --products 100000
+"""
+
+import argparse
+import contextlib
+import io
+import math
+import os
+import random
+import tempfile
+import time
+
+from src import catalog, database
+from src.connection import ConnectionManager
+
+PROFILES = [
+    {"RAM": "16GB", "GPU": "Sim", "Goal": "jogos", "Age": 25},
+    {"RAM": "8GB", "GPU": "Não", "Goal": "estudo", "Age": 19},
+    {"RAM": "16GB", "GPU": "No", "Goal": "work", "Age": 45},
+    {"RAM": "8GB", "GPU": "Não", "Goal": "navegar na internet", "Age": 70},
+    {"RAM": "32GB", "GPU": "Sim", "Goal": "edição de vídeo", "Age": 33},
+]
+
+
+def synthetic_products(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    for i in range(count):
+        ram = rng.choice((4, 8, 8, 16, 16, 32, 64))
+        gaming = rng.random() < 0.3
+        cpu = rng.randint(15, 99)
+        gpu = rng.randint(30, 99) if gaming else 0
+        price = round(1500 + cpu * 60 + gpu * 70 + ram * 80 + rng.uniform(-500, 500))
+        yield (
+            f"SKU-{i:06d}",
+            f"Notebook {i}",
+            rng.choice(("Lenovo", "Dell", "Asus", "Acer", "Samsung", "Positivo")),
+            float(price),
+            ram,
+            rng.choice((128, 256, 512, 1024)),
+            cpu,
+            gpu,
+            round(rng.uniform(1.0, 3.2), 1),
+            float(rng.randint(3, 18)),
+            rng.randint(0, 30),
+        )
+
+
+def python_top_k(products: catalog.Catalog, profile: dict, k: int) -> list:
+    """The same scores as Catalog.scores, one product at a time."""
+    goal = catalog.goal_category(str(profile.get("Goal") or "")) or "other"
+    weights = list(catalog.GOAL_WEIGHTS[goal])
+    age = catalog._number(profile.get("Age"))
+    if age is not None and age >= 60:
+        weights = [w + extra for w, extra in zip(weights, (0, 0, 0.2, 0.6, 0.4))]
+    elif age is not None and age < 25:
+        weights[2] += 0.5
+    needs_gpu = catalog._needs_gpu(profile.get("GPU"))
+    if needs_gpu:
+        weights[1] += 0.5
+    ram = catalog._number(profile.get("RAM"))
+
+    scored = []
+    for i in range(len(products)):
+        features = products.features[i].tolist()
+        score = sum(w * f for w, f in zip(weights, features))
+        if ram is not None:
+            fit = math.log2(max(products.ram[i], 1.0)) - math.log2(max(ram, 1.0))
+            score -= -2.0 * fit if fit < 0 else 0.5 * fit
+        if needs_gpu and not products.gpu[i] > 0:
+            score -= 3.0
+        elif needs_gpu is False and products.gpu[i] > 0:
+            score -= 0.5
+        scored.append((score, i))
+    scored.sort(reverse=True)
+    return [products.rows[i][0] for _, i in scored[:k]]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(
+        io.StringIO()
+    ):
+        database.db = ConnectionManager(os.path.join(tmp, "catalog.db"))
+        start = time.perf_counter()
+        catalog.upsert_products(synthetic_products(args.products))
+        imported = time.perf_counter() - start
+
+        start = time.perf_counter()
+        products = catalog.get_catalog()
+        loaded = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for i in range(args.queries):
+            products.top_k(PROFILES[i % len(PROFILES)], args.k)
+        vectorized = (time.perf_counter() - start) / args.queries
+
+        start = time.perf_counter()
+        for profile in PROFILES:
+            expected = python_top_k(products, profile, args.k)
+            assert [p.sku for p in products.top_k(profile, args.k)] == expected
+        looped = (time.perf_counter() - start) / len(PROFILES)
+        database.db.close_all()
+
+    print(f"{len(products)} products in stock of {args.products}")
+    print(f"import into SQLite : {imported * 1e3:8.0f} ms")
+    print(f"load feature matrix: {loaded * 1e3:8.0f} ms")
+    print(f"top-{args.k}, NumPy      : {vectorized * 1e3:8.2f} ms per profile")
+    print(f"top-{args.k}, Python loop: {looped * 1e3:8.2f} ms per profile")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Chat transcript of app.py: messages kept in memory and read on every rerun, as one
+growing list vs a ChatLog with a capped tail, for increasingly long conversations.
+
+    python -m benchmarks.bench_chat_log --lengths 100 1000 10000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from src.chat_log import CHAT_PAGE, CHAT_TAIL, ChatLog
+from src.connection import ConnectionManager
+
+# Roughly an assistant reply.
+CONTENT = (
+    "Claro! Um notebook com 16GB de RAM e placa de vídeo dedicada atende bem. " * 4
+)
+
+
+def rerun(messages) -> int:
+    """What app.py does with the transcript on a rerun, minus Streamlit."""
+    return sum(len(message["content"]) for message in messages)
+
+
+def with_list(length: int, reruns: int) -> tuple:
+    tracemalloc.start()
+    messages = []
+    start = time.perf_counter()
+    for i in range(length):
+        messages.append({"role": "assistant", "content": f"{i} {CONTENT}"})
+    appended = (time.perf_counter() - start) / length
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for _ in range(reruns):
+        rerun(messages)
+    return appended, memory, (time.perf_counter() - start) / reruns, len(messages)
+
+
+def with_chat_log(db: ConnectionManager, length: int, reruns: int) -> tuple:
+    tracemalloc.start()
+    log = ChatLog(db, f"conversation_{length}")
+    start = time.perf_counter()
+    for i in range(length):
+        log.append("assistant", f"{i} {CONTENT}")
+    appended = (time.perf_counter() - start) / length
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for _ in range(reruns):
+        rerun(log.latest(CHAT_TAIL))
+    elapsed = (time.perf_counter() - start) / reruns
+    assert len(log.latest(CHAT_TAIL + CHAT_PAGE)) == min(length, CHAT_TAIL + CHAT_PAGE)
+    return appended, memory, elapsed, len(log.latest(CHAT_TAIL))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lengths", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--reruns", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = ConnectionManager(os.path.join(tmp, "chat.db"))
+        rows = [
+            (
+                length,
+                with_list(length, args.reruns),
+                with_chat_log(db, length, args.reruns),
+            )
+            for length in args.lengths
+        ]
+        db.close_all()
+
+    print(f"{'messages':>8}  {'append':>16}  {'memory (KiB)':>17}  {'rerun':>20}")
+    for length, (a1, m1, r1, n1), (a2, m2, r2, n2) in rows:
+        print(
+            f"{length:8}  {a1 * 1e6:5.1f} -> {a2 * 1e6:5.1f} us"
+            f"  {m1 / 1024:7.0f} -> {m2 / 1024:5.0f}"
+            f"  {r1 * 1e6:7.1f} -> {r2 * 1e6:5.1f} us ({n1} -> {n2} drawn)"
+        )
+
+
+if __name__ == "__main__":
+    main()
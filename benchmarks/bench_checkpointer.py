@@ -0,0 +1,81 @@
+"""
+Soak test of the checkpointer: Python heap and disk usage while many threads chat.
+
+    python -m benchmarks.bench_checkpointer
+    python -m benchmarks.bench_checkpointer --soak  # 200 threads, takes long
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Annotated, Optional, TypedDict
+
+from langchain_core.messages import AIMessage
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import END, START, StateGraph
+from langgraph.graph.message import add_messages
+
+from src.checkpointer import SQLiteCheckpointer
+
+
+class State(TypedDict):
+    language: Optional[str]
+    user_info: Optional[dict]
+    messages: Annotated[list, add_messages]
+
+
+def agent(state: State) -> dict:
+    return {"messages": AIMessage(content="Qual é a sua idade? " * 20)}
+
+
+def soak(checkpointer, threads: int, turns: int) -> tuple:
+    workflow = StateGraph(State)
+    workflow.add_node("agent", agent)
+    workflow.add_edge(START, "agent")
+    workflow.add_edge("agent", END)
+    graph = workflow.compile(checkpointer=checkpointer)
+
+    tracemalloc.start()
+    samples = []
+    start = time.perf_counter()
+    for turn in range(turns):
+        for thread in range(threads):
+            graph.invoke(
+                {"messages": [("user", f"turn {turn}")], "language": "Portuguese"},
+                {"configurable": {"thread_id": f"session_{thread}"}},
+            )
+        samples.append(tracemalloc.get_traced_memory()[0] / 2**20)
+    elapsed = time.perf_counter() - start
+    tracemalloc.stop()
+    return samples, threads * turns / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument(
+        "--soak",
+        action="store_true",
+        help="200 threads; MemorySaver slows down quadratically, so this is slow",
+    )
+    args = parser.parse_args()
+    if args.soak:
+        args.threads = 200
+
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "checkpoints.db")
+        for name, checkpointer in [
+            ("MemorySaver", MemorySaver()),
+            ("SQLiteCheckpointer", SQLiteCheckpointer(filename)),
+        ]:
+            samples, throughput = soak(checkpointer, args.threads, args.turns)
+            heap = " ".join(f"{mb:.1f}" for mb in samples[:: max(1, len(samples) // 6)])
+            print(f"{name:18}: {throughput:7.0f} turns/s, heap MB per turn: {heap}")
+        print(f"checkpoints.db: {os.path.getsize(filename) / 2**20:.1f} MB on disk")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Per-call latency of the database layer: connect-per-call vs pooled connections.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_database --calls 2000
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sqlite3
+import tempfile
+import time
+
+from src import database
+from src.connection import ConnectionManager
+
+
+def connect_per_call_roundtrip(filename: str, user_id: int) -> None:
+    """The original pattern: one connect/close for the write and one for the read."""
+    conn = sqlite3.connect(filename)
+    conn.execute(database.UPSERT_USER, (user_id, None, 30, None, None, None))
+    conn.commit()
+    conn.close()
+
+    conn = sqlite3.connect(filename)
+    conn.execute(database.SELECT_USER, (user_id,)).fetchone()
+    conn.close()
+
+
+def pooled_roundtrip(user_id: int) -> None:
+    database.create_or_update_user(id=user_id, age=30)
+    database.db.connection().execute(database.SELECT_USER, (user_id,)).fetchone()
+
+
+def measure(fn, calls: int) -> float:
+    start = time.perf_counter()
+    for i in range(calls):
+        fn(i % 100 + 1)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "bench.db")
+        database.db = ConnectionManager(filename)
+        with contextlib.redirect_stdout(io.StringIO()):
+            database.create_database()
+            pooled = measure(pooled_roundtrip, args.calls)
+        database.db.close_all()
+        before = measure(
+            lambda user_id: connect_per_call_roundtrip(filename, user_id), args.calls
+        )
+
+    print(f"connect per call : {before:8.1f} us / write+read")
+    print(f"pooled connection: {pooled:8.1f} us / write+read")
+    print(f"speedup          : {before / pooled:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Latency of the closing step: interim message and recommendation serially vs fanned out.
+
+    python -m benchmarks.bench_fanout --interim 0.4 --recommendation 1.0
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from langchain_core.messages import SystemMessage
+from langgraph.checkpoint.memory import MemorySaver
+
+from benchmarks.scripted_model import (
+    DIALOGUES,
+    ScriptedChatModel,
+    ScriptedPolicy,
+)
+from src import agent, database
+from src.connection import ConnectionManager
+from src.response_cache import ResponseCache
+
+
+class SlowClosingPolicy(ScriptedPolicy):
+    """Answer instantly while filling slots; the two closing prompts take a while."""
+
+    def __init__(self, interim: float, recommendation: float) -> None:
+        super().__init__()
+        self.interim = interim
+        self.recommendation = recommendation
+
+    def __call__(self, messages):
+        system = next((m.content for m in messages if isinstance(m, SystemMessage)), "")
+        if "Client Info:" not in system:
+            # The recommendation prompt is a system message, the interim one is not.
+            time.sleep(self.recommendation if system else self.interim)
+        return super().__call__(messages)
+
+
+def closing_latency(tmp: str, interim: float, recommendation: float) -> tuple:
+    """
+    Return seconds from the decision to recommend to the last reply (serial and
+    fanned out) and to the interim message in the fanned-out graph.
+    """
+    model = ScriptedChatModel(policy=SlowClosingPolicy(interim, recommendation))
+    # An empty response cache so the interim message costs a model call.
+    agent.response_cache = ResponseCache(
+        ConnectionManager(os.path.join(tmp, "responses.db"))
+    )
+    graph = agent.build_workflow(model, model).compile(checkpointer=MemorySaver())
+    utterance, _ = DIALOGUES[2][0]
+    config = {"configurable": {"thread_id": "fanout", "user_id": "1"}}
+
+    closing, done = None, {}
+    for update in graph.stream(
+        {"messages": [("user", utterance)], "language": "Portuguese"},
+        config,
+        stream_mode="updates",
+    ):
+        now = time.perf_counter()
+        for node in update:
+            if node in agent.CLOSING_NODES:
+                done[node] = now
+            else:
+                # The last step before the closing one decided to recommend.
+                closing = now
+    assert closing is not None and len(done) == 2
+    fanned_out = max(done.values()) - closing
+    interim_shown = done["finalize_dialogue"] - closing
+
+    # What the old finalize_dialogue -> generate_recommendation wiring did.
+    state = graph.get_state(config).values
+    agent.response_cache = ResponseCache(
+        ConnectionManager(os.path.join(tmp, "responses_serial.db"))
+    )
+    start = time.perf_counter()
+    state = {**state, **agent.finalize_dialogue(state, model=model)}
+    agent.generate_recommendation(state, config, model=model)
+    serial = time.perf_counter() - start
+    return serial, fanned_out, interim_shown
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--interim", type=float, default=0.4)
+    parser.add_argument("--recommendation", type=float, default=1.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(
+        io.StringIO()
+    ):
+        database.db = ConnectionManager(os.path.join(tmp, "bench.db"))
+        database.create_database()
+        serial, fanned_out, interim_shown = closing_latency(
+            tmp, args.interim, args.recommendation
+        )
+        database.db.close_all()
+
+    a, b = args.interim, args.recommendation
+    print(f"interim a={a:.2f}s, recommendation b={b:.2f}s")
+    print(f"serial     : {serial:6.2f} s  (a + b = {a + b:.2f})")
+    print(f"fanned out : {fanned_out:6.2f} s  (max(a, b) = {max(a, b):.2f})")
+    print(f"interim message streamed after {interim_shown:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
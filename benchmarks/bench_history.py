@@ -0,0 +1,92 @@
+"""
+Estimated prompt tokens of the dialogue history per turn, resent in full vs compacted
+by src/history.py, on a synthetic 40-turn dialogue with a slot tool every few turns.
+
+    python -m benchmarks.bench_history
+    python -m benchmarks.bench_history --turns 100 --budget 1000
+"""
+
+import argparse
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from src.history import (
+    HISTORY_TOKEN_BUDGET,
+    HISTORY_TURNS,
+    compact_history,
+    message_tokens,
+)
+
+
+def turn_messages(turn: int) -> list:
+    """One turn: the client, a tool round trip every third turn, the assistant."""
+    messages = [
+        HumanMessage(
+            content=f"Turno {turn}: estou procurando um notebook para estudar e "
+            "jogar, com bastante memória e uma boa placa de vídeo, até 5 mil reais."
+        )
+    ]
+    if turn % 3 == 0:
+        call_id = f"call_{turn}"
+        messages += [
+            AIMessage(
+                content="",
+                tool_calls=[
+                    {"name": "update_ram", "args": {"ram": "16GB"}, "id": call_id}
+                ],
+            ),
+            ToolMessage(content="saved: ram=16GB", tool_call_id=call_id),
+        ]
+    messages.append(
+        AIMessage(
+            content="Entendi! Com 16GB de RAM e GPU dedicada você roda jogos atuais e "
+            "ferramentas de estudo sem travar. Qual é o seu orçamento e para quais "
+            "jogos ou programas você vai usar o notebook no dia a dia?"
+        )
+    )
+    return messages
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--budget", type=int, default=HISTORY_TOKEN_BUDGET)
+    parser.add_argument("--keep-turns", type=int, default=HISTORY_TURNS)
+    args = parser.parse_args()
+
+    messages = []
+    summary, summarized = None, 0
+    full_total = compact_total = 0
+    seconds = 0.0
+    report = {1, args.turns} | set(range(10, args.turns, 10))
+    print(f"{'turn':>4}  {'full':>7}  {'compacted':>9}")
+    for turn in range(1, args.turns + 1):
+        # The history sent with the model call that answers the client's message.
+        messages.append(turn_messages(turn)[0])
+        start = time.perf_counter()
+        window, summary, summarized = compact_history(
+            messages,
+            summary=summary,
+            summarized=summarized,
+            budget=args.budget,
+            keep_turns=args.keep_turns,
+        )
+        seconds += time.perf_counter() - start
+        full = sum(map(message_tokens, messages))
+        compacted = sum(map(message_tokens, window))
+        full_total += full
+        compact_total += compacted
+        if turn in report:
+            print(f"{turn:4}  {full:7}  {compacted:9}")
+        messages.extend(turn_messages(turn)[1:])
+
+    print(
+        f"total: {full_total} full vs {compact_total} compacted "
+        f"({compact_total / full_total:.0%}), "
+        f"{seconds / args.turns * 1000:.2f} ms per compaction"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+LLM calls per completed dialogue: one tool per slot vs the batched inform_slots tool.
+
+    python -m benchmarks.bench_llm_calls
+"""
+
+import contextlib
+import io
+import os
+import tempfile
+
+from langgraph.checkpoint.memory import MemorySaver
+
+from benchmarks.scripted_model import (
+    DIALOGUES,
+    ScriptedChatModel,
+    ScriptedPolicy,
+)
+from src import agent, database
+from src.connection import ConnectionManager
+
+
+def run_dialogues(batched: bool) -> float:
+    model = ScriptedChatModel(policy=ScriptedPolicy(batched=batched))
+    # Without the rule-based pre-extraction, every slot goes through the model.
+    graph = agent.build_workflow(model, model, nlu=False).compile(
+        checkpointer=MemorySaver()
+    )
+
+    for user_id, dialogue in enumerate(DIALOGUES, start=1):
+        database.delete_user_by_id(user_id)
+        config = {
+            "configurable": {
+                "thread_id": f"{batched}_{user_id}",
+                "user_id": str(user_id),
+            }
+        }
+        for utterance, _ in dialogue:
+            graph.invoke(
+                {"messages": [("user", utterance)], "language": "Portuguese"}, config
+            )
+        assert database.get_profile(user_id).needs_gpu is not None
+    return model.calls / len(DIALOGUES)
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(
+        io.StringIO()
+    ):
+        database.db = ConnectionManager(os.path.join(tmp, "bench.db"))
+        database.create_database()
+        single = run_dialogues(batched=False)
+        batched = run_dialogues(batched=True)
+        database.db.close_all()
+
+    print(f"one tool per slot: {single:5.1f} LLM calls per completed dialogue")
+    print(f"inform_slots     : {batched:5.1f} LLM calls per completed dialogue")
+
+
+if __name__ == "__main__":
+    main()
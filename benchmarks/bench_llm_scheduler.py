@@ -0,0 +1,130 @@
+"""
+A burst of sessions against the rate-limited stub server: ChatOpenAI on its own
+(with the OpenAI client's retries) vs wrapped in the shared LLM scheduler.
+
+    python -m benchmarks.bench_llm_scheduler --sessions 30 --turns 3 --rpm 600
+"""
+
+import argparse
+import statistics
+import threading
+import time
+
+from langchain_openai import ChatOpenAI
+
+from benchmarks.stub_llm_server import StubLLMServer
+from src.llm_scheduler import BACKGROUND, LLMScheduler, ScheduledChatModel
+
+PROMPT = [("user", "Quero um notebook para jogos com 16GB de RAM.")]
+
+
+def run(model, sessions: int, turns: int, background: int) -> dict:
+    """Every session streams `turns` replies; one thread works through `background`."""
+    interactive, batch, failures = [], [], []
+    finished = {}
+    lock = threading.Lock()
+
+    def call(latencies: list, model, stream: bool) -> None:
+        start = time.perf_counter()
+        try:
+            if stream:
+                for _ in model.stream(PROMPT):
+                    pass
+            else:
+                model.invoke(PROMPT)
+        except Exception as error:
+            with lock:
+                failures.append(type(error).__name__)
+            return
+        with lock:
+            latencies.append(time.perf_counter() - start)
+            finished[id(latencies)] = time.perf_counter()
+
+    def session() -> None:
+        for _ in range(turns):
+            call(interactive, model, stream=True)
+
+    def background_work() -> None:
+        worker = (
+            model.with_priority(BACKGROUND)
+            if hasattr(model, "with_priority")
+            else model
+        )
+        for _ in range(background):
+            call(batch, worker, stream=False)
+
+    threads = [threading.Thread(target=session) for _ in range(sessions)]
+    threads.append(threading.Thread(target=background_work))
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {
+        "elapsed": time.perf_counter() - start,
+        "interactive_done": finished.get(id(interactive), start) - start,
+        "background_done": finished.get(id(batch), start) - start,
+        "interactive": interactive,
+        "background": batch,
+        "failures": failures,
+    }
+
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return float("nan")
+    return statistics.quantiles(values, n=100, method="inclusive")[int(q) - 1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=30)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--background", type=int, default=20)
+    parser.add_argument("--rpm", type=float, default=600)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    rows = []
+    for label in ("ChatOpenAI", "scheduled"):
+        server = StubLLMServer(rpm=args.rpm, latency=args.latency).start()
+        chat = ChatOpenAI(
+            model="stub",
+            base_url=server.base_url,
+            api_key="sk-stub",
+            stream_usage=True,
+            max_retries=2 if label == "ChatOpenAI" else 0,
+        )
+        if label == "scheduled":
+            scheduler = LLMScheduler(
+                max_concurrency=args.concurrency,
+                # A little under the provider's limit.
+                requests_per_minute=args.rpm * 0.95,
+            )
+            chat = ScheduledChatModel(model=chat, scheduler=scheduler)
+        result = run(chat, args.sessions, args.turns, args.background)
+        server.stop()
+        rows.append((label, result, dict(server.stats)))
+
+    calls = args.sessions * args.turns + args.background
+    print(
+        f"{args.sessions} sessions x {args.turns} turns + {args.background} background"
+        f" calls, provider limit {args.rpm:.0f} rpm, {args.latency * 1e3:.0f} ms per call"
+    )
+    print(
+        f"{'':10}  {'ok':>4}  {'failed':>6}  {'429s':>5}  {'turn p50':>8}  "
+        f"{'turn p95':>8}  {'turns done':>10}  {'background done':>15}"
+    )
+    for label, result, stats in rows:
+        print(
+            f"{label:10}  {calls - len(result['failures']):4}  "
+            f"{len(result['failures']):6}  {stats['rate_limited']:5}  "
+            f"{percentile(result['interactive'], 50):7.2f}s  "
+            f"{percentile(result['interactive'], 95):7.2f}s  "
+            f"{result['interactive_done']:9.2f}s  {result['background_done']:14.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
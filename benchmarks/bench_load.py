@@ -0,0 +1,279 @@
+"""
+Offline load test: replay the scripted dialogues through the compiled graph with a
+fake chat model and report turn latency, throughput, database and checkpointer time
+and peak memory.
+
+    python -m benchmarks.bench_load --sessions 200 --concurrency 32 --latency 0.2
+    python -m benchmarks.bench_load --mode async --concurrency 200 --json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import resource
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from langgraph.checkpoint.memory import MemorySaver
+
+from benchmarks.scripted_model import (
+    DIALOGUES,
+    ScriptedChatModel,
+    ScriptedPolicy,
+)
+from src import agent, database
+from src.checkpointer import SQLiteCheckpointer
+from src.connection import ConnectionManager
+from src.response_cache import ResponseCache
+
+# Checkpointer entry points the graph calls, per way of driving it.
+CHECKPOINTER_METHODS = {
+    "thread": ("get_tuple", "put", "put_writes"),
+    "async": ("aget_tuple", "aput", "aput_writes"),
+}
+
+
+class Timer:
+    """Thread-safe accumulator of seconds spent in some kind of call."""
+
+    def __init__(self) -> None:
+        self.seconds = 0.0
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self.seconds += seconds
+            self.calls += 1
+
+
+def timed_connection(timer: Timer) -> type:
+    """sqlite3.Connection subclass that adds the time of every statement to `timer`."""
+
+    class TimedCursor(sqlite3.Cursor):
+        def execute(self, *args):
+            start = time.perf_counter()
+            try:
+                return super().execute(*args)
+            finally:
+                timer.add(time.perf_counter() - start)
+
+        def executemany(self, *args):
+            start = time.perf_counter()
+            try:
+                return super().executemany(*args)
+            finally:
+                timer.add(time.perf_counter() - start)
+
+    class TimedConnection(sqlite3.Connection):
+        def cursor(self, factory=TimedCursor):
+            return super().cursor(factory)
+
+        def execute(self, *args):
+            return self.cursor().execute(*args)
+
+        def executemany(self, *args):
+            return self.cursor().executemany(*args)
+
+        def __exit__(self, *exc):
+            # Commit or rollback of `with conn:` blocks.
+            start = time.perf_counter()
+            try:
+                return super().__exit__(*exc)
+            finally:
+                timer.add(time.perf_counter() - start)
+
+    return TimedConnection
+
+
+def time_methods(obj, names: tuple, timer: Timer) -> None:
+    """Wrap the methods `names` of `obj` so their wall time goes to `timer`."""
+    for name in names:
+        method = getattr(obj, name)
+        if asyncio.iscoroutinefunction(method):
+
+            async def wrapper(*args, __method=method, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await __method(*args, **kwargs)
+                finally:
+                    timer.add(time.perf_counter() - start)
+
+        else:
+
+            def wrapper(*args, __method=method, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return __method(*args, **kwargs)
+                finally:
+                    timer.add(time.perf_counter() - start)
+
+        setattr(obj, name, wraps(method)(wrapper))
+
+
+def session_turns(session: int) -> tuple:
+    user_id = str(session + 1)
+    config = {"configurable": {"thread_id": f"load_{user_id}", "user_id": user_id}}
+    inputs = [
+        {"messages": [("user", utterance)], "language": "Portuguese"}
+        for utterance, _ in DIALOGUES[session % len(DIALOGUES)]
+    ]
+    return config, inputs
+
+
+def run_threads(graph, sessions: int, concurrency: int) -> list:
+    def run(session: int) -> list:
+        config, inputs = session_turns(session)
+        latencies = []
+        for input in inputs:
+            start = time.perf_counter()
+            for _ in graph.stream(input, config, stream_mode="updates"):
+                pass
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return [
+            t for latencies in executor.map(run, range(sessions)) for t in latencies
+        ]
+
+
+async def run_async(graph, sessions: int, concurrency: int) -> list:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(session: int) -> list:
+        config, inputs = session_turns(session)
+        latencies = []
+        async with semaphore:
+            for input in inputs:
+                start = time.perf_counter()
+                async for _ in graph.astream(input, config, stream_mode="updates"):
+                    pass
+                latencies.append(time.perf_counter() - start)
+        return latencies
+
+    results = await asyncio.gather(*(run(session) for session in range(sessions)))
+    return [t for latencies in results for t in latencies]
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    index = min(len(sorted_values) - 1, round(q / 100 * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+def load_test(args: argparse.Namespace, tmp: str) -> dict:
+    db_timer, checkpointer_timer = Timer(), Timer()
+    connection = timed_connection(db_timer)
+    database.db = ConnectionManager(os.path.join(tmp, "load.db"), factory=connection)
+    database.create_database()
+    if args.write_behind:
+        database.enable_write_behind(interval=args.write_behind)
+    agent.response_cache = ResponseCache(
+        ConnectionManager(os.path.join(tmp, "responses.db"), factory=connection)
+    )
+    model = ScriptedChatModel(
+        policy=ScriptedPolicy(),
+        latency=args.latency,
+        token_latency=args.token_latency,
+    )
+
+    if args.checkpointer == "sqlite":
+        checkpointer = SQLiteCheckpointer(os.path.join(tmp, "checkpoints.db"))
+    else:
+        checkpointer = MemorySaver()
+    time_methods(checkpointer, CHECKPOINTER_METHODS[args.mode], checkpointer_timer)
+    graph = agent.build_workflow(model, model).compile(checkpointer=checkpointer)
+
+    start = time.perf_counter()
+    if args.mode == "async":
+        latencies = asyncio.run(run_async(graph, args.sessions, args.concurrency))
+    else:
+        latencies = run_threads(graph, args.sessions, args.concurrency)
+    elapsed = time.perf_counter() - start
+    database.disable_write_behind()
+
+    latencies.sort()
+    return {
+        "mode": args.mode,
+        "checkpointer": args.checkpointer,
+        "sessions": args.sessions,
+        "concurrency": args.concurrency,
+        "model_latency_ms": args.latency * 1e3,
+        "turns": len(latencies),
+        "model_calls": model.calls,
+        "elapsed_s": elapsed,
+        "turns_per_s": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1e3,
+        "p95_ms": percentile(latencies, 95) * 1e3,
+        "p99_ms": percentile(latencies, 99) * 1e3,
+        "mean_ms": statistics.fmean(latencies) * 1e3,
+        "db_s": db_timer.seconds,
+        "db_statements": db_timer.calls,
+        "checkpointer_s": checkpointer_timer.seconds,
+        "checkpointer_calls": checkpointer_timer.calls,
+        # ru_maxrss is in KiB on Linux.
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--token-latency", type=float, default=0.0)
+    parser.add_argument("--mode", choices=("thread", "async"), default="thread")
+    parser.add_argument(
+        "--checkpointer", choices=("sqlite", "memory"), default="sqlite"
+    )
+    parser.add_argument(
+        "--write-behind",
+        type=float,
+        default=0.0,
+        metavar="INTERVAL",
+        help="enable write-behind with this flush interval (seconds)",
+    )
+    parser.add_argument("--json", action="store_true", help="print one JSON object")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(
+        io.StringIO()
+    ):
+        report = load_test(args, tmp)
+        database.db.close_all()
+
+    if args.json:
+        print(json.dumps(report))
+        return
+    print(
+        f"{report['sessions']} sessions, {report['turns']} turns, "
+        f"{report['mode']} x{report['concurrency']}, "
+        f"{report['checkpointer']} checkpointer, "
+        f"{report['model_latency_ms']:.0f} ms per model call"
+    )
+    print(
+        f"turn latency   : p50 {report['p50_ms']:8.1f} ms  "
+        f"p95 {report['p95_ms']:8.1f} ms  p99 {report['p99_ms']:8.1f} ms"
+    )
+    print(f"throughput     : {report['turns_per_s']:8.1f} turns/s")
+    print(
+        f"database       : {report['db_s']:8.2f} s in "
+        f"{report['db_statements']} statements"
+    )
+    print(
+        f"checkpointer   : {report['checkpointer_s']:8.2f} s in "
+        f"{report['checkpointer_calls']} calls"
+    )
+    print(f"peak RSS       : {report['peak_rss_mb']:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
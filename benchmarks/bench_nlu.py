@@ -0,0 +1,164 @@
+"""
+Rule-based slot pre-extraction: precision and recall per slot on labeled utterances,
+extraction latency, and LLM calls per completed dialogue with and without it.
+
+    python -m benchmarks.bench_nlu
+"""
+
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from langgraph.checkpoint.memory import MemorySaver
+
+from benchmarks.scripted_model import (
+    DIALOGUES,
+    ScriptedChatModel,
+    ScriptedPolicy,
+)
+from src import agent, database
+from src.connection import ConnectionManager
+from src.nlu import extract_slots
+from src.slot_filling import SLOT_COLUMNS
+
+# Utterance and every slot a careful reader would save from it. Slots the rules
+# should leave to the model (a bare "22", "talvez") are simply not labeled.
+LABELED = [
+    (
+        "Oi, sou a Ana, tenho 30 anos e preciso de 16GB para jogos",
+        {"client_name": "Ana", "age": 30, "goal": "jogos", "ram": "16GB"},
+    ),
+    ("Sim, preciso de GPU", {"has_gpu": "Sim"}),
+    ("Olá!", {}),
+    ("Meu nome é Bruno", {"client_name": "Bruno"}),
+    ("Tenho 45 anos, uso para trabalho", {"age": 45, "goal": "trabalho"}),
+    ("8GB e não preciso de GPU", {"ram": "8GB", "has_gpu": "Não"}),
+    (
+        "Hi, I'm Carla, 22, studying, 8GB, no GPU",
+        {"client_name": "Carla", "goal": "study", "ram": "8GB", "has_gpu": "Não"},
+    ),
+    ("tenho 25 anos", {"age": 25}),
+    ("16GB", {"ram": "16GB"}),
+    ("sim, preciso de GPU", {"has_gpu": "Sim"}),
+    (
+        "Me chamo João e quero um notebook para estudar",
+        {"client_name": "João", "goal": "estudo"},
+    ),
+    (
+        "Quero 32 gigas de RAM e uma placa de vídeo boa",
+        {"ram": "32GB", "has_gpu": "Sim"},
+    ),
+    ("Sem placa de vídeo, por favor", {"has_gpu": "Não"}),
+    ("Não sei se preciso de GPU", {}),
+    ("Talvez uma GPU, ainda não decidi", {}),
+    ("Um SSD de 512GB e 16GB de RAM", {"ram": "16GB"}),
+    ("8GB ou 16GB, qual você recomenda?", {}),
+    ("Meu orçamento é de 5000 reais", {}),
+    ("Vou usar para jogos e trabalho", {}),
+    ("Minha idade é 52", {"age": 52}),
+    ("Tenho 2 filhos", {}),
+    ("My name is David and I am 35 years old", {"client_name": "David", "age": 35}),
+    ("I need it for work, 16GB of RAM", {"goal": "work", "ram": "16GB"}),
+    ("I don't need a graphics card", {"has_gpu": "Não"}),
+    ("Yes, I need a GPU for gaming", {"has_gpu": "Sim", "goal": "gaming"}),
+    ("I'm not sure about the GPU", {}),
+    ("Something light with 8 GB", {"ram": "8GB"}),
+    ("Me llamo Diego, tengo 28 años", {"client_name": "Diego", "age": 28}),
+    (
+        "Lo quiero para juegos, con tarjeta gráfica",
+        {"goal": "juegos", "has_gpu": "Sim"},
+    ),
+    ("No necesito GPU, es para la universidad", {"has_gpu": "Não", "goal": "estudios"}),
+    ("Soy estudiante", {}),
+    ("Quanto custa?", {}),
+    ("I'm Brazilian, living in Lisbon", {}),
+    # Questions, numbers that are not an age, memory of the graphics card, a purpose
+    # the client rules out and words after "I'm" that are not a name.
+    ("Do I need a GPU?", {}),
+    ("Preciso de placa de vídeo?", {}),
+    ("Sou o Pedro. Preciso de GPU?", {"client_name": "Pedro"}),
+    ("Quero um notebook com 2 anos de garantia", {}),
+    ("Tenho 10 anos de experiência em programação", {}),
+    ("I'm 5 minutes away", {}),
+    ("I'm Brazilian and need a laptop", {}),
+    ("Hi, I'm Looking for a notebook", {}),
+    ("Uma placa de vídeo com 8GB", {}),
+    ("RTX 4060 8GB", {}),
+    ("Quero uma RTX 4060 e 16GB de RAM", {"ram": "16GB"}),
+    ("I want a GPU laptop, not for games", {"has_gpu": "Sim"}),
+    ("Não é para jogos, é para trabalho", {"goal": "trabalho"}),
+    # Known miss: the RAM of the current notebook.
+    ("Meu notebook atual tem 8GB e trava muito", {}),
+]
+
+
+def accuracy() -> dict:
+    """Per slot: [true positives, extracted, labeled]."""
+    scores = {field: [0, 0, 0] for field in SLOT_COLUMNS}
+    for text, expected in LABELED:
+        found = extract_slots(text)
+        for field in SLOT_COLUMNS:
+            if field in found:
+                scores[field][1] += 1
+                scores[field][0] += found[field] == expected.get(field)
+            if field in expected:
+                scores[field][2] += 1
+    return scores
+
+
+def latency(rounds: int = 200) -> float:
+    """Microseconds per utterance."""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text, _ in LABELED:
+            extract_slots(text)
+    return (time.perf_counter() - start) / (rounds * len(LABELED)) * 1e6
+
+
+def llm_calls(nlu: bool) -> float:
+    model = ScriptedChatModel(policy=ScriptedPolicy())
+    graph = agent.build_workflow(model, model, nlu=nlu).compile(
+        checkpointer=MemorySaver()
+    )
+    for user_id, dialogue in enumerate(DIALOGUES, start=1):
+        database.delete_user_by_id(user_id)
+        config = {
+            "configurable": {"thread_id": f"{nlu}_{user_id}", "user_id": str(user_id)}
+        }
+        for utterance, _ in dialogue:
+            graph.invoke(
+                {"messages": [("user", utterance)], "language": "Portuguese"}, config
+            )
+        assert database.get_profile(user_id).needs_gpu is not None
+    return model.calls / len(DIALOGUES)
+
+
+def main() -> None:
+    scores = accuracy()
+    per_utterance = latency()
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(
+        io.StringIO()
+    ):
+        database.db = ConnectionManager(os.path.join(tmp, "bench.db"))
+        database.create_database()
+        without = llm_calls(nlu=False)
+        with_nlu = llm_calls(nlu=True)
+        database.db.close_all()
+
+    print(f"{len(LABELED)} labeled utterances")
+    for field, (correct, extracted, labeled) in scores.items():
+        precision = correct / extracted if extracted else 1.0
+        recall = correct / labeled if labeled else 1.0
+        print(
+            f"{field:12}: precision {precision:6.1%} ({correct}/{extracted})  "
+            f"recall {recall:6.1%} ({correct}/{labeled})"
+        )
+    print(f"extraction  : {per_utterance:6.1f} us per utterance")
+    print(f"without nlu : {without:5.1f} LLM calls per completed dialogue")
+    print(f"with nlu    : {with_nlu:5.1f} LLM calls per completed dialogue")
+
+
+if __name__ == "__main__":
+    main()
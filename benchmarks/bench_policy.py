@@ -0,0 +1,136 @@
+"""
+Slot-completeness fast path: LLM calls and latency until the recommendation for new
+clients and for a returning client whose profile is already complete, with the
+router always handing over to the model vs checking the saved profile first.
+
+    python -m benchmarks.bench_policy --latency 0.3
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+from unittest import mock
+
+from langgraph.checkpoint.memory import MemorySaver
+
+from benchmarks.scripted_model import (
+    DIALOGUES,
+    ScriptedChatModel,
+    ScriptedPolicy,
+)
+from src import agent, database
+from src.connection import ConnectionManager
+from src.response_cache import ResponseCache
+
+RETURNING = dict(name="Ana", age=30, goal="jogos", ram="16GB", needs_gpu="Sim")
+
+
+def always_model(state, config, profile):
+    """What the router did before: every turn is the model's to decide."""
+    return "agent"
+
+
+def run_turns(graph, config: dict, utterances: list) -> float:
+    start = time.perf_counter()
+    for utterance in utterances:
+        graph.invoke(
+            {"messages": [("user", utterance)], "language": "Portuguese"}, config
+        )
+    return time.perf_counter() - start
+
+
+def new_clients(latency: float, confirm: bool = False) -> tuple:
+    """LLM calls and seconds per completed scripted dialogue."""
+    model = ScriptedChatModel(policy=ScriptedPolicy(), latency=latency)
+    graph = agent.build_workflow(model, model).compile(checkpointer=MemorySaver())
+    elapsed = 0.0
+    for user_id, dialogue in enumerate(DIALOGUES, start=1):
+        database.delete_user_by_id(user_id)
+        config = {
+            "configurable": {
+                "thread_id": f"{user_id}_{confirm}",
+                "user_id": str(user_id),
+                "confirm_profile": confirm,
+            }
+        }
+        elapsed += run_turns(graph, config, [text for text, _ in dialogue])
+        values = graph.get_state(config).values
+        assert values.get("recommended")
+        # A profile completed during the session is not asked to be confirmed.
+        assert all(m.name != agent.CONFIRMATION for m in values["messages"])
+    return model.calls / len(DIALOGUES), elapsed / len(DIALOGUES)
+
+
+def returning_client(latency: float, confirm: bool = False) -> tuple:
+    """LLM calls and seconds from the greeting of a known client to the recommendation."""
+    model = ScriptedChatModel(policy=ScriptedPolicy(), latency=latency)
+    graph = agent.build_workflow(model, model).compile(checkpointer=MemorySaver())
+    database.create_or_update_user(id=99, **RETURNING)
+    config = {
+        "configurable": {
+            "thread_id": f"returning_{confirm}",
+            "user_id": "99",
+            "confirm_profile": confirm,
+        }
+    }
+    utterances = ["Oi, quero trocar de notebook"] + (
+        ["Sim, pode gerar"] if confirm else []
+    )
+    elapsed = run_turns(graph, config, utterances)
+    assert graph.get_state(config).values.get("recommended")
+    return model.calls, elapsed
+
+
+def confirmed_client(latency: float) -> tuple:
+    return returning_client(latency, confirm=True)
+
+
+def confirmed_new_clients(latency: float) -> tuple:
+    return new_clients(latency, confirm=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.3)
+    args = parser.parse_args()
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(
+        io.StringIO()
+    ):
+        database.db = ConnectionManager(os.path.join(tmp, "bench.db"))
+        database.create_database()
+        # Pre-warmed as in the app: the interim message never costs a model call.
+        agent.response_cache = ResponseCache(
+            ConnectionManager(os.path.join(tmp, "responses.db"))
+        )
+        agent.prewarm_responses(ScriptedChatModel(policy=ScriptedPolicy()))
+        for label, run, baseline in (
+            ("new clients", new_clients, new_clients),
+            ("new, confirm on", confirmed_new_clients, new_clients),
+            ("returning client", returning_client, returning_client),
+            # Before, the saved profile was never brought up: the baseline is the
+            # same single turn as above.
+            ("returning, confirmed", confirmed_client, returning_client),
+        ):
+            with mock.patch.object(agent, "profile_step", always_model):
+                before = baseline(args.latency)
+            database.delete_user_by_id(99)
+            rows.append((label, before, run(args.latency)))
+            database.delete_user_by_id(99)
+        database.db.close_all()
+
+    print(f"model latency {args.latency:.2f}s per call, until the recommendation")
+    print(f"{'':20}  {'LLM calls':>14}  {'seconds':>16}")
+    for label, (calls, seconds), (fast_calls, fast_seconds) in rows:
+        print(
+            f"{label:20}: {calls:5.1f} -> {fast_calls:4.1f}"
+            f"  {seconds:6.2f} -> {fast_seconds:6.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
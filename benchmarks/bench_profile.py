@@ -0,0 +1,67 @@
+"""
+Cost of reading and rendering one profile: one-row DataFrame vs ClientProfile.
+
+    python -m benchmarks.bench_profile --calls 5000
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from src import database
+from src.connection import ConnectionManager
+
+
+def dataframe_roundtrip(user_id: int) -> str:
+    """What get_user_by_id + DataFrame.to_string used to cost on every tool call."""
+    import pandas as pd
+
+    row = database._fetch_user(user_id)
+    df = pd.DataFrame([row], columns=database.COLUMNS)
+    df = df.rename(dict(zip(database.COLUMNS, database.PROFILE_LABELS)), axis=1)
+    df.to_dict(orient="records")
+    return df.to_string(index=False)
+
+
+def profile_roundtrip(user_id: int) -> str:
+    profile = database.get_profile(user_id)
+    profile.to_record()
+    return profile.to_text()
+
+
+def measure(fn, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn(1)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=5000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    import pandas  # noqa: F401
+
+    import_ms = (time.perf_counter() - start) * 1e3
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.db = ConnectionManager(os.path.join(tmp, "bench.db"))
+        with contextlib.redirect_stdout(io.StringIO()):
+            database.create_database()
+            database.create_or_update_user(1, "Ana", 30, "gaming", "16GB", "Yes")
+        dataframe = measure(dataframe_roundtrip, args.calls)
+        profile = measure(profile_roundtrip, args.calls)
+        database.db.close_all()
+
+    print(f"import pandas     : {import_ms:8.1f} ms (avoided on the hot path)")
+    print(f"DataFrame profile : {dataframe:8.1f} us / read+render")
+    print(f"ClientProfile     : {profile:8.1f} us / read+render")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Profile reads with the write-through cache: hit latency and bounded memory.
+
+    python -m benchmarks.bench_profile_cache --reads 20000 --users 50000
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from src import database
+from src.connection import ConnectionManager
+from src.profile_cache import ProfileCache
+
+
+def measure(reads: int) -> float:
+    start = time.perf_counter()
+    for _ in range(reads):
+        database.get_profile(1)
+    return (time.perf_counter() - start) / reads * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--reads", type=int, default=20_000)
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--maxsize", type=int, default=4096)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(
+        io.StringIO()
+    ):
+        database.db = ConnectionManager(os.path.join(tmp, "bench.db"))
+        database.create_database()
+        database.upsert_users(
+            (i, f"Client {i}", 30, "work", "16GB", "No")
+            for i in range(1, args.users + 1)
+        )
+
+        database.profile_cache = ProfileCache(maxsize=0)
+        uncached = measure(args.reads)
+
+        database.profile_cache = ProfileCache(maxsize=args.maxsize)
+        cached = measure(args.reads)
+        database.create_or_update_user(1, age=31)
+        assert database.get_profile(1).age == 31, "write-through failed"
+
+        for user_id in range(1, args.users + 1):
+            database.get_profile(user_id)
+        stats = database.profile_cache.stats()
+        database.db.close_all()
+
+    print(f"uncached read: {uncached:8.2f} us")
+    print(f"cached read  : {cached:8.2f} us")
+    print(f"after reading {args.users} distinct users: {stats}")
+
+
+if __name__ == "__main__":
+    main()
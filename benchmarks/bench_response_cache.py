@@ -0,0 +1,60 @@
+"""
+finalize_dialogue latency with an empty and a pre-warmed response cache.
+
+    python -m benchmarks.bench_response_cache --latency 0.5
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-scripted")
+
+from benchmarks.scripted_model import ScriptedChatModel, ScriptedPolicy  # noqa: E402
+from src import agent  # noqa: E402
+from src.connection import ConnectionManager  # noqa: E402
+from src.persona import languages  # noqa: E402
+from src.response_cache import ResponseCache  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    model = ScriptedChatModel(policy=ScriptedPolicy(), latency=args.latency)
+    with tempfile.TemporaryDirectory() as tmp:
+        agent.response_cache = ResponseCache(
+            ConnectionManager(os.path.join(tmp, "responses.db"))
+        )
+        state = {"language": "Portuguese", "messages": []}
+
+        start = time.perf_counter()
+        agent.finalize_dialogue(state, model=model)
+        cold = time.perf_counter() - start
+
+        start = time.perf_counter()
+        agent.prewarm_responses(model)
+        prewarm = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for language in languages:
+            agent.finalize_dialogue({**state, "language": language}, model=model)
+        warm = (time.perf_counter() - start) / len(languages)
+
+        # A new process only finds the entries on disk.
+        agent.response_cache = ResponseCache(agent.response_cache.db)
+        start = time.perf_counter()
+        agent.finalize_dialogue(state, model=model)
+        disk = time.perf_counter() - start
+        agent.response_cache.db.close_all()
+
+    print(f"cold (model call)      : {cold * 1e3:10.1f} ms")
+    print(f"prewarm ({len(languages)} languages) : {prewarm * 1e3:10.1f} ms")
+    print(f"warm (memory)          : {warm * 1e6:10.1f} us")
+    print(f"after restart (sqlite) : {disk * 1e6:10.1f} us")
+
+
+if __name__ == "__main__":
+    main()
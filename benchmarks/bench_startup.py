@@ -0,0 +1,134 @@
+"""
+Cold start of the agent: import time, graph construction and first-reply latency,
+each measured in a fresh interpreter, plus how many graphs concurrent sessions build.
+
+    python -m benchmarks.bench_startup --runs 5
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Each snippet runs in a new process and prints the seconds it measured.
+PRELUDE = """
+import contextlib, io, os, time
+os.environ.setdefault("OPENAI_API_KEY", "sk-scripted")
+start = time.perf_counter()
+"""
+
+IMPORT = (
+    PRELUDE
+    + """
+import src.agent
+print(time.perf_counter() - start)
+"""
+)
+
+# What `import src.agent` cost when the model and graph were built at import time.
+IMPORT_AND_BUILD = (
+    PRELUDE
+    + """
+import src.agent
+src.agent.get_graph()
+print(time.perf_counter() - start)
+"""
+)
+
+FIRST_REPLY = (
+    PRELUDE
+    + """
+from langgraph.checkpoint.memory import MemorySaver
+from benchmarks.scripted_model import ScriptedChatModel, ScriptedPolicy
+from src import agent, database
+from src.connection import ConnectionManager
+from src.response_cache import ResponseCache
+
+tmp = os.environ["BENCH_TMP"]
+database.db = ConnectionManager(os.path.join(tmp, "clients.db"))
+agent.response_cache = ResponseCache(
+    ConnectionManager(os.path.join(tmp, "responses.db"))
+)
+with contextlib.redirect_stdout(io.StringIO()):
+    database.create_database()
+
+
+def reply(graph, user_id):
+    config = {"configurable": {"thread_id": user_id, "user_id": user_id}}
+    graph.invoke(
+        {"messages": [("user", "Oi, meu nome é Ana")], "language": "Portuguese"},
+        config,
+    )
+
+
+model = ScriptedChatModel(policy=ScriptedPolicy())
+graph = agent.build_workflow(model, model).compile(checkpointer=MemorySaver())
+reply(graph, "1")
+cold = time.perf_counter() - start
+
+start = time.perf_counter()
+reply(graph, "2")
+print(cold, time.perf_counter() - start)
+"""
+)
+
+SHARED = (
+    PRELUDE
+    + """
+from concurrent.futures import ThreadPoolExecutor
+from src import agent
+
+with ThreadPoolExecutor(16) as executor:
+    graphs = list(executor.map(lambda _: agent.get_graph(), range(64)))
+builds = agent._compiled_graph.cache_info().misses
+other = agent.get_graph(api_key="sk-other")
+print(len({id(graph) for graph in graphs}), builds, other is not graphs[0])
+"""
+)
+
+
+def run(snippet: str, env: dict) -> list:
+    output = subprocess.run(
+        [sys.executable, "-c", snippet],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return output.split()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, "BENCH_TMP": tmp, "PYTHONPATH": os.getcwd()}
+
+        def median(snippet: str, column: int = 0) -> float:
+            return statistics.median(
+                float(run(snippet, env)[column]) for _ in range(args.runs)
+            )
+
+        lazy = median(IMPORT)
+        eager = median(IMPORT_AND_BUILD)
+        replies = [run(FIRST_REPLY, env) for _ in range(args.runs)]
+        cold = statistics.median(float(cold) for cold, _ in replies)
+        warm = statistics.median(float(warm) for _, warm in replies)
+        graphs, builds, keyed = run(SHARED, env)
+
+    print(f"import src.agent           : {lazy * 1e3:8.0f} ms")
+    print(f"import + build graph       : {eager * 1e3:8.0f} ms  (old import cost)")
+    print(f"first reply, cold process  : {cold * 1e3:8.0f} ms")
+    print(f"first reply, graph built   : {warm * 1e3:8.0f} ms")
+    print(
+        f"64 sessions on 16 threads  : {graphs} graph(s), {builds} build(s); "
+        f"another API key gets its own graph: {keyed}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Time to the first token vs time to the whole reply, per assistant reply of a dialogue.
+
+    python -m benchmarks.bench_streaming --latency 0.3 --token-latency 0.05
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from langgraph.checkpoint.memory import MemorySaver
+
+from benchmarks.scripted_model import (
+    DIALOGUES,
+    ScriptedChatModel,
+    ScriptedPolicy,
+)
+from src import agent, database
+from src.agent import STREAMED_NODES
+from src.connection import ConnectionManager
+
+
+def reply_timings(latency: float, token_latency: float) -> list:
+    """Return (first token, whole reply) seconds, measured from the start of each turn."""
+    model = ScriptedChatModel(
+        policy=ScriptedPolicy(), latency=latency, token_latency=token_latency
+    )
+    graph = agent.build_workflow(model, model).compile(checkpointer=MemorySaver())
+
+    timings = []
+    for user_id, dialogue in enumerate(DIALOGUES, start=1):
+        config = {"configurable": {"thread_id": str(user_id), "user_id": str(user_id)}}
+        for utterance, _ in dialogue:
+            started = time.perf_counter()
+            first = {}
+            for mode, event in graph.stream(
+                {"messages": [("user", utterance)], "language": "Portuguese"},
+                config,
+                stream_mode=["messages", "updates"],
+            ):
+                now = time.perf_counter() - started
+                if mode == "messages":
+                    chunk, metadata = event
+                    if metadata["langgraph_node"] in STREAMED_NODES and chunk.content:
+                        first.setdefault(chunk.id, now)
+                else:
+                    for update in event.values():
+                        messages = (update or {}).get("messages")
+                        if not isinstance(messages, list):
+                            messages = [messages]
+                        for message in messages:
+                            if getattr(message, "id", None) in first:
+                                timings.append((first[message.id], now))
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--token-latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(
+        io.StringIO()
+    ):
+        database.db = ConnectionManager(os.path.join(tmp, "bench.db"))
+        database.create_database()
+        timings = reply_timings(args.latency, args.token_latency)
+        database.db.close_all()
+
+    first = sum(t for t, _ in timings) / len(timings)
+    whole = sum(t for _, t in timings) / len(timings)
+    print(f"{len(timings)} streamed replies")
+    print(f"time to first token : {first * 1e3:8.1f} ms")
+    print(f"time to whole reply : {whole * 1e3:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
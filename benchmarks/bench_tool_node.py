@@ -0,0 +1,83 @@
+"""
+Latency of one tool step with several tool calls: ToolNode vs SlotToolNode.
+
+    python -m benchmarks.bench_tool_node --steps 50
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+from langgraph.prebuilt import ToolNode
+
+from src import database
+from src.connection import ConnectionManager
+from src.tools import SlotToolNode, load_tools
+
+
+@tool("check_stock")
+def check_stock(model: str) -> str:
+    """Simulated remote lookup that is not backed by the database."""
+    time.sleep(0.03)
+    return f"{model}: in stock"
+
+
+TOOL_CALLS = [
+    ("inform_name", {"client_name": "Ana"}),
+    ("inform_age", {"age": 30}),
+    ("inform_objective", {"description": "jogos"}),
+    ("inform_ram", {"capacity": "16GB"}),
+    ("inform_gpu", {"needs_gpu": "Sim"}),
+    ("check_stock", {"model": "Nitro 5"}),
+    ("check_stock", {"model": "Legion 5"}),
+    ("get_info", {}),
+]
+
+
+def measure(node, steps: int) -> float:
+    config = {"configurable": {"user_id": "1"}}
+    start = time.perf_counter()
+    for step in range(steps):
+        message = AIMessage(
+            content="",
+            tool_calls=[
+                {"name": name, "args": args, "id": f"call_{step}_{i}"}
+                for i, (name, args) in enumerate(TOOL_CALLS)
+            ],
+        )
+        result = node.invoke({"messages": [message]}, config)
+        assert [m.tool_call_id for m in result["messages"]] == [
+            call["id"] for call in message.tool_calls
+        ]
+    return (time.perf_counter() - start) / steps * 1e3
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--steps", type=int, default=50)
+    args = parser.parse_args()
+
+    tools = load_tools() + [check_stock]
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(
+        io.StringIO()
+    ):
+        database.db = ConnectionManager(os.path.join(tmp, "bench.db"))
+        database.create_database()
+        # Measure the database, not the profile cache.
+        database.profile_cache.maxsize = 0
+        tool_node = measure(ToolNode(tools), args.steps)
+        slot_tool_node = measure(SlotToolNode(tools), args.steps)
+        database.db.close_all()
+
+    print(f"{len(TOOL_CALLS)} tool calls per step (slowest single call: 30ms)")
+    print(f"ToolNode    : {tool_node:6.1f} ms / step")
+    print(f"SlotToolNode: {slot_tool_node:6.1f} ms / step")
+
+
+if __name__ == "__main__":
+    main()
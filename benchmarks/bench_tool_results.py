@@ -0,0 +1,94 @@
+"""
+Prompt tokens per completed dialogue with the profile table vs the key=value delta
+(`age=30 missing=ram,has_gpu`) as the result of the slot tools, on the scripted
+dialogues.
+
+Prompt tokens barely move: the persona prompt dominates every call and finished turns
+are resent without their tool round trips (src/history.py). What shrinks is the tool
+result of the current turn, which also names only the slots that call saved.
+
+    python -m benchmarks.bench_tool_results
+"""
+
+import contextlib
+import io
+import os
+import tempfile
+from unittest import mock
+
+from langchain_core.messages import ToolMessage
+from langgraph.checkpoint.memory import MemorySaver
+
+from benchmarks.scripted_model import (
+    DIALOGUES,
+    ScriptedChatModel,
+    ScriptedPolicy,
+)
+from src import agent, database, tools
+from src.connection import ConnectionManager
+from src.database import ClientProfile
+from src.history import message_tokens
+
+
+def profile_table(profile, columns) -> str:
+    """What every slot tool used to return: the whole profile as a padded table."""
+    return (profile or ClientProfile(id=None)).to_text()
+
+
+def run_dialogues(nlu: bool, batched: bool) -> tuple:
+    """Prompt tokens, tool result tokens and characters per completed dialogue."""
+    model = ScriptedChatModel(policy=ScriptedPolicy(batched=batched))
+    graph = agent.build_workflow(model, model, nlu=nlu).compile(
+        checkpointer=MemorySaver()
+    )
+    result_tokens = result_chars = 0
+    for user_id, dialogue in enumerate(DIALOGUES, start=1):
+        database.delete_user_by_id(user_id)
+        config = {"configurable": {"thread_id": str(user_id), "user_id": str(user_id)}}
+        for utterance, _ in dialogue:
+            graph.invoke(
+                {"messages": [("user", utterance)], "language": "Portuguese"}, config
+            )
+        assert database.get_profile(user_id).needs_gpu is not None
+        for message in graph.get_state(config).values["messages"]:
+            if isinstance(message, ToolMessage):
+                result_tokens += message_tokens(message)
+                result_chars += len(message.content)
+    return tuple(
+        total / len(DIALOGUES)
+        for total in (model.prompt_tokens, result_tokens, result_chars)
+    )
+
+
+def main() -> None:
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(
+        io.StringIO()
+    ):
+        database.db = ConnectionManager(os.path.join(tmp, "bench.db"))
+        database.create_database()
+        for label, nlu, batched in (
+            ("one tool per slot", False, False),
+            ("inform_slots", False, True),
+            ("inform_slots + nlu", True, True),
+        ):
+            with mock.patch.object(tools, "profile_result", profile_table):
+                table = run_dialogues(nlu, batched)
+            delta = run_dialogues(nlu, batched)
+            rows.append((label, table, delta))
+        database.db.close_all()
+
+    print("Estimated tokens (src.history.count_tokens) per completed dialogue")
+    print(
+        f"{'':22}  {'prompt tokens':>23}  {'tool result tokens':>18}  "
+        f"{'tool result chars':>17}"
+    )
+    for label, table, delta in rows:
+        print(
+            f"{label:22}: {table[0]:6.0f} -> {delta[0]:6.0f} ({delta[0] / table[0] - 1:+6.1%})"
+            f"  {table[1]:7.0f} -> {delta[1]:6.0f}  {table[2]:7.0f} -> {delta[2]:5.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Stress test: N concurrent simulated users filling slots, synchronous commits vs write-behind.
+
+    python -m benchmarks.bench_write_behind --users 32 --updates 200
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import threading
+import time
+
+from src import database
+from src.connection import ConnectionManager
+
+SLOTS = [
+    {"name": "Ana"},
+    {"age": 30},
+    {"goal": "gaming"},
+    {"ram": "16GB"},
+    {"needs_gpu": "Yes"},
+]
+
+
+def simulate_user(user_id: int, updates: int, errors: list) -> None:
+    for i in range(updates):
+        database.create_or_update_user(id=user_id, **SLOTS[i % len(SLOTS)])
+        row = database._fetch_user(user_id)
+        if row is None:
+            errors.append(user_id)
+
+
+def run(users: int, updates: int) -> float:
+    errors: list = []
+    threads = [
+        threading.Thread(target=simulate_user, args=(user_id, updates, errors))
+        for user_id in range(1, users + 1)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if database.writer is not None:
+        database.writer.flush()
+    elapsed = time.perf_counter() - start
+    assert not errors, f"read-your-writes violated for {len(errors)} reads"
+    return users * updates / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=32)
+    parser.add_argument("--updates", type=int, default=200)
+    parser.add_argument("--interval", type=float, default=0.02)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(
+        io.StringIO()
+    ):
+        database.db = ConnectionManager(os.path.join(tmp, "bench.db"))
+        database.create_database()
+        sync = run(args.users, args.updates)
+
+        database.enable_write_behind(interval=args.interval)
+        batched = run(args.users, args.updates)
+        batches = database.writer.batches
+        database.disable_write_behind()
+        database.db.close_all()
+
+    print(f"users={args.users} updates/user={args.updates}")
+    print(f"synchronous commits: {sync:10,.0f} writes/s")
+    print(f"write-behind       : {batched:10,.0f} writes/s ({batches} group commits)")
+
+
+if __name__ == "__main__":
+    main()
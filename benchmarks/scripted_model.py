@@ -0,0 +1,277 @@
+"""Deterministic stand-in for ChatOpenAI that plays the sales assistant from a script."""
+
+import ast
+import asyncio
+import itertools
+import json
+import re
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    BaseMessage,
+    HumanMessage,
+    SystemMessage,
+)
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import ConfigDict, PrivateAttr
+
+from src.history import message_tokens
+
+# Slot name in the dialogue scripts -> single-slot tool and its argument.
+SINGLE_SLOT_TOOLS = {
+    "client_name": ("inform_name", "client_name"),
+    "age": ("inform_age", "age"),
+    "goal": ("inform_objective", "description"),
+    "ram": ("inform_ram", "capacity"),
+    "has_gpu": ("inform_gpu", "needs_gpu"),
+}
+PROFILE_LABELS = ("Client Name", "Age", "Goal", "RAM", "GPU")
+SLOT_LABELS = dict(zip(SINGLE_SLOT_TOOLS, PROFILE_LABELS))
+
+# Synthetic customers: each turn is an utterance and the slots it informs.
+DIALOGUES = [
+    [
+        (
+            "Oi, sou a Ana, tenho 30 anos e preciso de 16GB para jogos",
+            {
+                "client_name": "Ana",
+                "age": 30,
+                "goal": "jogos",
+                "ram": "16GB",
+            },
+        ),
+        ("Sim, preciso de GPU", {"has_gpu": "Sim"}),
+    ],
+    [
+        ("Olá!", {}),
+        ("Meu nome é Bruno", {"client_name": "Bruno"}),
+        ("Tenho 45 anos, uso para trabalho", {"age": 45, "goal": "trabalho"}),
+        ("8GB e não preciso de GPU", {"ram": "8GB", "has_gpu": "Não"}),
+    ],
+    [
+        (
+            "Hi, I'm Carla, 22, studying, 8GB, no GPU",
+            {
+                "client_name": "Carla",
+                "age": 22,
+                "goal": "study",
+                "ram": "8GB",
+                "has_gpu": "No",
+            },
+        ),
+    ],
+]
+
+
+def client_info(system_prompt: str) -> dict:
+    """Parse the "Client Info" section of the persona prompt."""
+    info = system_prompt.split("Client Info:", 1)[-1].split("Current Time:", 1)[0]
+    try:
+        return ast.literal_eval(info.strip()) or {}
+    except (ValueError, SyntaxError):
+        return {}
+
+
+class ScriptedPolicy:
+    """
+    Decide the assistant's next message from the prompt alone.
+
+    Slots of the latest utterance are saved with tool calls (one `inform_slots` call,
+    or one single-slot tool per model call), then the profile is confirmed with
+    `SlotFilling` once "Client Info" is complete, otherwise the assistant asks more.
+    """
+
+    def __init__(self, dialogues: List[list] = DIALOGUES, batched: bool = True) -> None:
+        self.slots = {text: slots for dialogue in dialogues for text, slots in dialogue}
+        self.batched = batched
+        self._ids = itertools.count()
+
+    def _call(self, name: str, args: dict) -> dict:
+        return {"name": name, "args": args, "id": f"call_{next(self._ids)}"}
+
+    def __call__(self, messages: List[BaseMessage]) -> AIMessage:
+        system = next((m.content for m in messages if isinstance(m, SystemMessage)), "")
+        if "Client Info:" not in system:
+            # finalize_dialogue / generate_recommendation prompts.
+            return AIMessage(content="Aqui está a sua recomendação de notebook.")
+
+        turn_start = max(
+            (i for i, m in enumerate(messages) if isinstance(m, HumanMessage)),
+            default=0,
+        )
+        saved = set()
+        for message in messages[turn_start:]:
+            for tool_call in getattr(message, "tool_calls", []):
+                if tool_call["name"] == "SlotFilling":
+                    return AIMessage(content="Perfeito, já tenho tudo o que preciso!")
+                saved.update(tool_call["args"])
+        utterance = messages[turn_start].content if messages[turn_start:] else ""
+        info = client_info(system)
+        # Slots already in "Client Info" were saved before the model ran (src.nlu).
+        pending = {
+            slot: value
+            for slot, value in self.slots.get(utterance, {}).items()
+            if slot not in saved
+            and SINGLE_SLOT_TOOLS[slot][1] not in saved
+            and info.get(SLOT_LABELS[slot]) is None
+        }
+
+        if pending and self.batched:
+            return AIMessage(
+                content="", tool_calls=[self._call("inform_slots", pending)]
+            )
+        if pending:
+            slot, value = next(iter(pending.items()))
+            name, arg = SINGLE_SLOT_TOOLS[slot]
+            return AIMessage(content="", tool_calls=[self._call(name, {arg: value})])
+        if all(info.get(label) is not None for label in PROFILE_LABELS):
+            slots = {
+                "client_name": info["Client Name"],
+                "age": info["Age"],
+                "goal": info["Goal"],
+                "ram": info["RAM"],
+                "has_gpu": info["GPU"] not in ("Não", "No"),
+            }
+            return AIMessage(content="", tool_calls=[self._call("SlotFilling", slots)])
+        return AIMessage(
+            content="Pode me contar um pouco mais sobre o que você precisa?"
+        )
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Chat model whose answers come from `policy`, with optional injected latency.
+
+    `latency` is paid before the first token; when streamed, every further word of
+    the answer costs `token_latency`.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    policy: Callable[[List[BaseMessage]], AIMessage]
+    latency: float = 0.0
+    token_latency: float = 0.0
+    _calls: int = PrivateAttr(default=0)
+    _prompt_tokens: int = PrivateAttr(default=0)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    @property
+    def calls(self) -> int:
+        return self._calls
+
+    @property
+    def prompt_tokens(self) -> int:
+        """Estimated tokens of every prompt sent so far (src.history.message_tokens)."""
+        return self._prompt_tokens
+
+    def reset(self) -> None:
+        with self._lock:
+            self._calls = 0
+            self._prompt_tokens = 0
+
+    def bind_tools(self, tools: list, **kwargs: Any) -> "ScriptedChatModel":
+        return self
+
+    def _count(self, messages: List[BaseMessage]) -> None:
+        tokens = sum(message_tokens(message) for message in messages)
+        with self._lock:
+            self._calls += 1
+            self._prompt_tokens += tokens
+
+    def _answer(self, messages: List[BaseMessage]) -> AIMessage:
+        self._count(messages)
+        if self.latency:
+            time.sleep(self.latency)
+        return self.policy(messages)
+
+    async def _aanswer(self, messages: List[BaseMessage]) -> AIMessage:
+        self._count(messages)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self.policy(messages)
+
+    @staticmethod
+    def _words(message: AIMessage) -> List[str]:
+        return re.findall(r"\s*\S+", message.content)
+
+    @staticmethod
+    def _tool_call_chunk(message: AIMessage) -> ChatGenerationChunk:
+        tool_call_chunks = [
+            {
+                "name": tool_call["name"],
+                "args": json.dumps(tool_call["args"]),
+                "id": tool_call["id"],
+                "index": index,
+            }
+            for index, tool_call in enumerate(message.tool_calls)
+        ]
+        return ChatGenerationChunk(
+            message=AIMessageChunk(content="", tool_call_chunks=tool_call_chunks)
+        )
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[Any] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message = self._answer(messages)
+        if self.token_latency and isinstance(message.content, str):
+            time.sleep(self.token_latency * len(message.content.split()))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[Any] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message = await self._aanswer(messages)
+        if self.token_latency and isinstance(message.content, str):
+            await asyncio.sleep(self.token_latency * len(message.content.split()))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[Any] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        message = self._answer(messages)
+        for i, word in enumerate(self._words(message)):
+            if i and self.token_latency:
+                time.sleep(self.token_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word))
+        if message.tool_calls:
+            yield self._tool_call_chunk(message)
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[Any] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        message = await self._aanswer(messages)
+        for i, word in enumerate(self._words(message)):
+            if i and self.token_latency:
+                await asyncio.sleep(self.token_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word))
+        if message.tool_calls:
+            yield self._tool_call_chunk(message)
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"latency": self.latency}
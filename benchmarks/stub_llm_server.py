@@ -0,0 +1,153 @@
+"""
+Local stand-in for the OpenAI chat completions endpoint, with latency and a rate limit.
+
+Requests beyond `rpm` per minute (enforced per second, as providers do) get a 429
+with Retry-After, so clients and src.llm_scheduler can be exercised without a key:
+
+    python -m benchmarks.stub_llm_server --port 8765 --rpm 600 --latency 0.1
+    # base_url="http://127.0.0.1:8765/v1", api_key="sk-stub"
+"""
+
+import argparse
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY = "Claro! Posso ajudar a escolher o notebook ideal para você."
+
+
+class StubLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self, port: int = 0, rpm: float = 600, latency: float = 0.1, retry_after=1
+    ) -> None:
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.per_second = max(1, int(rpm / 60))
+        self.latency = latency
+        self.retry_after = retry_after
+        self.stats = {"requests": 0, "ok": 0, "rate_limited": 0}
+        self._recent: deque = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def admit(self) -> bool:
+        """Whether one more request fits in the last second."""
+        now = time.monotonic()
+        with self._lock:
+            self.stats["requests"] += 1
+            while self._recent and now - self._recent[0] >= 1.0:
+                self._recent.popleft()
+            if len(self._recent) >= self.per_second:
+                self.stats["rate_limited"] += 1
+                return False
+            self._recent.append(now)
+            self.stats["ok"] += 1
+            return True
+
+    def start(self) -> "StubLLMServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: StubLLMServer
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _json(self, status: int, body: dict, headers: dict = {}) -> None:
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self) -> None:
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if not self.server.admit():
+            self._json(
+                429,
+                {
+                    "error": {
+                        "message": "Rate limit reached for requests",
+                        "type": "requests",
+                        "code": "rate_limit_exceeded",
+                    }
+                },
+                {"retry-after": str(self.server.retry_after)},
+            )
+            return
+
+        time.sleep(self.server.latency)
+        prompt = sum(len(str(m.get("content") or "")) for m in request["messages"]) // 4
+        usage = {
+            "prompt_tokens": prompt,
+            "completion_tokens": len(REPLY.split()),
+            "total_tokens": prompt + len(REPLY.split()),
+        }
+        base = {"id": "chatcmpl-stub", "created": int(time.time()), "model": "stub"}
+        if not request.get("stream"):
+            message = {"role": "assistant", "content": REPLY}
+            choice = {"index": 0, "message": message, "finish_reason": "stop"}
+            self._json(
+                200,
+                base
+                | {"object": "chat.completion", "choices": [choice], "usage": usage},
+            )
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+
+        def send(chunk) -> None:
+            self.wfile.write(f"data: {chunk}\n\n".encode())
+
+        for i, word in enumerate(REPLY.split(" ")):
+            delta = {"role": "assistant", "content": word if not i else " " + word}
+            choice = {"index": 0, "delta": delta, "finish_reason": None}
+            send(
+                json.dumps(
+                    base | {"object": "chat.completion.chunk", "choices": [choice]}
+                )
+            )
+        choice = {"index": 0, "delta": {}, "finish_reason": "stop"}
+        send(
+            json.dumps(base | {"object": "chat.completion.chunk", "choices": [choice]})
+        )
+        if (request.get("stream_options") or {}).get("include_usage"):
+            send(
+                json.dumps(
+                    base
+                    | {"object": "chat.completion.chunk", "choices": [], "usage": usage}
+                )
+            )
+        send("[DONE]")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rpm", type=float, default=600)
+    parser.add_argument("--latency", type=float, default=0.1)
+    args = parser.parse_args()
+    server = StubLLMServer(args.port, rpm=args.rpm, latency=args.latency)
+    print(f"Serving {server.base_url} ({server.per_second} requests per second)")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,43 @@
 import os
-from typing import Literal, Optional, TypedDict
+import threading
+from functools import lru_cache, partial
+from typing import List, Optional, Tuple, TypedDict, Union
 
 from langchain_core.prompt_values import PromptValue
 from typing_extensions import Annotated
 
-from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.messages import (
+    AIMessage,
+    HumanMessage,
+    ToolMessage,
+    message_chunk_to_message,
+)
 from langchain_core.runnables import RunnableConfig
-from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
-from langgraph.prebuilt import ToolNode, tools_condition
-
-from langchain_openai import ChatOpenAI
-
-from src.database import get_user_by_id
+from langgraph.utils.runnable import RunnableCallable
+
+from src import instrumentation
+from src.async_database import acreate_or_update_user, aget_profile, run
+from src.checkpointer import SQLiteCheckpointer
+from src.connection import ConnectionManager
+from src.database import (
+    ClientProfile,
+    create_or_update_user,
+    filename as database_filename,
+    get_profile,
+)
+from src.history import HISTORY_TOKEN_BUDGET, HISTORY_TURNS, compact_history
+from src.nlu import confirms, extract_slots, slot_row
 from src.recommendation_system import simple_recommendation_system
-from src.tools import load_tools
-from src.persona import system_prompt_template as persona
+from src.tools import SlotToolNode, load_tools
+from src.persona import (
+    confirmation_templates,
+    languages,
+    system_prompt_template as persona,
+)
+from src.response_cache import ResponseCache
+from src.slot_filling import SLOT_COLUMNS
 
 
 class DialogStateTracking(TypedDict):
@@ -25,12 +46,19 @@ class DialogStateTracking(TypedDict):
     language: Optional[str] = "Portuguese"
     user_info: Optional[dict] = dict()
     user_message: Optional[str] = None
+    summary: Optional[str] = None
+    summarized: Optional[int] = 0
+    recommended: Optional[bool] = False
+    # Whether the saved profile was already complete when the session began.
+    returning: Optional[bool] = None
     finished = False
     messages: Annotated[list, add_messages]
 
 
-def domain_state_tracker(user_id: int, messages: list, language: str) -> PromptValue:
-    user_info = get_user_by_id(id=user_id).to_dict(orient="records")
+def persona_prompt(
+    profile: Optional[ClientProfile], messages: list, language: str
+) -> Tuple[PromptValue, dict]:
+    user_info = profile.to_record() if profile else dict()
     return (
         persona.invoke(
             {
@@ -43,31 +71,139 @@ def domain_state_tracker(user_id: int, messages: list, language: str) -> PromptV
     )
 
 
-# Nodes
-def call_llm(state: DialogStateTracking, config: RunnableConfig) -> dict:
-    configuration = config.get("configurable", dict())
-    user_id = configuration.get("user_id")
+def domain_state_tracker(
+    user_id: int, messages: list, language: str
+) -> Tuple[PromptValue, dict]:
+    return persona_prompt(get_profile(id=user_id), messages, language)
+
+
+async def adomain_state_tracker(
+    user_id: int, messages: list, language: str
+) -> Tuple[PromptValue, dict]:
+    return persona_prompt(await aget_profile(id=user_id), messages, language)
+
+
+def stream_llm(model, messages) -> AIMessage:
+    """
+    Call `model` chunk by chunk and return the whole reply.
+
+    Each chunk goes through the callbacks as it arrives, which is what lets
+    stream_mode="messages" hand tokens to the UI before the node finishes.
+    """
+    reply = None
+    for chunk in model.stream(messages):
+        reply = chunk if reply is None else reply + chunk
+    return message_chunk_to_message(reply)
+
+
+async def astream_llm(model, messages) -> AIMessage:
+    reply = None
+    async for chunk in model.astream(messages):
+        reply = chunk if reply is None else reply + chunk
+    return message_chunk_to_message(reply)
+
+
+def configured_user_id(config: RunnableConfig):
+    user_id = config.get("configurable", dict()).get("user_id")
 
     if not user_id:
         raise ValueError("No User ID configured.")
 
-    messages, user_info = domain_state_tracker(
-        user_id, state["messages"], state["language"]
+    return user_id
+
+
+def dialogue_history(state: DialogStateTracking, config: RunnableConfig) -> tuple:
+    """Return the user id and the compacted history (window, summary, summarized)."""
+    configuration = config.get("configurable", dict())
+    user_id = configured_user_id(config)
+
+    return user_id, compact_history(
+        state["messages"],
+        summary=state.get("summary"),
+        summarized=state.get("summarized") or 0,
+        budget=configuration.get("history_token_budget", HISTORY_TOKEN_BUDGET),
+        keep_turns=configuration.get("history_turns", HISTORY_TURNS),
     )
-    ai_message = llm_with_tool.invoke(messages)
-    if isinstance(ai_message, AIMessage) and ai_message.tool_calls:
-        args = ai_message.tool_calls[0]["args"]
-        print("\n\nARGS:", args)
 
-    return {"messages": ai_message, "user_info": user_info}
 
+def agent_update(
+    ai_message: AIMessage, user_info: dict, summary: Optional[str], summarized: int
+) -> dict:
+    if isinstance(ai_message, AIMessage):
+        for tool_call in ai_message.tool_calls:
+            instrumentation.count("tool_calls", tool=tool_call["name"])
 
-def finalize_dialogue(state: DialogStateTracking):
-    """
-    Add a tool message to the history so the graph can see that it`s time to create the user story
-    """
-    language = state["language"]
-    prompt = [
+    return {
+        "messages": ai_message,
+        "user_info": user_info,
+        "summary": summary,
+        "summarized": summarized,
+    }
+
+
+def utterance_slots(state: DialogStateTracking) -> dict:
+    """Slots the rules can read from the client's latest message."""
+    messages = state["messages"]
+    if not messages or not isinstance(messages[-1], HumanMessage):
+        return {}
+    if not isinstance(text := messages[-1].content, str):
+        return {}
+    slots = extract_slots(text)
+    for name in slots:
+        instrumentation.count("nlu_slots", slot=name)
+    return slots
+
+
+# Nodes, each with an async variant used when the graph runs on an event loop.
+def pre_extract_slots(state: DialogStateTracking, config: RunnableConfig) -> dict:
+    """Save the unambiguous slots of the client's message before the model sees it."""
+    user_id = configured_user_id(config)
+    update = {}
+    if state.get("returning") is None:
+        # First turn: was the profile complete before anything is written?
+        update["returning"] = profile_complete(get_profile(id=user_id))
+    if not (slots := utterance_slots(state)):
+        return {**update, "user_info": state.get("user_info") or dict()}
+    create_or_update_user(id=user_id, **slot_row(slots))
+    profile = get_profile(id=user_id)
+    return {**update, "user_info": profile.to_record() if profile else dict()}
+
+
+async def apre_extract_slots(
+    state: DialogStateTracking, config: RunnableConfig
+) -> dict:
+    user_id = configured_user_id(config)
+    update = {}
+    if state.get("returning") is None:
+        update["returning"] = profile_complete(await aget_profile(id=user_id))
+    if not (slots := utterance_slots(state)):
+        return {**update, "user_info": state.get("user_info") or dict()}
+    await acreate_or_update_user(id=user_id, **slot_row(slots))
+    profile = await aget_profile(id=user_id)
+    return {**update, "user_info": profile.to_record() if profile else dict()}
+
+
+# `model` is bound by build_workflow.
+def call_llm(state: DialogStateTracking, config: RunnableConfig, *, model) -> dict:
+    user_id, (history, summary, summarized) = dialogue_history(state, config)
+    messages, user_info = domain_state_tracker(user_id, history, state["language"])
+    ai_message = stream_llm(model, messages)
+    return agent_update(ai_message, user_info, summary, summarized)
+
+
+async def acall_llm(
+    state: DialogStateTracking, config: RunnableConfig, *, model
+) -> dict:
+    user_id, (history, summary, summarized) = dialogue_history(state, config)
+    messages, user_info = await adomain_state_tracker(
+        user_id, history, state["language"]
+    )
+    ai_message = await astream_llm(model, messages)
+    return agent_update(ai_message, user_info, summary, summarized)
+
+
+def finalize_prompt(language: str) -> list:
+    return [
         HumanMessage(
             content=f"""
         Say you are generating a personalized notebook recommendation based on the information you have gathered.
@@ -77,68 +213,369 @@ def finalize_dialogue(state: DialogStateTracking):
         """
         )
     ]
-    response = llm.invoke(prompt)
 
-    return {"messages": [response]}
 
+def prewarm_responses(model, languages: list = languages) -> None:
+    """Fill the response cache for every language offered in the UI."""
+    for language in languages:
+        response_cache.invoke(model, finalize_prompt(language))
 
-def generate_recommendation(state: DialogStateTracking) -> dict:
-    messages = simple_recommendation_system(
-        user_info=state["user_info"],
+
+def slot_filling_results(messages: list) -> List[ToolMessage]:
+    """
+    Results for the SlotFilling calls of the last model reply that no tool answered.
+
+    SlotFilling only hands over to the closing nodes, but every tool call still needs
+    its ToolMessage for the history to be sent to the model again.
+    """
+    for message in reversed(messages):
+        if isinstance(message, AIMessage):
+            return [
+                ToolMessage(content="confirmed", tool_call_id=tool_call["id"])
+                for tool_call in message.tool_calls
+                if tool_call["name"] == "SlotFilling"
+            ]
+        if isinstance(message, ToolMessage):
+            return []
+    return []
+
+
+def finalize_dialogue(state: DialogStateTracking, *, model):
+    """
+    Add a tool message to the history so the graph can see that it`s time to create the user story
+    """
+    # The prompt only depends on the language, so the answer is served from the cache.
+    response = response_cache.invoke(model, finalize_prompt(state["language"]))
+
+    return {"messages": slot_filling_results(state["messages"]) + [response]}
+
+
+async def afinalize_dialogue(state: DialogStateTracking, *, model):
+    response = await response_cache.ainvoke(model, finalize_prompt(state["language"]))
+
+    return {"messages": slot_filling_results(state["messages"]) + [response]}
+
+
+# Products from the catalog the model chooses and words the recommendation from.
+RECOMMENDATIONS = 5
+
+
+def recommendation_prompt(
+    state: DialogStateTracking, profile: Optional[ClientProfile]
+) -> list:
+    # numpy is only needed once a recommendation is due, keep it off the import path.
+    from src.catalog import recommend
+
+    # The model may not have run this turn, so state["user_info"] can be stale.
+    user_info = profile.to_record() if profile else state["user_info"] or dict()
+    return simple_recommendation_system(
+        user_info=user_info,
         messages=state["messages"],
         language=state["language"],
+        candidates=recommend(user_info, k=RECOMMENDATIONS),
     )
-    response = llm.invoke(messages)
 
-    return {"messages": [response]}
 
+def generate_recommendation(
+    state: DialogStateTracking, config: RunnableConfig, *, model
+) -> dict:
+    profile = get_profile(id=configured_user_id(config))
+    response = stream_llm(model, recommendation_prompt(state, profile))
 
-def dialog_policy_learning(
+    return {
+        "messages": [response],
+        "user_info": profile.to_record() if profile else state["user_info"] or dict(),
+        "recommended": True,
+    }
+
+
+async def agenerate_recommendation(
+    state: DialogStateTracking, config: RunnableConfig, *, model
+) -> dict:
+    profile = await aget_profile(id=configured_user_id(config))
+    # Loading the catalog reads the Products table on first use.
+    prompt = await run(recommendation_prompt, state, profile)
+    response = await astream_llm(model, prompt)
+
+    return {
+        "messages": [response],
+        "user_info": profile.to_record() if profile else state["user_info"] or dict(),
+        "recommended": True,
+    }
+
+
+# A confirmation reply is told apart from the model's by its name.
+CONFIRMATION = "confirm_profile"
+
+
+def confirmation_message(profile: ClientProfile, language: str) -> AIMessage:
+    """Ask the client, without the model, whether the saved profile is still right."""
+    details = ", ".join(
+        f"{label}: {value}"
+        for label, value in profile.to_record().items()
+        if label not in ("id", "Client Name")
+    )
+    template = confirmation_templates.get(language, confirmation_templates["English"])
+    return AIMessage(
+        content=template.format(name=profile.name, details=details),
+        name=CONFIRMATION,
+    )
+
+
+def confirm_profile(state: DialogStateTracking, config: RunnableConfig) -> dict:
+    profile = get_profile(id=configured_user_id(config))
+    return {"messages": [confirmation_message(profile, state["language"])]}
+
+
+async def aconfirm_profile(state: DialogStateTracking, config: RunnableConfig) -> dict:
+    profile = await aget_profile(id=configured_user_id(config))
+    return {"messages": [confirmation_message(profile, state["language"])]}
+
+
+# Nodes whose replies are shown to the client token by token.
+STREAMED_NODES = {"agent", "generate_recommendation"}
+
+
+# The interim message and the recommendation do not depend on each other, so both
+# run in the same step.
+CLOSING_NODES = ["finalize_dialogue", "generate_recommendation"]
+
+
+def profile_complete(profile: Optional[ClientProfile]) -> bool:
+    """Whether the profile already holds every SlotFilling field."""
+    return profile is not None and all(
+        getattr(profile, column) is not None for column in SLOT_COLUMNS.values()
+    )
+
+
+def model_step(messages: list) -> Optional[Union[List[str], str]]:
+    """Next step decided by the model's last reply, or None if it is not up to it."""
+    last = messages[-1]
+    if isinstance(last, AIMessage):
+        if not last.tool_calls:
+            return END
+        if all(call["name"] == "SlotFilling" for call in last.tool_calls):
+            return CLOSING_NODES
+        # The other tools run first; SlotFilling is seen again once they are done.
+        return "tools"
+    if isinstance(last, ToolMessage):
+        reply = next((m for m in reversed(messages) if isinstance(m, AIMessage)), None)
+        if reply and any(call["name"] == "SlotFilling" for call in reply.tool_calls):
+            return CLOSING_NODES
+    return None
+
+
+def profile_step(
     state: DialogStateTracking,
-) -> Literal["finalize_dialogue", END]:
-    """Dialogue Policy Learning (DPL) is responsable to determine the next step to take."""
-    messages = state["messages"]
+    config: RunnableConfig,
+    profile: Optional[ClientProfile],
+) -> Union[List[str], str]:
+    """
+    Skip the model when the saved profile already answers every SlotFilling field.
 
-    if isinstance(messages[-1], AIMessage) and messages[-1].tool_calls:
-        print("tool", messages[-1].tool_calls)
-        if messages[-1].tool_calls[-1]["name"] == "SlotFilling":
-            return "finalize_dialogue"
+    Until the first recommendation of the conversation, a complete profile goes
+    straight to the closing nodes. With `confirm_profile` configured, a profile that
+    was complete before the session began is confirmed once by the client: a plain
+    yes recommends, anything else goes to the model.
+    """
+    messages = state["messages"]
+    if state.get("recommended") or not profile_complete(profile):
+        return "agent"
+    returning = state.get("returning")
+    if returning is None:
+        # Without the nlu node, only the tools can have written during the session.
+        returning = not any(isinstance(message, ToolMessage) for message in messages)
+    if returning and config.get("configurable", dict()).get("confirm_profile"):
+        if len(messages) > 1 and messages[-2].name == CONFIRMATION:
+            answer = messages[-1].content
+            if not (isinstance(answer, str) and confirms(answer)):
+                return "agent"
+        elif any(message.name == CONFIRMATION for message in messages):
+            return "agent"
         else:
-            return END
-    else:
-        return END
+            instrumentation.count("policy", step="confirm_profile")
+            return CONFIRMATION
+    instrumentation.count("policy", step="fast_path")
+    return CLOSING_NODES
 
 
-# Definindo o LLM
+def dialog_policy_learning(
+    state: DialogStateTracking, config: RunnableConfig
+) -> Union[List[str], str]:
+    """
+    Dialogue Policy Learning (DPL) is responsable to determine the next step to take.
+
+    It is the one router of the graph: after the slot extraction, the model and the
+    tools, the step comes from the model's tool calls or else from the saved profile.
+    """
+    if (step := model_step(state["messages"])) is not None:
+        return step
+    return profile_step(state, config, get_profile(id=configured_user_id(config)))
+
+
+async def adialog_policy_learning(
+    state: DialogStateTracking, config: RunnableConfig
+) -> Union[List[str], str]:
+    if (step := model_step(state["messages"])) is not None:
+        return step
+    profile = await aget_profile(id=configured_user_id(config))
+    return profile_step(state, config, profile)
+
+
+def async_node(name: str, func, afunc) -> RunnableCallable:
+    """Node that runs `afunc` under ainvoke/astream and `func` otherwise."""
+    return RunnableCallable(
+        instrumentation.timed("node", name)(func),
+        instrumentation.timed("node", name)(afunc),
+        name=name,
+        trace=False,
+    )
 
-llm = ChatOpenAI(
-    model="gpt-4o",
-    openai_api_key=os.environ.get("OPENAI_API_KEY"),
-    temperature=0,
+
+# Answers to prompts that do not depend on the dialogue, persisted next to the clients database.
+response_cache = ResponseCache(
+    ConnectionManager(os.path.join(os.path.dirname(database_filename), "responses.db"))
 )
 
-tools = load_tools()
-llm_with_tool = llm.bind_tools(tools)
+MODEL = "gpt-4o"
+
+
+# Definindo o LLM
+@lru_cache(maxsize=8)
+def _chat_model(api_key: Optional[str], model: str, temperature: float):
+    # langchain_openai (and openai) take a good part of the start-up time.
+    from langchain_openai import ChatOpenAI
+
+    from src.llm_scheduler import ScheduledChatModel, get_scheduler
+
+    return ScheduledChatModel(
+        model=ChatOpenAI(
+            model=model,
+            openai_api_key=api_key,
+            temperature=temperature,
+            # Token usage is only reported for streamed replies when asked for.
+            stream_usage=True,
+            # Retries are left to the scheduler, which coordinates every session.
+            max_retries=0,
+        ),
+        scheduler=get_scheduler(),
+        callbacks=[instrumentation.llm_usage],
+    )
+
+
+def get_llm(api_key: Optional[str] = None, model: str = MODEL, temperature: float = 0):
+    """
+    Chat model shared by the whole process for these settings.
+
+    Its calls go through the process-wide scheduler of src.llm_scheduler.
+    """
+    return _chat_model(api_key or os.environ.get("OPENAI_API_KEY"), model, temperature)
+
 
 # Definindo o grafo
-workflow = StateGraph(DialogStateTracking)
-workflow.add_node("agent", call_llm)
+def build_workflow(llm, llm_with_tool=None, nlu: bool = True) -> StateGraph:
+    """
+    Assemble the dialogue graph around `llm`; the tools are bound to it if needed.
 
-tool_node = ToolNode(tools=tools)
-workflow.add_node("tools", tool_node)
+    With `nlu`, every turn starts with the rule-based slot extraction of src.nlu.
+    """
+    tools = load_tools()
+    if llm_with_tool is None:
+        llm_with_tool = llm.bind_tools(tools)
+
+    workflow = StateGraph(DialogStateTracking)
+    if nlu:
+        workflow.add_node(
+            "nlu", async_node("nlu", pre_extract_slots, apre_extract_slots)
+        )
+    workflow.add_node(
+        "agent",
+        async_node(
+            "agent",
+            partial(call_llm, model=llm_with_tool),
+            partial(acall_llm, model=llm_with_tool),
+        ),
+    )
+    workflow.add_node("tools", SlotToolNode(tools=tools))
+    workflow.add_node(
+        CONFIRMATION, async_node(CONFIRMATION, confirm_profile, aconfirm_profile)
+    )
+    workflow.add_node(
+        "finalize_dialogue",
+        async_node(
+            "finalize_dialogue",
+            partial(finalize_dialogue, model=llm),
+            partial(afinalize_dialogue, model=llm),
+        ),
+    )
+    workflow.add_node(
+        "generate_recommendation",
+        async_node(
+            "generate_recommendation",
+            partial(generate_recommendation, model=llm),
+            partial(agenerate_recommendation, model=llm),
+        ),
+    )
+
+    # Definindo as conexões
+    if nlu:
+        workflow.add_edge(START, "nlu")
+    # Every step that can precede the model goes through the same router.
+    router = RunnableCallable(
+        dialog_policy_learning,
+        adialog_policy_learning,
+        name="dialog_policy_learning",
+        trace=False,
+    )
+    destinations = ["agent", "tools", CONFIRMATION, *CLOSING_NODES, END]
+    for source in ("nlu" if nlu else START, "agent", "tools"):
+        workflow.add_conditional_edges(source, router, destinations)
+
+    workflow.add_edge(CONFIRMATION, END)
+    workflow.add_edge("finalize_dialogue", END)
+    workflow.add_edge("generate_recommendation", END)
+    return workflow
+
+
+@lru_cache(maxsize=1)
+def get_checkpointer() -> SQLiteCheckpointer:
+    """Conversations are persisted next to the clients database."""
+    return SQLiteCheckpointer(
+        os.path.join(os.path.dirname(database_filename), "checkpoints.db")
+    )
+
+
+@lru_cache(maxsize=8)
+def _compiled_graph(api_key: Optional[str], model: str, temperature: float):
+    return build_workflow(_chat_model(api_key, model, temperature)).compile(
+        checkpointer=get_checkpointer()
+    )
 
-workflow.add_node("finalize_dialogue", finalize_dialogue)
-workflow.add_node("generate_recommendation", generate_recommendation)
 
-# Definindo as conexões
-workflow.add_edge(START, "agent")
+_graph_lock = threading.Lock()
 
-workflow.add_conditional_edges("agent", tools_condition)
-workflow.add_edge("tools", "agent")
 
-workflow.add_conditional_edges("agent", dialog_policy_learning)
-workflow.add_edge("finalize_dialogue", "generate_recommendation")
-workflow.add_edge("generate_recommendation", END)
+def get_graph(
+    api_key: Optional[str] = None, model: str = MODEL, temperature: float = 0
+):
+    """
+    Compiled graph shared by every session of the process for these model settings.
+
+    It is built on the first call; concurrent first calls wait for that one build.
+    """
+    with _graph_lock:
+        return _compiled_graph(
+            api_key or os.environ.get("OPENAI_API_KEY"), model, temperature
+        )
+
 
-memory = MemorySaver()
-graph = workflow.compile(checkpointer=memory)
+def __getattr__(name: str):
+    # `from src.agent import graph` (and llm, llm_with_tool) keep working, built on
+    # first access instead of at import time.
+    if name == "graph":
+        return get_graph()
+    if name == "llm":
+        return get_llm()
+    if name == "llm_with_tool":
+        return get_llm().bind_tools(load_tools())
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,73 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Optional
+
+from src import database
+from src.database import ClientProfile
+
+# SQLite calls never run on the event loop; at most this many run at once, each on a
+# worker thread that keeps its own connection.
+DB_WORKERS = int(os.environ.get("DB_WORKERS", 8))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_pid: Optional[int] = None
+_lock = threading.Lock()
+
+
+def executor() -> ThreadPoolExecutor:
+    """Return the bounded executor shared by every async database call."""
+    global _executor, _executor_pid
+    with _lock:
+        # A forked worker needs threads of its own.
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(
+                max_workers=DB_WORKERS, thread_name_prefix="db"
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+
+async def run(func: Callable, *args, **kwargs):
+    """Run a blocking database call on the bounded executor."""
+    return await asyncio.get_running_loop().run_in_executor(
+        executor(), partial(func, *args, **kwargs)
+    )
+
+
+async def aget_profile(id: int) -> Optional[ClientProfile]:
+    """Async get_profile; cached profiles are returned without leaving the loop."""
+    row = database.profile_cache.get(database._key(id))
+    if row is not database.MISSING:
+        return ClientProfile(*row) if row else None
+    return await run(database.get_profile, id)
+
+
+async def acreate_or_update_user(
+    id: id,
+    name: str = None,
+    age: int = None,
+    goal: str = None,
+    ram: str = None,
+    needs_gpu: str = None,
+) -> None:
+    """Async create_or_update_user; with write-behind enabled it never blocks."""
+    write = partial(
+        database.create_or_update_user,
+        id,
+        name=name,
+        age=age,
+        goal=goal,
+        ram=ram,
+        needs_gpu=needs_gpu,
+    )
+    if database.writer is not None:
+        # Only queues the row in memory.
+        return write()
+    return await run(write)
+
+
+async def adelete_user_by_id(id: int) -> bool:
+    return await run(database.delete_user_by_id, id)
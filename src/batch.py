@@ -0,0 +1,289 @@
+"""
+Batch slot filling over archived conversations, outside the chat UI.
+
+    python -m src.batch conversations.jsonl --workers 4
+    python -m src.batch conversations.jsonl --mode graph --workers 2
+
+Each line of the input is one conversation:
+
+    {"user_id": 42, "language": "Portuguese",
+     "messages": [{"role": "user", "content": "..."}, ...]}
+
+The client's messages go through the rule-based extraction of src.nlu (`--mode nlu`)
+or are replayed through the dialogue graph and its model (`--mode graph`), in a pool
+of worker processes that each build their own graph. Profiles are merged into the
+Clients table one transaction per chunk, and after every chunk the input offset is
+saved to a checkpoint file, so an interrupted run resumes where it stopped.
+
+In graph mode every worker has its own LLM scheduler: divide the LLM_*_PER_MINUTE
+limits by the number of workers.
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from src import database
+from src.connection import ConnectionManager
+from src.database import COLUMNS, upsert_users
+from src.nlu import extract_slots, slot_row
+
+MODES = ("nlu", "graph")
+
+
+def read_conversations(
+    path: str, offset: int = 0
+) -> Iterator[Tuple[int, Optional[dict]]]:
+    """
+    Yield (offset after the line, conversation) for every line from `offset` on.
+
+    Lines that are blank or not a conversation yield None, so the offset still moves.
+    """
+    with open(path, "rb") as file:
+        file.seek(offset)
+        while line := file.readline():
+            end = file.tell()
+            if not line.strip():
+                yield end, None
+                continue
+            try:
+                conversation = json.loads(line)
+            except ValueError as e:
+                print("read_conversations:", e)
+                yield end, None
+                continue
+            if not isinstance(conversation, dict) or "user_id" not in conversation:
+                print("read_conversations: no user_id at offset", end)
+                yield end, None
+                continue
+            yield end, conversation
+
+
+def client_messages(conversation: dict) -> List[str]:
+    """The client's side of the conversation, in order."""
+    return [
+        message["content"]
+        for message in conversation.get("messages") or []
+        if (message.get("role") or message.get("type")) in ("user", "human")
+        and isinstance(message.get("content"), str)
+    ]
+
+
+# Set in each worker process by _init_worker.
+_mode = "nlu"
+_graph = None
+
+
+def _init_worker(mode: str, workdir: str, model_factory: Optional[Callable]) -> None:
+    global _mode, _graph
+    _mode = mode
+    if mode != "graph":
+        return
+    # The graph's tools write to a database of the worker's own; only the finished
+    # profiles go back to the parent, which merges them into Clients.
+    database.db = ConnectionManager(os.path.join(workdir, f"worker_{os.getpid()}.db"))
+    database.create_database()
+
+    from src import agent
+    from src.llm_scheduler import BACKGROUND
+
+    llm = model_factory() if model_factory else agent.get_llm()
+    if hasattr(llm, "with_priority"):
+        llm = llm.with_priority(BACKGROUND)
+    _graph = agent.build_workflow(llm).compile()
+
+
+def _extract(user_id, conversation: dict) -> tuple:
+    slots = {}
+    # Later answers correct earlier ones.
+    for text in client_messages(conversation):
+        slots.update(extract_slots(text))
+    fields = slot_row(slots)
+    return (user_id, *(fields.get(column) for column in COLUMNS[1:]))
+
+
+def _replay(user_id, conversation: dict) -> tuple:
+    config = {"configurable": {"user_id": str(user_id)}}
+    database.delete_user_by_id(user_id)
+    # No checkpointer: the state is carried from turn to turn here and dropped after.
+    state = {"messages": [], "language": conversation.get("language") or "Portuguese"}
+    for text in client_messages(conversation):
+        state = _graph.invoke(
+            {**state, "messages": state["messages"] + [("user", text)]}, config
+        )
+    profile = database.get_profile(user_id)
+    database.delete_user_by_id(user_id)
+    return tuple(profile) if profile else (user_id,) + (None,) * (len(COLUMNS) - 1)
+
+
+def process_batch(conversations: List[dict]) -> Tuple[List[tuple], int]:
+    """Profiles found in `conversations` and the number of conversations that failed."""
+    rows, errors = [], 0
+    for conversation in conversations:
+        try:
+            user_id = database.client_id(conversation["user_id"])
+            row = (_replay if _mode == "graph" else _extract)(user_id, conversation)
+        except Exception as e:
+            print("process_batch:", conversation.get("user_id"), e)
+            errors += 1
+            continue
+        if any(value is not None for value in row[1:]):
+            rows.append(row)
+    return rows, errors
+
+
+def _batches(lines: Iterator, size: int) -> Iterator[Tuple[int, int, List[dict]]]:
+    """(offset after the batch, lines read, conversations) for `size` lines at a time."""
+    while chunk := list(islice(lines, size)):
+        yield chunk[-1][0], len(chunk), [c for _, c in chunk if c is not None]
+
+
+def load_checkpoint(path: Optional[str], source: str) -> dict:
+    """Progress saved for `source`, or a fresh start if there is none."""
+    state = {}
+    if path and os.path.exists(path):
+        try:
+            with open(path) as file:
+                state = json.load(file)
+        except (OSError, ValueError) as e:
+            print("load_checkpoint:", e)
+    if state.get("input") != os.path.abspath(source):
+        state = {}
+    return {
+        "input": os.path.abspath(source),
+        "offset": 0,
+        "lines": 0,
+        "conversations": 0,
+        "profiles": 0,
+        "errors": 0,
+        **state,
+    }
+
+
+def save_checkpoint(path: str, state: dict) -> None:
+    # Written aside and renamed, so a crash never leaves half a checkpoint.
+    with open(path + ".tmp", "w") as file:
+        json.dump(state, file)
+    os.replace(path + ".tmp", path)
+
+
+def run_batch(
+    path: str,
+    mode: str = "nlu",
+    workers: Optional[int] = None,
+    batch_size: int = 200,
+    chunk_size: int = 5_000,
+    checkpoint: Optional[str] = None,
+    restart: bool = False,
+    limit: Optional[int] = None,
+    model_factory: Optional[Callable] = None,
+) -> dict:
+    """
+    Fill the Clients table from the conversations in `path` and return the totals.
+
+    At most two batches per worker are in flight and at most `chunk_size` profiles
+    wait to be written, so memory does not grow with the input. `limit` stops after
+    that many more lines, e.g. to sample a large archive.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode: {mode!r}")
+    workers = workers or os.cpu_count() or 1
+    checkpoint = checkpoint or path + ".checkpoint"
+    state = load_checkpoint(None if restart else checkpoint, path)
+    database.create_database()
+
+    start = time.perf_counter()
+    done = 0
+    rows: List[tuple] = []
+
+    def flush() -> None:
+        state["profiles"] += upsert_users(rows, chunk_size=chunk_size)
+        rows.clear()
+        save_checkpoint(checkpoint, state)
+        elapsed = time.perf_counter() - start
+        print(
+            f"batch: {state['lines']} lines, {state['profiles']} profiles, "
+            f"{done / elapsed:.0f} conversations/s"
+        )
+
+    def collect(window: deque) -> None:
+        nonlocal done
+        # Results are taken in input order, so the offset only moves past lines
+        # whose profiles are all collected.
+        end, lines, count, future = window.popleft()
+        batch_rows, errors = future.result()
+        rows.extend(batch_rows)
+        done += count
+        state.update(
+            offset=end,
+            lines=state["lines"] + lines,
+            conversations=state["conversations"] + count,
+            errors=state["errors"] + errors,
+        )
+        if len(rows) >= chunk_size:
+            flush()
+
+    lines = read_conversations(path, state["offset"])
+    if limit is not None:
+        lines = islice(lines, limit)
+    with tempfile.TemporaryDirectory() as workdir, ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(mode, workdir, model_factory),
+    ) as pool:
+        window: deque = deque()
+        for end, count_lines, conversations in _batches(lines, batch_size):
+            future = pool.submit(process_batch, conversations)
+            window.append((end, count_lines, len(conversations), future))
+            if len(window) >= 2 * workers:
+                collect(window)
+        while window:
+            collect(window)
+    flush()
+
+    elapsed = time.perf_counter() - start
+    return {
+        **state,
+        "processed": done,
+        "seconds": elapsed,
+        "throughput": done / elapsed if elapsed else 0.0,
+    }
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Batch slot filling from JSONL.")
+    parser.add_argument("path", help="JSONL file, one conversation per line")
+    parser.add_argument("--mode", choices=MODES, default="nlu")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--chunk-size", type=int, default=5_000)
+    parser.add_argument("--checkpoint", help="default: <path>.checkpoint")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint")
+    parser.add_argument("--limit", type=int, help="stop after this many lines")
+    args = parser.parse_args(argv)
+
+    result = run_batch(
+        args.path,
+        mode=args.mode,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        chunk_size=args.chunk_size,
+        checkpoint=args.checkpoint,
+        restart=args.restart,
+        limit=args.limit,
+    )
+    print(
+        f"batch: {result['processed']} conversations in {result['seconds']:.2f}s "
+        f"({result['throughput']:.0f}/s); totals: {result['conversations']} "
+        f"conversations, {result['profiles']} profiles, {result['errors']} errors"
+    )
+
+
+if __name__ == "__main__":
+    main()
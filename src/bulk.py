@@ -0,0 +1,94 @@
+"""
+Bulk import/export of client profiles.
+
+    python -m src.bulk import clients.csv
+    python -m src.bulk export clients.jsonl
+"""
+
+import argparse
+import csv
+import json
+import time
+from typing import Iterator, Optional
+
+from src.database import COLUMNS, create_database, iter_users, upsert_users
+
+
+def _format(path: str) -> str:
+    if path.endswith(".csv"):
+        return "csv"
+    if path.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    raise ValueError(f"Unsupported file format: {path} (use .csv or .jsonl)")
+
+
+def _to_row(record: dict) -> tuple:
+    """Convert a CSV/JSON record into a Clients row, treating blanks as unknown."""
+    row = tuple(
+        None if record.get(column) in ("", None) else record[column]
+        for column in COLUMNS
+    )
+    if row[0] is None:
+        raise ValueError(f"Client record without id: {record}")
+    age = row[2]
+    return (int(row[0]), row[1], int(age) if age is not None else None) + row[3:]
+
+
+def read_clients(path: str) -> Iterator[tuple]:
+    """Stream Clients rows from a CSV or JSONL file."""
+    fmt = _format(path)
+    with open(path, newline="", encoding="utf-8") as file:
+        if fmt == "csv":
+            records = csv.DictReader(file)
+        else:
+            records = (json.loads(line) for line in file if line.strip())
+        for record in records:
+            yield _to_row(record)
+
+
+def import_clients(path: str, chunk_size: int = 10_000) -> int:
+    """Upsert every client of a CSV/JSONL file in chunked transactions."""
+    create_database()
+    return upsert_users(read_clients(path), chunk_size=chunk_size)
+
+
+def export_clients(path: str, chunk_size: int = 10_000) -> int:
+    """Write every client to a CSV/JSONL file and return how many were written."""
+    fmt = _format(path)
+    total = 0
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        if fmt == "csv":
+            writer = csv.writer(file)
+            writer.writerow(COLUMNS)
+        for row in iter_users(chunk_size=chunk_size):
+            if fmt == "csv":
+                writer.writerow(row)
+            else:
+                file.write(json.dumps(dict(zip(COLUMNS, row)), ensure_ascii=False))
+                file.write("\n")
+            total += 1
+    return total
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Bulk import/export of client profiles."
+    )
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("path", help="a .csv or .jsonl file")
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    if args.command == "import":
+        total = import_clients(args.path, chunk_size=args.chunk_size)
+    else:
+        total = export_clients(args.path, chunk_size=args.chunk_size)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{args.command}: {total} clients in {elapsed:.2f}s ({total / elapsed:.0f} rows/s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+"""
+Notebook catalog: a Products table loaded from CSV and a NumPy feature matrix that
+scores every product against a client profile in one vectorized pass.
+
+    python -m src.catalog import data/notebooks.csv
+    python -m src.catalog top --ram 16GB --gpu Sim --goal jogos --age 25
+"""
+
+import argparse
+import csv
+import math
+import os
+import sqlite3
+import threading
+import time
+from itertools import islice
+from typing import Iterable, Iterator, List, NamedTuple, Optional
+
+import numpy as np
+
+from src import database, instrumentation
+from src.nlu import goal_category
+
+# Loaded into an empty Products table the first time the catalog is needed.
+CATALOG_CSV = os.environ.get(
+    "CATALOG_CSV",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "notebooks.csv"),
+)
+
+PRODUCT_COLUMNS = (
+    "sku",
+    "name",
+    "brand",
+    "price",
+    "ram_gb",
+    "storage_gb",
+    "cpu_score",
+    "gpu_score",
+    "weight_kg",
+    "battery_hours",
+    "stock",
+)
+
+CREATE_PRODUCTS = """
+    CREATE TABLE IF NOT EXISTS Products(
+        sku TEXT PRIMARY KEY NOT NULL,
+        name TEXT NOT NULL,
+        brand TEXT,
+        price REAL NOT NULL,
+        ram_gb INTEGER NOT NULL,
+        storage_gb INTEGER,
+        cpu_score INTEGER,
+        gpu_score INTEGER,
+        weight_kg REAL,
+        battery_hours REAL,
+        stock INTEGER NOT NULL DEFAULT 0
+    )
+"""
+UPSERT_PRODUCT = f"""
+    INSERT OR REPLACE INTO Products ({", ".join(PRODUCT_COLUMNS)})
+    VALUES ({", ".join("?" for _ in PRODUCT_COLUMNS)})
+"""
+
+# Columns of the feature matrix, each scaled to [0, 1] over the catalog.
+FEATURES = ("cpu", "gpu", "cheap", "light", "battery")
+
+# Weight of each feature per purpose; purposes the rules do not recognize use "other".
+GOAL_WEIGHTS = {
+    "games": (0.6, 1.5, 0.8, 0.0, 0.0),
+    "work": (1.0, 0.0, 0.8, 0.5, 0.6),
+    "study": (0.4, 0.0, 1.5, 0.4, 0.5),
+    "other": (0.5, 0.0, 1.2, 0.3, 0.4),
+}
+
+
+class Product(NamedTuple):
+    """One row of the Products table."""
+
+    sku: str
+    name: str
+    brand: Optional[str]
+    price: float
+    ram_gb: int
+    storage_gb: Optional[int]
+    cpu_score: Optional[int]
+    gpu_score: Optional[int]
+    weight_kg: Optional[float]
+    battery_hours: Optional[float]
+    stock: int
+
+    def to_text(self) -> str:
+        gpu = "dedicated GPU" if self.gpu_score else "integrated GPU"
+        return (
+            f"{self.name} ({self.brand}): {self.ram_gb}GB RAM, "
+            f"{self.storage_gb}GB SSD, {gpu}, {self.weight_kg} kg, "
+            f"{self.battery_hours} h battery, R$ {self.price:,.2f}"
+        )
+
+
+def create_catalog() -> None:
+    with instrumentation.timer("sql", "create_products"):
+        with database.db.transaction() as cursor:
+            cursor.execute(CREATE_PRODUCTS)
+
+
+def _to_row(record: dict) -> tuple:
+    """Convert a CSV record into a Products row; blanks become unknown."""
+    values = {
+        column: None if record.get(column) in ("", None) else record[column]
+        for column in PRODUCT_COLUMNS
+    }
+    for column in ("ram_gb", "storage_gb", "cpu_score", "gpu_score", "stock"):
+        if values[column] is not None:
+            values[column] = int(values[column])
+    for column in ("price", "weight_kg", "battery_hours"):
+        if values[column] is not None:
+            values[column] = float(values[column])
+    if values["sku"] is None or values["price"] is None or values["ram_gb"] is None:
+        raise ValueError(f"Product record without sku, price or ram_gb: {record}")
+    return tuple(values[column] for column in PRODUCT_COLUMNS)
+
+
+def read_products(path: str) -> Iterator[tuple]:
+    """Stream Products rows from a CSV file."""
+    with open(path, newline="", encoding="utf-8") as file:
+        for record in csv.DictReader(file):
+            yield _to_row(record)
+
+
+def _write_products(rows: Iterable[tuple], chunk_size: int) -> int:
+    total = 0
+    rows = iter(rows)
+    while chunk := list(islice(rows, chunk_size)):
+        with instrumentation.timer("sql", "upsert_products"):
+            with database.db.transaction() as cursor:
+                cursor.executemany(UPSERT_PRODUCT, chunk)
+        total += len(chunk)
+    return total
+
+
+def upsert_products(rows: Iterable[tuple], chunk_size: int = 10_000) -> int:
+    """Insert or replace products, one transaction per chunk, and drop the loaded matrix."""
+    create_catalog()
+    total = _write_products(rows, chunk_size)
+    invalidate()
+    return total
+
+
+def import_products(path: str, chunk_size: int = 10_000) -> int:
+    return upsert_products(read_products(path), chunk_size=chunk_size)
+
+
+def _scaled(values: np.ndarray) -> np.ndarray:
+    """Scale to [0, 1]; a constant column becomes all zeros."""
+    low, high = np.nanmin(values), np.nanmax(values)
+    if not high > low:
+        return np.zeros_like(values)
+    return np.nan_to_num((values - low) / (high - low))
+
+
+class Catalog:
+    """
+    In-memory copy of the Products in stock, column by column.
+
+    `features` holds one row per product with the FEATURES columns, so a profile is
+    scored against the whole catalog with one matrix-vector product.
+    """
+
+    def __init__(self, rows: List[tuple]) -> None:
+        self.rows = rows
+        columns = list(zip(*rows)) if rows else [()] * len(PRODUCT_COLUMNS)
+
+        def column(name: str) -> np.ndarray:
+            # Unknown values (None) become NaN.
+            return np.array(columns[PRODUCT_COLUMNS.index(name)], dtype=np.float64)
+
+        self.price = column("price")
+        self.ram = column("ram_gb")
+        self.gpu = np.nan_to_num(column("gpu_score"))
+        if rows:
+            self.features = np.column_stack(
+                [
+                    _scaled(column("cpu_score")),
+                    _scaled(self.gpu),
+                    # Prices are compared by ratio, not by difference.
+                    1.0 - _scaled(np.log(self.price)),
+                    1.0 - _scaled(column("weight_kg")),
+                    _scaled(column("battery_hours")),
+                ]
+            ).astype(np.float32)
+        else:
+            self.features = np.zeros((0, len(FEATURES)), dtype=np.float32)
+        self.log_ram = np.log2(np.maximum(self.ram, 1.0))
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def scores(self, profile: dict) -> np.ndarray:
+        """Score of every product for a profile keyed like ClientProfile.to_record."""
+        goal = goal_category(str(profile.get("Goal") or "")) or "other"
+        weights = np.array(GOAL_WEIGHTS[goal], dtype=np.float32)
+        age = _number(profile.get("Age"))
+        if age is not None and age >= 60:
+            # Lighter notebooks with a long battery are easier to carry around.
+            weights += np.array((0.0, 0.0, 0.2, 0.6, 0.4), dtype=np.float32)
+        elif age is not None and age < 25:
+            weights += np.array((0.0, 0.0, 0.5, 0.0, 0.0), dtype=np.float32)
+        needs_gpu = _needs_gpu(profile.get("GPU"))
+        if needs_gpu:
+            weights[1] += 0.5
+        scores = self.features @ weights
+
+        if (ram := _number(profile.get("RAM"))) is not None:
+            # Less RAM than asked costs much more than some extra.
+            fit = self.log_ram - math.log2(max(ram, 1.0))
+            scores -= np.where(fit < 0, -2.0 * fit, 0.5 * fit)
+        if needs_gpu:
+            scores -= np.where(self.gpu > 0, 0.0, 3.0)
+        elif needs_gpu is False:
+            scores -= np.where(self.gpu > 0, 0.5, 0.0)
+        return scores
+
+    def top_k(self, profile: dict, k: int = 5) -> List[Product]:
+        """The `k` best products for `profile`, best first."""
+        if not self.rows:
+            return []
+        with instrumentation.timer("catalog", "top_k"):
+            scores = self.scores(profile)
+            k = min(k, len(scores))
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best])]
+        return [Product(*self.rows[i]) for i in best]
+
+
+def _number(value) -> Optional[float]:
+    """16, "16" or "16GB" -> 16.0; None when there is no number."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    digits = "".join(ch for ch in str(value) if ch.isdigit() or ch == ".")
+    try:
+        return float(digits)
+    except ValueError:
+        return None
+
+
+def _needs_gpu(value) -> Optional[bool]:
+    """True/False for yes/no answers, None when unknown or undecided ("Talvez")."""
+    if isinstance(value, bool):
+        return value
+    answer = str(value or "").strip().casefold()
+    if answer in ("sim", "yes", "sí", "si", "true"):
+        return True
+    if answer in ("não", "nao", "no", "false"):
+        return False
+    return None
+
+
+_catalog: Optional[Catalog] = None
+_lock = threading.Lock()
+
+
+def load_catalog() -> Catalog:
+    """Read every product in stock into a new Catalog."""
+    create_catalog()
+    connection = database.db.connection()
+    if connection.execute("SELECT 1 FROM Products LIMIT 1").fetchone() is None:
+        if os.path.exists(CATALOG_CSV):
+            _write_products(read_products(CATALOG_CSV), chunk_size=10_000)
+    with instrumentation.timer("sql", "select_products"):
+        rows = connection.execute(
+            f"SELECT {', '.join(PRODUCT_COLUMNS)} FROM Products WHERE stock > 0"
+        ).fetchall()
+    return Catalog(rows)
+
+
+def get_catalog() -> Catalog:
+    """The catalog shared by the process, loaded on first use."""
+    global _catalog
+    with _lock:
+        if _catalog is None:
+            _catalog = load_catalog()
+        return _catalog
+
+
+def invalidate() -> None:
+    """Make the next get_catalog re-read the Products table."""
+    global _catalog
+    with _lock:
+        _catalog = None
+
+
+def recommend(profile: dict, k: int = 5) -> List[Product]:
+    """Top-k products for a profile, or [] when the catalog is empty or unavailable."""
+    try:
+        return get_catalog().top_k(profile, k)
+    except sqlite3.Error as e:
+        print("recommend:", e)
+        return []
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Notebook catalog.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    load = commands.add_parser("import", help="load a products CSV")
+    load.add_argument("path")
+    load.add_argument("--chunk-size", type=int, default=10_000)
+    top = commands.add_parser("top", help="show the best products for a profile")
+    top.add_argument("--ram")
+    top.add_argument("--gpu")
+    top.add_argument("--goal")
+    top.add_argument("--age", type=int)
+    top.add_argument("-k", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    if args.command == "import":
+        start = time.perf_counter()
+        total = import_products(args.path, chunk_size=args.chunk_size)
+        elapsed = time.perf_counter() - start
+        print(f"import: {total} products in {elapsed:.2f}s")
+        return
+    profile = {"RAM": args.ram, "GPU": args.gpu, "Goal": args.goal, "Age": args.age}
+    for product in recommend(profile, args.k):
+        print(product.to_text())
+
+
+if __name__ == "__main__":
+    main()
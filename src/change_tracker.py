@@ -0,0 +1,40 @@
+import threading
+from typing import Optional
+
+
+class ChangeTracker:
+    """
+    Per-user change counters for the Clients table.
+
+    Ids are hashed into a fixed number of buckets so memory stays constant no matter
+    how many users exist; a write to another user of the same bucket only causes a
+    spurious refresh, never a missed one.
+    """
+
+    def __init__(self, buckets: int = 4096) -> None:
+        self._versions = [0] * buckets
+        self._cond = threading.Condition()
+
+    def _bucket(self, id) -> int:
+        return hash(id) % len(self._versions)
+
+    def version(self, id) -> int:
+        """Return the current version of `id`, cheap enough to poll."""
+        return self._versions[self._bucket(id)]
+
+    def bump(self, id) -> None:
+        with self._cond:
+            self._versions[self._bucket(id)] += 1
+            self._cond.notify_all()
+
+    def bump_all(self) -> None:
+        """Mark every user as changed, e.g. after a bulk import."""
+        with self._cond:
+            self._versions = [version + 1 for version in self._versions]
+            self._cond.notify_all()
+
+    def wait(self, id, version: int, timeout: Optional[float] = None) -> int:
+        """Block until the version of `id` differs from `version` or `timeout` expires."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.version(id) != version, timeout)
+            return self.version(id)
@@ -0,0 +1,101 @@
+import threading
+from collections import deque
+from typing import List
+
+from src import instrumentation
+from src.connection import ConnectionManager
+
+# Messages rendered on every rerun, and how many more each "load earlier" adds.
+CHAT_TAIL = 50
+CHAT_PAGE = 50
+
+
+class ChatLog:
+    """
+    Transcript of one conversation as shown in the chat UI, oldest message first.
+
+    Every message is written to a SQLite table as it is added and only the last
+    `tail` stay in memory, so a rerun costs the same however long the conversation
+    is. Older messages are read back from the table when asked for.
+    """
+
+    def __init__(
+        self,
+        db: ConnectionManager,
+        conversation: str,
+        tail: int = CHAT_TAIL,
+        table: str = "ChatMessages",
+    ) -> None:
+        self.db = db
+        self.conversation = conversation
+        self.table = table
+        self._lock = threading.Lock()
+        # (seq, role, content) of the latest messages.
+        self._tail: deque = deque(maxlen=tail)
+        self._create_table()
+
+        with instrumentation.timer("sql", "select_chat"):
+            rows = (
+                self.db.connection()
+                .execute(
+                    f"""
+                    SELECT seq, role, content FROM {self.table}
+                    WHERE conversation = ? ORDER BY seq DESC LIMIT ?
+                    """,
+                    (conversation, tail),
+                )
+                .fetchall()
+            )
+        self._tail.extend(reversed(rows))
+        self._next = rows[0][0] + 1 if rows else 0
+
+    def _create_table(self) -> None:
+        with instrumentation.timer("sql", "create_chat"):
+            with self.db.transaction() as cursor:
+                cursor.execute(
+                    f"""
+                    CREATE TABLE IF NOT EXISTS {self.table}(
+                        conversation TEXT NOT NULL,
+                        seq INTEGER NOT NULL,
+                        role TEXT NOT NULL,
+                        content TEXT NOT NULL,
+                        PRIMARY KEY (conversation, seq)
+                    ) WITHOUT ROWID
+                """
+                )
+
+    def __len__(self) -> int:
+        return self._next
+
+    def append(self, role: str, content: str) -> None:
+        with self._lock:
+            row = (self._next, role, str(content))
+            with instrumentation.timer("sql", "insert_chat"):
+                with self.db.transaction() as cursor:
+                    cursor.execute(
+                        f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?, ?)",
+                        (self.conversation, *row),
+                    )
+            self._tail.append(row)
+            self._next += 1
+
+    def latest(self, count: int) -> List[dict]:
+        """The last `count` messages as {"role", "content"}, oldest first."""
+        with self._lock:
+            rows = list(self._tail)[-count:] if count > 0 else []
+            first = rows[0][0] if rows else self._next
+        if (missing := min(count - len(rows), first)) > 0:
+            with instrumentation.timer("sql", "select_chat"):
+                older = (
+                    self.db.connection()
+                    .execute(
+                        f"""
+                        SELECT seq, role, content FROM {self.table}
+                        WHERE conversation = ? AND seq < ? ORDER BY seq DESC LIMIT ?
+                        """,
+                        (self.conversation, first, missing),
+                    )
+                    .fetchall()
+                )
+            rows = older[::-1] + rows
+        return [{"role": role, "content": content} for _, role, content in rows]
@@ -0,0 +1,531 @@
+import hashlib
+import random
+import time
+import zlib
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    SerializerProtocol,
+    get_checkpoint_id,
+)
+from langgraph.checkpoint.serde.types import TASKS, ChannelProtocol
+
+from src.async_database import run
+from src.connection import ConnectionManager
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT NOT NULL,
+    checkpoint BLOB NOT NULL,
+    metadata_type TEXT NOT NULL,
+    metadata BLOB NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS channel_blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    type TEXT NOT NULL,
+    blob BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS message_blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    digest BLOB NOT NULL,
+    type TEXT NOT NULL,
+    blob BLOB NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, digest)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT NOT NULL,
+    blob BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS threads (
+    thread_id TEXT PRIMARY KEY NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS threads_updated_at ON threads (updated_at);
+"""
+
+# Values of list channels (the message history) are stored as a list of digests of
+# their items, so every message is written once instead of once per checkpoint.
+REFS = "refs"
+DIGEST_SIZE = 16
+# Blobs larger than this are zlib-compressed.
+COMPRESS_MIN_SIZE = 512
+# Stay below SQLite's default limit of host parameters.
+MAX_PARAMS = 500
+
+
+def _digests(refs: bytes) -> list:
+    """Split a REFS value into the digests of its items."""
+    bounds = range(0, len(refs) + DIGEST_SIZE, DIGEST_SIZE)
+    return [refs[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+def _chunks(items: list) -> Iterator[list]:
+    for start in range(0, len(items), MAX_PARAMS):
+        end = start + MAX_PARAMS
+        yield items[start:end]
+
+
+class SQLiteCheckpointer(BaseCheckpointSaver[str]):
+    """
+    Disk-backed checkpointer for the dialogue graph.
+
+    Channels are stored only when their version changes, messages are deduplicated
+    across checkpoints and threads idle for longer than `ttl` seconds are evicted.
+    Once a thread has `prune_every` checkpoints more than `max_checkpoints`, it is cut
+    back to the newest `max_checkpoints`, so pruning is paid once per that many puts.
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        *,
+        max_checkpoints: int = 10,
+        prune_every: int = 10,
+        ttl: float = 24 * 60 * 60,
+        evict_every: int = 100,
+        serde: Optional[SerializerProtocol] = None,
+    ) -> None:
+        super().__init__(serde=serde)
+        self.max_checkpoints = max_checkpoints
+        self.prune_every = max(1, prune_every)
+        self.ttl = ttl
+        self.evict_every = evict_every
+        self.db = ConnectionManager(filename)
+        self._puts = 0
+        with self.db.transaction() as cursor:
+            cursor.executescript(SCHEMA)
+
+    # Serialization
+
+    def _dumps(self, value: Any) -> Tuple[str, bytes]:
+        return self._compress(*self.serde.dumps_typed(value))
+
+    def _compress(self, type_: str, data: bytes) -> Tuple[str, bytes]:
+        if len(data) >= COMPRESS_MIN_SIZE:
+            return "z" + type_, zlib.compress(data)
+        return type_, data
+
+    def _loads(self, type_: str, data: bytes) -> Any:
+        if type_.startswith("z"):
+            return self.serde.loads_typed((type_[1:], zlib.decompress(data)))
+        return self.serde.loads_typed((type_, data))
+
+    def _dump_channel(
+        self, cursor, thread_id: str, checkpoint_ns: str, value: Any
+    ) -> Tuple[str, bytes]:
+        if not isinstance(value, list):
+            return self._dumps(value)
+        digests = []
+        items = {}
+        for item in value:
+            type_, data = self.serde.dumps_typed(item)
+            digest = hashlib.blake2b(
+                type_.encode() + data, digest_size=DIGEST_SIZE
+            ).digest()
+            digests.append(digest)
+            items[digest] = (type_, data)
+        # Most items are already stored by an earlier checkpoint; only the new ones
+        # are compressed and written.
+        new = set(items)
+        for chunk in _chunks(list(items)):
+            new.difference_update(
+                digest
+                for (digest,) in cursor.execute(
+                    "SELECT digest FROM message_blobs "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? "
+                    f"AND digest IN ({', '.join('?' * len(chunk))})",
+                    (thread_id, checkpoint_ns, *chunk),
+                )
+            )
+        cursor.executemany(
+            "INSERT OR IGNORE INTO message_blobs VALUES (?, ?, ?, ?, ?)",
+            [
+                (thread_id, checkpoint_ns, digest, *self._compress(*items[digest]))
+                for digest in new
+            ],
+        )
+        return REFS, b"".join(digests)
+
+    def _load_channel(
+        self, conn, thread_id: str, checkpoint_ns: str, type_: str, data: bytes
+    ) -> Any:
+        if type_ != REFS:
+            return self._loads(type_, data)
+        digests = _digests(data)
+        items = {}
+        for chunk in _chunks(digests):
+            rows = conn.execute(
+                "SELECT digest, type, blob FROM message_blobs "
+                "WHERE thread_id = ? AND checkpoint_ns = ? "
+                f"AND digest IN ({', '.join('?' * len(chunk))})",
+                (thread_id, checkpoint_ns, *chunk),
+            )
+            for digest, item_type, blob in rows:
+                items[digest] = self._loads(item_type, blob)
+        return [items[digest] for digest in digests]
+
+    # Reads
+
+    def _build_tuple(
+        self, conn, thread_id: str, checkpoint_ns: str, row
+    ) -> CheckpointTuple:
+        checkpoint_id, parent_checkpoint_id, type_, data, metadata_type, metadata = row
+        checkpoint = self._loads(type_, data)
+
+        channel_values = {}
+        for channel, version in checkpoint["channel_versions"].items():
+            blob = conn.execute(
+                "SELECT type, blob FROM channel_blobs WHERE thread_id = ? "
+                "AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                (thread_id, checkpoint_ns, channel, str(version)),
+            ).fetchone()
+            if blob is not None and blob[0] != "empty":
+                channel_values[channel] = self._load_channel(
+                    conn, thread_id, checkpoint_ns, *blob
+                )
+
+        writes = conn.execute(
+            "SELECT task_id, channel, type, blob FROM writes WHERE thread_id = ? "
+            "AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        sends = []
+        if parent_checkpoint_id:
+            sends = conn.execute(
+                "SELECT type, blob FROM writes WHERE thread_id = ? AND checkpoint_ns = ? "
+                "AND checkpoint_id = ? AND channel = ? ORDER BY task_id, idx",
+                (thread_id, checkpoint_ns, parent_checkpoint_id, TASKS),
+            ).fetchall()
+
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint={
+                **checkpoint,
+                "channel_values": channel_values,
+                "pending_sends": [self._loads(*send) for send in sends],
+            },
+            metadata=self._loads(metadata_type, metadata),
+            pending_writes=[
+                (task_id, channel, self._loads(type_, blob))
+                for task_id, channel, type_, blob in writes
+            ],
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_checkpoint_id,
+                    }
+                }
+                if parent_checkpoint_id
+                else None
+            ),
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """Get the requested checkpoint of a thread, or its latest one."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        columns = "checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata"
+        conn = self.db.connection()
+        if checkpoint_id := get_checkpoint_id(config):
+            row = conn.execute(
+                f"SELECT {columns} FROM checkpoints WHERE thread_id = ? "
+                "AND checkpoint_ns = ? AND checkpoint_id = ?",
+                (thread_id, checkpoint_ns, checkpoint_id),
+            ).fetchone()
+        else:
+            row = conn.execute(
+                f"SELECT {columns} FROM checkpoints WHERE thread_id = ? "
+                "AND checkpoint_ns = ? ORDER BY checkpoint_id DESC LIMIT 1",
+                (thread_id, checkpoint_ns),
+            ).fetchone()
+        if row is None:
+            return None
+        return self._build_tuple(conn, thread_id, checkpoint_ns, row)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        """List checkpoints, newest first."""
+        where, params = [], []
+        if config:
+            where.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (
+                checkpoint_ns := config["configurable"].get("checkpoint_ns")
+            ) is not None:
+                where.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                where.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_checkpoint_id := get_checkpoint_id(before)):
+            where.append("checkpoint_id < ?")
+            params.append(before_checkpoint_id)
+
+        conn = self.db.connection()
+        rows = conn.execute(
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, "
+            "checkpoint, metadata_type, metadata FROM checkpoints"
+            + (f" WHERE {' AND '.join(where)}" if where else "")
+            + " ORDER BY thread_id, checkpoint_ns, checkpoint_id DESC",
+            params,
+        ).fetchall()
+        for thread_id, checkpoint_ns, *row in rows:
+            if limit is not None and limit <= 0:
+                break
+            if filter:
+                metadata = self._loads(row[4], row[5])
+                if not all(metadata.get(key) == value for key, value in filter.items()):
+                    continue
+            if limit is not None:
+                limit -= 1
+            yield self._build_tuple(conn, thread_id, checkpoint_ns, row)
+
+    def _list_all(self, config: Optional[RunnableConfig], **kwargs) -> list:
+        return list(self.list(config, **kwargs))
+
+    # Writes
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Save a checkpoint, storing only the channels that changed since the last one."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        c = checkpoint.copy()
+        c.pop("pending_sends", None)
+        values = c.pop("channel_values")
+
+        with self.db.transaction() as cursor:
+            for channel, version in new_versions.items():
+                if channel in values:
+                    blob = self._dump_channel(
+                        cursor, thread_id, checkpoint_ns, values[channel]
+                    )
+                else:
+                    blob = ("empty", None)
+                cursor.execute(
+                    "INSERT OR REPLACE INTO channel_blobs VALUES (?, ?, ?, ?, ?, ?)",
+                    (thread_id, checkpoint_ns, channel, str(version), *blob),
+                )
+            cursor.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    thread_id,
+                    checkpoint_ns,
+                    checkpoint["id"],
+                    config["configurable"].get("checkpoint_id"),
+                    *self._dumps(c),
+                    *self._dumps(metadata),
+                ),
+            )
+            cursor.execute(
+                "INSERT OR REPLACE INTO threads VALUES (?, ?)", (thread_id, time.time())
+            )
+            self._prune(cursor, thread_id, checkpoint_ns)
+
+        self._puts += 1
+        if self.evict_every and self._puts % self.evict_every == 0:
+            self.evict_idle()
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+    ) -> None:
+        """Save the intermediate writes of a task."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        with self.db.transaction() as cursor:
+            cursor.executemany(
+                "INSERT OR REPLACE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        thread_id,
+                        checkpoint_ns,
+                        checkpoint_id,
+                        task_id,
+                        WRITES_IDX_MAP.get(channel, idx),
+                        channel,
+                        *self._dumps(value),
+                    )
+                    for idx, (channel, value) in enumerate(writes)
+                ],
+            )
+
+    def get_next_version(self, current: Optional[str], channel: ChannelProtocol) -> str:
+        # Zero-padded so versions sort as text, which pruning relies on.
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # Retention
+
+    def _prune(self, cursor, thread_id: str, checkpoint_ns: str) -> None:
+        """
+        Cut a thread back to its newest `max_checkpoints` checkpoints once it has
+        `prune_every` more than that.
+        """
+        key = (thread_id, checkpoint_ns)
+        nth_newest = (
+            "SELECT checkpoint_id, type, checkpoint FROM checkpoints "
+            "WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT 1 OFFSET ?"
+        )
+        limit = self.max_checkpoints + self.prune_every
+        if cursor.execute(nth_newest, (*key, limit - 1)).fetchone() is None:
+            return
+        oldest_id, type_, data = cursor.execute(
+            nth_newest, (*key, self.max_checkpoints - 1)
+        ).fetchone()
+        cursor.execute(
+            "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "AND checkpoint_id < ?",
+            (*key, oldest_id),
+        )
+        cursor.execute(
+            "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?",
+            (*key, oldest_id),
+        )
+        # Versions only grow, so anything older than what the oldest kept checkpoint
+        # references is unreachable. Only the messages those versions referenced can
+        # become garbage.
+        candidates = set()
+        for channel, version in self._loads(type_, data)["channel_versions"].items():
+            params = (*key, channel, str(version))
+            for (refs,) in cursor.execute(
+                "SELECT blob FROM channel_blobs WHERE thread_id = ? AND checkpoint_ns = ? "
+                "AND channel = ? AND version < ? AND type = ?",
+                (*params, REFS),
+            ).fetchall():
+                candidates.update(_digests(refs))
+            cursor.execute(
+                "DELETE FROM channel_blobs WHERE thread_id = ? AND checkpoint_ns = ? "
+                "AND channel = ? AND version < ?",
+                params,
+            )
+        if not candidates:
+            return
+        for (refs,) in cursor.execute(
+            "SELECT blob FROM channel_blobs WHERE thread_id = ? AND checkpoint_ns = ? "
+            "AND type = ?",
+            (*key, REFS),
+        ).fetchall():
+            candidates.difference_update(_digests(refs))
+        cursor.executemany(
+            "DELETE FROM message_blobs WHERE thread_id = ? AND checkpoint_ns = ? AND digest = ?",
+            [(*key, digest) for digest in candidates],
+        )
+
+    def evict_idle(self, ttl: Optional[float] = None) -> int:
+        """Delete every thread that has not been written for `ttl` seconds."""
+        cutoff = time.time() - (self.ttl if ttl is None else ttl)
+        with self.db.transaction() as cursor:
+            threads = [
+                row[0]
+                for row in cursor.execute(
+                    "SELECT thread_id FROM threads WHERE updated_at < ?", (cutoff,)
+                ).fetchall()
+            ]
+            for table in (
+                "checkpoints",
+                "channel_blobs",
+                "message_blobs",
+                "writes",
+                "threads",
+            ):
+                cursor.executemany(
+                    f"DELETE FROM {table} WHERE thread_id = ?", [(t,) for t in threads]
+                )
+        return len(threads)
+
+    # Async API, run on the bounded executor shared with the clients database.
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await run(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await run(
+            self._list_all, config, filter=filter, before=before, limit=limit
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await run(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+    ) -> None:
+        return await run(self.put_writes, config, writes, task_id)
@@ -0,0 +1,131 @@
+import os
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+
+# Pragmas applied once to every connection opened by the manager.
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -8000,  # negative means KiB, i.e. ~8MB of page cache
+    "mmap_size": 64 * 1024 * 1024,
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,
+}
+
+
+class _Lease:
+    """Lives in a thread's local storage; collecting it hands the connection back."""
+
+
+class ConnectionManager:
+    """
+    Hand out one long-lived, tuned SQLite connection per thread.
+
+    When a thread exits its connection goes back to a small idle pool, so short-lived
+    worker threads reuse connections instead of opening a new one each time.
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        pragmas: Optional[dict] = None,
+        cached_statements: int = 128,
+        max_idle: int = 8,
+        factory: type = sqlite3.Connection,
+    ) -> None:
+        self.filename = filename
+        self.pragmas = dict(DEFAULT_PRAGMAS if pragmas is None else pragmas)
+        self.cached_statements = cached_statements
+        self.max_idle = max_idle
+        self.factory = factory
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._idle: list = []
+        self._leased: set = set()
+        self._generation = 0
+        self._pid = os.getpid()
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.filename,
+            # sqlite3 keeps an LRU of prepared statements per connection, so
+            # reusing the connection is what makes the statement cache useful.
+            cached_statements=self.cached_statements,
+            check_same_thread=False,
+            factory=self.factory,
+        )
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def _release(self, conn: sqlite3.Connection, generation: int, pid: int) -> None:
+        if pid != os.getpid():
+            # Opened by the parent before a fork: neither reuse nor close it here.
+            return
+        with self._lock:
+            self._leased.discard(conn)
+            if generation == self._generation and len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def _after_fork(self) -> None:
+        # Everything inherited belongs to the parent, including a lock that another of
+        # its threads may have held at the time of the fork.
+        self._lock = threading.Lock()
+        self._idle, self._leased = [], set()
+        self._local = threading.local()
+        self._pid = os.getpid()
+
+    def connection(self) -> sqlite3.Connection:
+        """Return the connection bound to the calling thread, opening it if needed."""
+        # A forked worker must never reuse the parent's connections.
+        if self._pid != os.getpid():
+            self._after_fork()
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+                generation = self._generation
+            if conn is None:
+                conn = self._open()
+            with self._lock:
+                self._leased.add(conn)
+            lease = _Lease()
+            self._local.conn = conn
+            self._local.lease = lease
+            self._local.finalizer = weakref.finalize(
+                lease, self._release, conn, generation, self._pid
+            )
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Cursor]:
+        """Yield a cursor inside a transaction that commits on success and rolls back on error."""
+        conn = self.connection()
+        with conn:
+            yield conn.cursor()
+
+    def close(self) -> None:
+        """Close the connection bound to the calling thread."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.finalizer.detach()
+            self._local.conn = None
+            with self._lock:
+                self._leased.discard(conn)
+            conn.close()
+
+    def close_all(self) -> None:
+        """Close every connection opened by this manager."""
+        with self._lock:
+            self._generation += 1
+            connections = self._idle + list(self._leased)
+            self._idle, self._leased = [], set()
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
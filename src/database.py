@@ -1,38 +1,145 @@
+import atexit
 import sqlite3
-import pandas as pd
+from itertools import islice
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+from src import instrumentation
+from src.change_tracker import ChangeTracker
+from src.connection import ConnectionManager
+from src.profile_cache import MISSING, ProfileCache
+from src.write_behind import WriteBehindQueue, merge_rows
 
 
 filename = "my.db"
 
+# Every function goes through this manager, which keeps one connection per thread.
+db = ConnectionManager(filename)
+
+COLUMNS = ("id", "name", "age", "goal", "ram", "needs_gpu")
+# How each column is labelled for the model and in the UI.
+PROFILE_LABELS = ("id", "Client Name", "Age", "Goal", "RAM", "GPU")
+
+
+class ClientProfile(NamedTuple):
+    """One row of the Clients table."""
+
+    id: int
+    name: Optional[str] = None
+    age: Optional[int] = None
+    goal: Optional[str] = None
+    ram: Optional[str] = None
+    needs_gpu: Optional[str] = None
+
+    def to_record(self) -> dict:
+        """Return the profile keyed by its display labels."""
+        return dict(zip(PROFILE_LABELS, self))
+
+    def to_text(self) -> str:
+        """Render the profile as a small aligned text table (header and one row)."""
+        values = ["None" if value is None else str(value) for value in self]
+        widths = [
+            max(len(label), len(value)) for label, value in zip(PROFILE_LABELS, values)
+        ]
+        header = " ".join(
+            label.rjust(width) for label, width in zip(PROFILE_LABELS, widths)
+        )
+        row = " ".join(value.rjust(width) for value, width in zip(values, widths))
+        return header + "\n" + row
+
+
+SELECT_USER = "SELECT * FROM Clients WHERE id = ?"
+# A single statement creates the row or fills in only the fields that were informed.
+UPSERT_USER = """
+    INSERT INTO Clients (id, name, age, goal, ram, needs_gpu)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET
+        name = COALESCE(excluded.name, name),
+        age = COALESCE(excluded.age, age),
+        goal = COALESCE(excluded.goal, goal),
+        ram = COALESCE(excluded.ram, ram),
+        needs_gpu = COALESCE(excluded.needs_gpu, needs_gpu)
+"""
+DELETE_USER = "DELETE FROM Clients WHERE id = ?"
+
+# Optional group-commit writer, see enable_write_behind.
+writer: Optional[WriteBehindQueue] = None
+# Seconds a delete waits for the writer to commit what is queued before it.
+FLUSH_TIMEOUT = 10.0
+
+# Write-through cache of Clients rows, kept in sync by every write below.
+profile_cache = ProfileCache(maxsize=4096, ttl=300.0)
+
+# Bumped on every write to Clients so views can skip re-reading unchanged profiles.
+changes = ChangeTracker()
+
+
+def _key(id) -> object:
+    """Normalize ids so "1" (from the UI) and 1 refer to the same client."""
+    try:
+        return int(id)
+    except (TypeError, ValueError):
+        return id
+
+
+def client_id(id) -> int:
+    """The Clients.id of `id`; raises ValueError if it is not an integer."""
+    try:
+        return int(id)
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid client id: {id!r}") from None
+
+
+def enable_write_behind(interval: float = 0.05) -> None:
+    """Queue slot writes and commit them in batches from a single background thread."""
+    global writer
+    if writer is None:
+        writer = WriteBehindQueue(_commit_rows, interval=interval, on_drop=_dropped_row)
+        atexit.register(disable_write_behind)
+
+
+def disable_profile_cache() -> None:
+    """
+    Read every profile from SQLite. The cache only sees writes made by this process,
+    so processes that share the database with other writers must turn it off.
+    """
+    global profile_cache
+    profile_cache = ProfileCache(maxsize=0)
+
+
+def _dropped_row(row: tuple) -> None:
+    # The cache already holds the rejected update; read the row back from disk.
+    profile_cache.discard(row[0])
+    changes.bump(row[0])
+
+
+def disable_write_behind() -> None:
+    """Commit pending writes and go back to one transaction per write."""
+    global writer
+    if writer is not None:
+        writer.stop()
+        writer = None
+
 
 def create_database() -> None:
     """Create a database and tables with sample data."""
     print("creating database...")
-    conn = None
     try:
-        conn = sqlite3.connect(filename)
-
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS Clients(
-                id INTEGER PRIMARY KEY NOT NULL,
-                name TEXT,
-                age INTEGER,
-                goal TEXT,
-                ram TEXT,
-                needs_gpu TEXT
-            )
-        """
-        )
-
-        # Commit the changes
-        conn.commit()
+        with instrumentation.timer("sql", "create_clients"):
+            with db.transaction() as cursor:
+                cursor.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS Clients(
+                        id INTEGER PRIMARY KEY NOT NULL,
+                        name TEXT,
+                        age INTEGER,
+                        goal TEXT,
+                        ram TEXT,
+                        needs_gpu TEXT
+                    )
+                """
+                )
     except sqlite3.Error as e:
         print("create_database:", e)
-    finally:
-        if conn:
-            conn.close()
 
 
 def create_or_update_user(
@@ -44,109 +151,114 @@ def create_or_update_user(
     needs_gpu: str = None,
 ) -> None:
     """Create or update a user in the database."""
-    conn = None
     try:
-        conn = sqlite3.connect(filename)
-        cursor = conn.cursor()
-
-        # Check if the user already exists
-        cursor.execute("SELECT * FROM Clients WHERE id = ?", (id,))
-        row = cursor.fetchone()
-
-        if row:
-            # If user exists, update the existing record
-            sql_command = """
-                UPDATE Clients
-                SET name = COALESCE(?, name),
-                    age = COALESCE(?, age),
-                    goal = COALESCE(?, goal),
-                    ram = COALESCE(?, ram),
-                    needs_gpu = COALESCE(?, needs_gpu)
-                WHERE id = ?
-            """
-            print(sql_command, id, name, age, goal, ram, needs_gpu)
-            cursor.execute(sql_command, (name, age, goal, ram, needs_gpu, id))
-        else:
-            # If user doesn't exist, create a new record
-            cursor.execute(
-                """
-                INSERT INTO Clients (id, name, age, goal, ram, needs_gpu)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """,
-                (id, name, age, goal, ram, needs_gpu),
-            )
+        # Clients.id is an INTEGER PRIMARY KEY; SQLite would reject the row anyway.
+        key = client_id(id)
+    except ValueError as e:
+        print("create_or_update_user:", e)
+        return
+    row = (key, name, age, goal, ram, needs_gpu)
+    if writer is not None:
+        writer.submit(row)
+    else:
+        try:
+            with instrumentation.timer("sql", "upsert_user"):
+                with db.transaction() as cursor:
+                    cursor.execute(UPSERT_USER, row)
+        except sqlite3.Error as e:
+            print(e)
+            return
 
-        # Commit the changes
-        conn.commit()
+    profile_cache.write(row[0], lambda cached: merge_rows(cached, row))
+    changes.bump(row[0])
+
+
+def _commit_rows(rows: list) -> None:
+    """Upsert a batch of partial rows in a single transaction."""
+    with instrumentation.timer("sql", "upsert_batch"):
+        with db.transaction() as cursor:
+            cursor.executemany(UPSERT_USER, rows)
+
+
+def upsert_users(rows: Iterable[tuple], chunk_size: int = 10_000) -> int:
+    """Create or update many users, committing one transaction per chunk of rows."""
+    total = 0
+    rows = iter(rows)
+    while chunk := list(islice(rows, chunk_size)):
+        with instrumentation.timer("sql", "upsert_chunk"):
+            with db.transaction() as cursor:
+                cursor.executemany(UPSERT_USER, chunk)
+        total += len(chunk)
+    profile_cache.clear()
+    changes.bump_all()
+    return total
 
-    except sqlite3.Error as e:
-        print(e)
-    finally:
-        if conn:
-            conn.close()
 
+def iter_users(chunk_size: int = 10_000) -> Iterator[tuple]:
+    """Yield every user row ordered by id without loading the whole table."""
+    cursor = db.connection().execute(
+        f"SELECT {', '.join(COLUMNS)} FROM Clients ORDER BY id"
+    )
+    while chunk := cursor.fetchmany(chunk_size):
+        yield from chunk
 
-def get_user_by_id(id: int) -> pd.DataFrame:
-    """Fetch user information by id and return as a pandas DataFrame."""
-    conn = None
+
+def _fetch_user(id: int, cached: bool = True) -> Optional[tuple]:
+    """Read the Clients row of `id`, including updates still queued for write-behind."""
+    id = _key(id)
+    if cached and (row := profile_cache.get(id)) is not MISSING:
+        return row
+
+    token = profile_cache.token()
+    # Read before the SELECT: an update committed in between is then in both, never
+    # in neither.
+    pending = writer.overlay(id) if writer is not None else None
+    with instrumentation.timer("sql", "select_user"):
+        row = db.connection().execute(SELECT_USER, (id,)).fetchone()
+    if pending is not None:
+        row = merge_rows(row, pending)
+    profile_cache.put(id, row, token)
+    return row
+
+
+def get_profile(id: int, cached: bool = True) -> Optional[ClientProfile]:
+    """
+    Fetch user information by id, or None if the user does not exist.
+
+    With `cached=False` the row is read from SQLite, which also sees writes made by
+    other processes, and the cache is refreshed with it.
+    """
     try:
-        conn = sqlite3.connect(filename)
-        cursor = conn.cursor()
-
-        # Execute query to get the user by id
-        cursor.execute("SELECT * FROM Clients WHERE id = ?", (id,))
-        row = cursor.fetchone()
-
-        if row:
-            # Get column names for the DataFrame
-            columns = [description[0] for description in cursor.description]
-
-            # Create a pandas DataFrame with the row data
-            df = pd.DataFrame([row], columns=columns)
-            df = df.rename(
-                {
-                    "name": "Client Name",
-                    "age": "Age",
-                    "ram": "RAM",
-                    "goal": "Goal",
-                    "needs_gpu": "GPU",
-                },
-                axis=1,
-            )
-            return df
-        else:
-            print(f"No user found with id {id}")
-            # Return an empty DataFrame if no user found
-            return pd.DataFrame(
-                columns=["Client Name", "Age", "RAM", "Goal", "Memory", "GPU"]
-            )
-    except sqlite3.Error:
-        return pd.DataFrame()
-    finally:
-        if conn:
-            conn.close()
+        row = _fetch_user(id, cached)
+    except sqlite3.Error as e:
+        print("get_profile:", e)
+        return None
+    return ClientProfile(*row) if row else None
+
+
+def user_version(id: int) -> int:
+    """Version of the user's profile; it changes whenever the profile is written."""
+    return changes.version(_key(id))
 
 
 def delete_user_by_id(id: int) -> True:
     """Delete user by ."""
-    conn = None
+    id = _key(id)
     response = True
+    if writer is not None:
+        # Make sure no queued update resurrects the user after the delete.
+        writer.discard(id)
+        if not writer.flush(timeout=FLUSH_TIMEOUT):
+            print("delete_user_by_id: pending writes were not committed in time")
+            return False
     try:
-        conn = sqlite3.connect(filename)
-        cursor = conn.cursor()
-
-        # Execute query to get the user by id
-        sql_command = "DELETE FROM Clients WHERE id = ?"
-
         # Execute query to delete the user by id
-        cursor.execute(sql_command, (id,))
-
-        # Commit the transaction
-        conn.commit()
+        with instrumentation.timer("sql", "delete_user"):
+            with db.transaction() as cursor:
+                cursor.execute(DELETE_USER, (id,))
+        profile_cache.set(id, None)
+        changes.bump(id)
     except sqlite3.Error:
         response = False
-    finally:
-        if conn:
-            conn.close()
 
     return response
@@ -0,0 +1,145 @@
+import re
+from typing import List, Optional, Tuple
+
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    SystemMessage,
+    ToolMessage,
+)
+
+# Defaults, overridable per run through config["configurable"].
+HISTORY_TOKEN_BUDGET = 2000
+HISTORY_TURNS = 4
+# Longest excerpt of a single message kept in the rolling summary.
+SUMMARY_LINE_CHARS = 160
+
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+
+def count_tokens(text: str) -> int:
+    """
+    Estimate the number of model tokens in `text` without a tokenizer download.
+
+    Every word or punctuation mark counts as one token, plus one more for every four
+    characters beyond the first four of a long word, which tracks BPE vocabularies
+    closely enough for budgeting.
+    """
+    return sum(1 + max(0, len(token) - 4) // 4 for token in _TOKEN.findall(text))
+
+
+def message_tokens(message: BaseMessage) -> int:
+    content = (
+        message.content if isinstance(message.content, str) else str(message.content)
+    )
+    tokens = count_tokens(content) + 4  # role and message framing
+    if isinstance(message, AIMessage):
+        for tool_call in message.tool_calls:
+            tokens += count_tokens(tool_call["name"]) + count_tokens(
+                str(tool_call["args"])
+            )
+    return tokens
+
+
+def split_turns(messages: List[BaseMessage]) -> List[Tuple[int, int]]:
+    """Return (start, end) indexes of each turn; a turn starts at a user message."""
+    starts = [
+        i for i, message in enumerate(messages) if isinstance(message, HumanMessage)
+    ]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    return list(zip(starts, starts[1:] + [len(messages)]))
+
+
+def collapse_tool_round_trips(messages: List[BaseMessage]) -> List[BaseMessage]:
+    """
+    Drop tool calls and their results from a finished turn.
+
+    What the tools stored is already in the "Client Info" section of the prompt, so
+    only what was said to and by the client is worth resending.
+    """
+    collapsed = []
+    for message in messages:
+        if isinstance(message, ToolMessage):
+            continue
+        if isinstance(message, AIMessage) and message.tool_calls:
+            if message.content:
+                collapsed.append(AIMessage(content=message.content, id=message.id))
+            continue
+        collapsed.append(message)
+    return collapsed
+
+
+def summarize(messages: List[BaseMessage]) -> List[str]:
+    """Extract one short line per utterance of the client or the assistant."""
+    lines = []
+    for message in collapse_tool_round_trips(messages):
+        if not isinstance(message.content, str) or not message.content.strip():
+            continue
+        role = "Client" if isinstance(message, HumanMessage) else "Assistant"
+        text = " ".join(message.content.split())
+        if len(text) > SUMMARY_LINE_CHARS:
+            text = text[: SUMMARY_LINE_CHARS - 3] + "..."
+        lines.append(f"{role}: {text}")
+    return lines
+
+
+def compact_history(
+    messages: List[BaseMessage],
+    summary: Optional[str] = None,
+    summarized: int = 0,
+    budget: int = HISTORY_TOKEN_BUDGET,
+    keep_turns: int = HISTORY_TURNS,
+) -> Tuple[List[BaseMessage], Optional[str], int]:
+    """
+    Fit the dialogue history into `budget` tokens.
+
+    The last `keep_turns` turns are kept (older ones without their tool round trips,
+    the current one untouched) and everything before them is folded into a rolling
+    summary. `summary`/`summarized` are the cached summary and the number of messages
+    it already covers; they are returned updated so the caller can store them in the
+    graph state and never summarize the same message twice.
+    """
+    turns = [turn for turn in split_turns(messages) if turn[1] > summarized]
+    if not turns:
+        return [], summary, summarized
+    window_turns = turns[-keep_turns:] if keep_turns > 0 else turns[-1:]
+
+    def render(turn_list):
+        window = []
+        for start, end in turn_list[:-1]:
+            start = max(start, summarized)
+            window.extend(collapse_tool_round_trips(messages[start:end]))
+        start, end = turn_list[-1]
+        start = max(start, summarized)
+        return window + messages[start:end]
+
+    window = render(window_turns)
+    lines = summary.splitlines() if summary else []
+    first = max(window_turns[0][0], summarized)
+    lines += summarize(messages[summarized:first])
+    summarized = first
+
+    def total(window_, lines_):
+        return sum(map(message_tokens, window_)) + count_tokens("\n".join(lines_))
+
+    # Fold the oldest turns of the window into the summary until the budget is met;
+    # the current turn always stays verbatim.
+    while len(window_turns) > 1 and total(window, lines) > budget:
+        start, end = window_turns.pop(0)
+        start = max(start, summarized)
+        lines += summarize(messages[start:end])
+        summarized = end
+        window = render(window_turns)
+
+    # The summary itself is capped at a quarter of the budget, oldest lines first out.
+    while lines and count_tokens("\n".join(lines)) > budget // 4:
+        lines.pop(0)
+
+    summary = "\n".join(lines) or None
+    if summary:
+        window = [
+            SystemMessage(content=f"Summary of the earlier conversation:\n{summary}")
+        ] + window
+    return window, summary, summarized
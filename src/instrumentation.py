@@ -0,0 +1,258 @@
+"""
+Timers and counters for graph nodes, tools, SQL statements and model calls.
+
+Switched by the INSTRUMENTATION environment variable (or `configure`):
+
+- "off" (default): every timer is a shared no-op and nothing is recorded;
+- "prometheus": aggregates are kept in memory, see `render_prometheus`;
+- "jsonl:<path>": aggregates are kept and every observation is appended to <path>.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from functools import wraps
+from inspect import iscoroutinefunction
+from typing import Any, Dict, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+PREFIX = "dialogue"
+
+enabled = False
+_jsonl = None
+_lock = threading.Lock()
+# (kind, name) -> [count, total seconds, max seconds]
+_timings: Dict[tuple, list] = {}
+# (name, labels) -> value
+_counters: Dict[tuple, float] = {}
+# (name, labels) -> latest value
+_gauges: Dict[tuple, float] = {}
+
+
+def configure(spec: Optional[str]) -> None:
+    """Set the exporter: None or "off", "prometheus", or "jsonl:<path>"."""
+    global enabled, _jsonl
+    with _lock:
+        if _jsonl is not None:
+            _jsonl.close()
+            _jsonl = None
+        spec = (spec or "off").strip()
+        if spec.startswith("jsonl:"):
+            _jsonl = open(spec.split(":", 1)[1], "a", buffering=1 << 16)
+        elif spec not in ("off", "prometheus"):
+            raise ValueError(f"Unknown instrumentation exporter: {spec!r}")
+        enabled = spec != "off"
+
+
+def reset() -> None:
+    with _lock:
+        _timings.clear()
+        _counters.clear()
+        _gauges.clear()
+
+
+def _write(record: dict) -> None:
+    # Called with _lock held.
+    record["ts"] = time.time()
+    _jsonl.write(json.dumps(record, default=str) + "\n")
+
+
+def observe(kind: str, name: str, seconds: float, **labels) -> None:
+    with _lock:
+        timing = _timings.get((kind, name))
+        if timing is None:
+            _timings[(kind, name)] = [1, seconds, seconds]
+        else:
+            timing[0] += 1
+            timing[1] += seconds
+            timing[2] = max(timing[2], seconds)
+        if _jsonl is not None:
+            _write(
+                {"type": "timer", "kind": kind, "name": name, "seconds": seconds}
+                | labels
+            )
+
+
+def count(name: str, value: float = 1, **labels) -> None:
+    if not enabled:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+        if _jsonl is not None:
+            _write({"type": "counter", "name": name, "value": value} | labels)
+
+
+def gauge(name: str, value: float, **labels) -> None:
+    """Record the current value of something that goes up and down, e.g. a queue."""
+    if not enabled:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _gauges[key] = value
+        if _jsonl is not None:
+            _write({"type": "gauge", "name": name, "value": value} | labels)
+
+
+class _Timer:
+    __slots__ = ("kind", "name", "start")
+
+    def __init__(self, kind: str, name: str) -> None:
+        self.kind = kind
+        self.name = name
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        observe(self.kind, self.name, time.perf_counter() - self.start)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullTimer":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(kind: str, name: str):
+    """Context manager that records how long its block took."""
+    return _Timer(kind, name) if enabled else _NULL_TIMER
+
+
+def timed(kind: str, name: Optional[str] = None):
+    """Decorator version of `timer` for sync and async functions."""
+
+    def decorate(func):
+        label = name or func.__name__
+        if iscoroutinefunction(func):
+
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not enabled:
+                    return await func(*args, **kwargs)
+                with _Timer(kind, label):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            with _Timer(kind, label):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+class LLMUsageHandler(BaseCallbackHandler):
+    """Count model calls, their latency and prompt/completion tokens per session."""
+
+    def __init__(self) -> None:
+        self._runs: Dict[UUID, tuple] = {}
+
+    def on_chat_model_start(
+        self,
+        serialized: Dict[str, Any],
+        messages: list,
+        *,
+        run_id: UUID,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        if enabled:
+            metadata = metadata or {}
+            self._runs[run_id] = (
+                metadata.get("thread_id", ""),
+                metadata.get("ls_model_name", "llm"),
+                time.perf_counter(),
+            )
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        session, model, start = run
+        observe("llm", model, time.perf_counter() - start, session=session)
+        count("llm_calls", session=session)
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(
+                    getattr(generation, "message", None), "usage_metadata", None
+                )
+                if usage:
+                    count("prompt_tokens", usage["input_tokens"], session=session)
+                    count("completion_tokens", usage["output_tokens"], session=session)
+
+    def on_llm_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._runs.pop(run_id, None)
+
+
+llm_usage = LLMUsageHandler()
+
+
+def _labels(labels: dict) -> str:
+    def escape(value) -> str:
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    return ",".join(f'{key}="{escape(value)}"' for key, value in labels.items())
+
+
+def render_prometheus() -> str:
+    """Render every timer, counter and gauge in the Prometheus text exposition format."""
+    with _lock:
+        timings = sorted(_timings.items())
+        counters = sorted(_counters.items())
+        gauges = sorted(_gauges.items())
+
+    lines = [f"# TYPE {PREFIX}_duration_seconds summary"]
+    for (kind, name), (n, total, _) in timings:
+        labels = _labels({"kind": kind, "name": name})
+        lines.append(f"{PREFIX}_duration_seconds_count{{{labels}}} {n}")
+        lines.append(f"{PREFIX}_duration_seconds_sum{{{labels}}} {total:.6f}")
+    lines.append(f"# TYPE {PREFIX}_duration_seconds_max gauge")
+    for (kind, name), (_, _, longest) in timings:
+        labels = _labels({"kind": kind, "name": name})
+        lines.append(f"{PREFIX}_duration_seconds_max{{{labels}}} {longest:.6f}")
+
+    declared = set()
+    for (name, labels), value in counters:
+        if name not in declared:
+            lines.append(f"# TYPE {PREFIX}_{name}_total counter")
+            declared.add(name)
+        lines.append(f"{PREFIX}_{name}_total{{{_labels(dict(labels))}}} {value:g}")
+
+    declared = set()
+    for (name, labels), value in gauges:
+        if name not in declared:
+            lines.append(f"# TYPE {PREFIX}_{name} gauge")
+            declared.add(name)
+        lines.append(f"{PREFIX}_{name}{{{_labels(dict(labels))}}} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+def _close() -> None:
+    with _lock:
+        if _jsonl is not None:
+            _jsonl.flush()
+
+
+configure(os.environ.get("INSTRUMENTATION"))
+atexit.register(_close)
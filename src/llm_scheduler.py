@@ -0,0 +1,455 @@
+"""
+Client-side scheduling of the model calls of every session of the process.
+
+Before a call reaches the provider it waits for:
+
+- the request and token budgets per minute, kept as token buckets;
+- a concurrency slot (at most `max_concurrency` calls in flight), handed out by
+  priority, interactive turns before background work, then in arrival order.
+
+The budget is waited for before the slot is taken, so a call paced by the rate limit
+never holds a slot another call could use.
+
+Calls the provider asks to retry (429, 5xx, timeouts) are retried with jittered
+exponential backoff, and a 429 also holds back every call of the process for the
+Retry-After the provider asked for, instead of each session retrying on its own.
+
+Configured by LLM_MAX_CONCURRENCY, LLM_REQUESTS_PER_MINUTE and LLM_TOKENS_PER_MINUTE.
+"""
+
+import asyncio
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from pydantic import ConfigDict
+
+from src import instrumentation
+from src.history import message_tokens
+
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+# Status codes worth another try; anything else is the caller's mistake.
+RETRY_STATUS = {408, 409, 429}
+
+
+class TokenBucket:
+    """
+    `per_minute` units a minute, at most `capacity` saved up for a burst.
+
+    Reservations are never refused: a call starts once the debt of the calls before
+    it has been paid back, then adds its own, so calls are paced in arrival order.
+    """
+
+    def __init__(self, per_minute: float, capacity: float = 1.0) -> None:
+        self.rate = per_minute / 60.0
+        # Providers enforce per-minute limits over much shorter windows, so by
+        # default nothing is saved up: calls are spread evenly over the minute.
+        self.capacity = capacity
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Take `amount` and return the seconds to wait before using it."""
+        with self._lock:
+            self._refill()
+            wait = max(0.0, -self.level / self.rate)
+            self.level -= amount
+            return wait
+
+    def adjust(self, amount: float) -> None:
+        """Take (or give back, when negative) what a call used beyond its reservation."""
+        with self._lock:
+            self._refill()
+            self.level = min(self.capacity, self.level - amount)
+
+    def pause(self, seconds: float) -> None:
+        """Push every later reservation back by at least `seconds`."""
+        with self._lock:
+            self._refill()
+            self.level = min(self.level, -seconds * self.rate)
+
+
+class _Waiter:
+    __slots__ = ("wake", "granted", "cancelled")
+
+    def __init__(self, wake) -> None:
+        self.wake = wake
+        self.granted = False
+        self.cancelled = False
+
+
+class Slot:
+    """A granted call; set `tokens` to what the call used once it is known."""
+
+    __slots__ = ("reserved", "tokens")
+
+    def __init__(self, reserved: int) -> None:
+        self.reserved = reserved
+        self.tokens: Optional[int] = None
+
+
+class LLMScheduler:
+    """Concurrency slots by priority, rate limits and retry policy shared by every call."""
+
+    def __init__(
+        self,
+        max_concurrency: int = 16,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        max_retries: int = 5,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+    ) -> None:
+        self.max_concurrency = max_concurrency
+        self.requests = (
+            TokenBucket(requests_per_minute) if requests_per_minute else None
+        )
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.in_flight = 0
+        # No call starts before this time.monotonic() after a 429.
+        self._resume_at = 0.0
+        self._lock = threading.Lock()
+        # (priority, arrival, waiter)
+        self._queue: List[tuple] = []
+        self._depth: Dict[int, int] = {}
+        self._arrivals = itertools.count()
+
+    def queue_depth(self, priority: Optional[int] = None) -> int:
+        with self._lock:
+            if priority is None:
+                return sum(self._depth.values())
+            return self._depth.get(priority, 0)
+
+    def _report(self, priority: int) -> None:
+        # Called with _lock held.
+        instrumentation.gauge(
+            "llm_queue_depth",
+            self._depth.get(priority, 0),
+            priority=PRIORITY_NAMES.get(priority, priority),
+        )
+        instrumentation.gauge("llm_in_flight", self.in_flight)
+
+    def _enqueue(self, priority: int, wake) -> Optional[_Waiter]:
+        """Take a free slot, or queue up and return the waiter to wait on."""
+        with self._lock:
+            if self.in_flight < self.max_concurrency and not self._queue:
+                self.in_flight += 1
+                self._report(priority)
+                return None
+            waiter = _Waiter(wake)
+            heapq.heappush(self._queue, (priority, next(self._arrivals), waiter))
+            self._depth[priority] = self._depth.get(priority, 0) + 1
+            self._report(priority)
+            return waiter
+
+    def _release(self) -> None:
+        with self._lock:
+            while self._queue:
+                priority, _, waiter = heapq.heappop(self._queue)
+                self._depth[priority] -= 1
+                self._report(priority)
+                if not waiter.cancelled:
+                    # The slot goes straight to the next waiter.
+                    waiter.granted = True
+                    waiter.wake()
+                    return
+            self.in_flight -= 1
+            instrumentation.gauge("llm_in_flight", self.in_flight)
+
+    def _cancel(self, waiter: _Waiter) -> None:
+        with self._lock:
+            waiter.cancelled = True
+            granted = waiter.granted
+        if granted:
+            self._release()
+
+    def _budget(self, tokens: int) -> float:
+        """Seconds to wait for the request and token budgets."""
+        wait = max(0.0, self._resume_at - time.monotonic())
+        if self.requests is not None:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.reserve(tokens))
+        return wait
+
+    def _settle(self, slot: Slot) -> None:
+        if self.tokens is not None and slot.tokens is not None:
+            self.tokens.adjust(slot.tokens - slot.reserved)
+
+    def _waited(self, priority: int, seconds: float) -> None:
+        if instrumentation.enabled:
+            instrumentation.observe(
+                "llm_wait", PRIORITY_NAMES.get(priority, str(priority)), seconds
+            )
+
+    @contextmanager
+    def slot(self, priority: int = INTERACTIVE, tokens: int = 0) -> Iterator[Slot]:
+        """Hold a concurrency slot, within the rate limits, for the duration of a call."""
+        start = time.perf_counter()
+        if (delay := self._budget(tokens)) > 0:
+            time.sleep(delay)
+        event = threading.Event()
+        if (waiter := self._enqueue(priority, event.set)) is not None:
+            try:
+                event.wait()
+            except BaseException:
+                self._cancel(waiter)
+                raise
+        try:
+            self._waited(priority, time.perf_counter() - start)
+            slot = Slot(tokens)
+            yield slot
+            self._settle(slot)
+        finally:
+            self._release()
+
+    @asynccontextmanager
+    async def aslot(
+        self, priority: int = INTERACTIVE, tokens: int = 0
+    ) -> AsyncIterator[Slot]:
+        start = time.perf_counter()
+        if (delay := self._budget(tokens)) > 0:
+            await asyncio.sleep(delay)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake() -> None:
+            # Slots may be released from another thread.
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        if (waiter := self._enqueue(priority, wake)) is not None:
+            try:
+                await future
+            except BaseException:
+                self._cancel(waiter)
+                raise
+        try:
+            self._waited(priority, time.perf_counter() - start)
+            slot = Slot(tokens)
+            yield slot
+            self._settle(slot)
+        finally:
+            self._release()
+
+    def retry_delay(self, attempt: int, error: BaseException) -> Optional[float]:
+        """
+        Seconds to wait before retrying after `error`, or None when it is not retried.
+
+        Full jitter over an exponential cap, and never less than the Retry-After the
+        provider asked for.
+        """
+        status = getattr(error, "status_code", None)
+        retryable = (
+            status in RETRY_STATUS
+            or (isinstance(status, int) and status >= 500)
+            or isinstance(error, (TimeoutError, ConnectionError))
+            or type(error).__name__ in ("APITimeoutError", "APIConnectionError")
+        )
+        if not retryable or attempt >= self.max_retries:
+            return None
+
+        reason = str(status) if status is not None else type(error).__name__
+        instrumentation.count("llm_retries", reason=reason)
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+        retry_after = _retry_after(error)
+        if status == 429:
+            # Everyone else would hit the same limit: hold back the whole process.
+            instrumentation.count("llm_rate_limited")
+            pause = max(retry_after or 0.0, self.base_delay)
+            with self._lock:
+                self._resume_at = max(self._resume_at, time.monotonic() + pause)
+            for bucket in (self.requests, self.tokens):
+                if bucket is not None:
+                    bucket.pause(pause)
+        return max(delay, retry_after or 0.0)
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    for header, scale in (("retry-after-ms", 1e-3), ("retry-after", 1.0)):
+        try:
+            return float(headers[header]) * scale
+        except (KeyError, TypeError, ValueError):
+            continue
+    return None
+
+
+def _number(name: str) -> Optional[float]:
+    value = os.environ.get(name)
+    return float(value) if value else None
+
+
+@lru_cache(maxsize=1)
+def get_scheduler() -> LLMScheduler:
+    """Scheduler shared by every model of the process."""
+    return LLMScheduler(
+        max_concurrency=int(_number("LLM_MAX_CONCURRENCY") or 16),
+        requests_per_minute=_number("LLM_REQUESTS_PER_MINUTE"),
+        tokens_per_minute=_number("LLM_TOKENS_PER_MINUTE"),
+    )
+
+
+def _usage(message) -> Optional[int]:
+    usage = getattr(message, "usage_metadata", None)
+    return usage["total_tokens"] if usage else None
+
+
+class ScheduledChatModel(BaseChatModel):
+    """
+    Chat model whose calls to `model` go through `scheduler`.
+
+    The wrapped model is called through its own _generate/_stream, so callbacks and
+    streamed tokens are reported once, by this model. A streamed reply is only
+    retried if it failed before its first chunk.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    model: BaseChatModel
+    scheduler: Any
+    priority: int = INTERACTIVE
+    # Reserved up front for the reply; corrected with the usage once it is known.
+    completion_tokens: int = 256
+
+    @property
+    def _llm_type(self) -> str:
+        return self.model._llm_type
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return self.model._identifying_params
+
+    def _get_ls_params(self, stop: Optional[List[str]] = None, **kwargs: Any):
+        return self.model._get_ls_params(stop=stop, **kwargs)
+
+    def bind_tools(self, tools: list, **kwargs: Any):
+        bound = self.model.bind_tools(tools, **kwargs)
+        return self.bind(**getattr(bound, "kwargs", {}))
+
+    def with_priority(self, priority: int) -> "ScheduledChatModel":
+        """The same model and scheduler, queued at `priority`."""
+        return self.model_copy(update={"priority": priority})
+
+    def _estimate(self, messages: List[BaseMessage]) -> int:
+        return sum(map(message_tokens, messages)) + self.completion_tokens
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[Any] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        tokens = self._estimate(messages)
+        for attempt in itertools.count():
+            with self.scheduler.slot(self.priority, tokens) as slot:
+                try:
+                    result = self.model._generate(
+                        messages, stop=stop, run_manager=run_manager, **kwargs
+                    )
+                except Exception as error:
+                    if (delay := self.scheduler.retry_delay(attempt, error)) is None:
+                        raise
+                else:
+                    slot.tokens = _usage(result.generations[0].message)
+                    return result
+            time.sleep(delay)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[Any] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        tokens = self._estimate(messages)
+        for attempt in itertools.count():
+            async with self.scheduler.aslot(self.priority, tokens) as slot:
+                try:
+                    result = await self.model._agenerate(
+                        messages, stop=stop, run_manager=run_manager, **kwargs
+                    )
+                except Exception as error:
+                    if (delay := self.scheduler.retry_delay(attempt, error)) is None:
+                        raise
+                else:
+                    slot.tokens = _usage(result.generations[0].message)
+                    return result
+            await asyncio.sleep(delay)
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[Any] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        tokens = self._estimate(messages)
+        for attempt in itertools.count():
+            started = False
+            with self.scheduler.slot(self.priority, tokens) as slot:
+                try:
+                    for chunk in self.model._stream(
+                        messages, stop=stop, run_manager=run_manager, **kwargs
+                    ):
+                        started = True
+                        if (used := _usage(chunk.message)) is not None:
+                            slot.tokens = (slot.tokens or 0) + used
+                        yield chunk
+                    return
+                except Exception as error:
+                    delay = (
+                        None if started else self.scheduler.retry_delay(attempt, error)
+                    )
+                    if delay is None:
+                        raise
+            time.sleep(delay)
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[Any] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        tokens = self._estimate(messages)
+        for attempt in itertools.count():
+            started = False
+            async with self.scheduler.aslot(self.priority, tokens) as slot:
+                try:
+                    async for chunk in self.model._astream(
+                        messages, stop=stop, run_manager=run_manager, **kwargs
+                    ):
+                        started = True
+                        if (used := _usage(chunk.message)) is not None:
+                            slot.tokens = (slot.tokens or 0) + used
+                        yield chunk
+                    return
+                except Exception as error:
+                    delay = (
+                        None if started else self.scheduler.retry_delay(attempt, error)
+                    )
+                    if delay is None:
+                        raise
+            await asyncio.sleep(delay)
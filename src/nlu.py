@@ -0,0 +1,255 @@
+"""
+Rule-based extraction of the SlotFilling fields from a client utterance.
+
+It runs before the model on every turn: slots that are unambiguous in the text
+("tenho 25 anos", "16GB", "não preciso de GPU") are saved right away, so the model
+already sees them in "Client Info". Anything uncertain is left to the model.
+"""
+
+import re
+from typing import Optional
+
+from pydantic import ValidationError
+
+from src.slot_filling import SLOT_COLUMNS, SlotUpdate
+
+# Sentence or clause boundaries; a negation only applies inside its own clause.
+_CLAUSES = re.compile(r"[.,;!?\n]+")
+# A question ("Preciso de GPU?", "¿Cuántos años?") asks, it does not inform.
+_QUESTIONS = re.compile(r"¿[^?]*\?|[^.!?\n]*\?")
+
+_NAME = re.compile(
+    r"(?i:\b(?:meu\s+nome\s+[ée]|me\s+chamo|sou\s+[oa]|my\s+name\s+is|i'?m|i\s+am"
+    r"|me\s+llamo|mi\s+nombre\s+es|soy)\s+)"
+    r"([A-ZÀ-Ý][a-zà-ÿ'-]+)\b"
+)
+# Capitalized words that follow "I'm" or "soy" without being a name.
+_NOT_NAMES = frozenset(
+    """
+    a an the not so very just also still really here back new fine good great ok
+    okay sure happy glad sorry ready from in at on with interested curious single
+    married retired student gamer developer programmer engineer teacher designer
+    brazilian portuguese american mexican argentinian argentine colombian chilean
+    peruvian canadian spanish english british french german italian chinese japanese
+    korean indian de un una el la muy nuevo nueva estudiante programador ingeniero
+    profesor brasileño brasileña mexicano mexicana argentino argentina colombiano
+    colombiana chileno chilena español española interesado interesada buscando
+    cliente professor estudante
+    """.split()
+)
+
+_AGES = [
+    re.compile(pattern, re.IGNORECASE)
+    for pattern in (
+        # "tenho 10 anos de experiência" is not an age, "tenho 25 anos de idade" is.
+        r"\b(?:tenho|tengo)\s+(\d{1,3})\s+(?:anos|años)\b"
+        r"(?!\s+(?:de|em|en|na|no|com|con)\s+(?!idade\b|edad\b))",
+        r"\b(\d{1,3})\s*(?:anos\s+de\s+idade|años\s+de\s+edad|years?\s+old)\b",
+        r"\b(?:idade|age|edad)\s*(?:[ée]|is|es|:)?\s*(\d{1,3})\b",
+        # A bare number only at the end of its clause: "I'm 30", not "I'm 5 minutes".
+        r"\b(?:i'?m|i\s+am)\s+(\d{1,3})\s*(?:$|[.,;!]|(?:and|but|y|e)\b)",
+    )
+]
+
+# Amounts of RAM notebooks are sold with; other sizes are most likely storage.
+RAM_SIZES = {4, 6, 8, 12, 16, 24, 32, 48, 64}
+_RAM = re.compile(
+    r"\b(\d{1,3})\s*(?:gb|gigas?|gigabytes?)\b"
+    r"(?!\s*(?:de\s+|of\s+|na\s+|on\s+)?(?:ssd|hdd?|nvme|armazenamento|storage"
+    r"|disco|disk|almacenamiento|vram|gpu|v[íi]deo|video))",
+    re.IGNORECASE,
+)
+_RAM_NAMED = re.compile(
+    r"\s*(?:de\s+|of\s+)?(?:ram|mem[óo]ria|memory)\b", re.IGNORECASE
+)
+# Graphics cards come with memory of their own: "placa de vídeo com 8GB", "RTX 4060 8GB".
+_GPU_MEMORY = re.compile(
+    r"\b(?:gpu|v[íi]deo|video|gr[áa]fica|graphics|rtx|gtx|radeon|geforce|vram)\b",
+    re.IGNORECASE,
+)
+# Words after which a size refers to something else than the graphics card.
+_RAM_CONTEXT = re.compile(
+    r"\b(?:e|and|y|plus|mais|ram|mem[óo]ria|memory)\b", re.IGNORECASE
+)
+
+_GPU = re.compile(
+    r"\b(?:gpu|placa\s+de\s+v[íi]deo|placa\s+gr[áa]fica|video\s+card|graphics\s+card"
+    r"|tarjeta\s+gr[áa]fica|tarjeta\s+de\s+v[íi]deo)\b",
+    re.IGNORECASE,
+)
+_GPU_UNSURE = re.compile(
+    r"\b(?:n[ãa]o\s+sei|talvez|not\s+sure|don'?t\s+know|maybe|no\s+s[ée]|quiz[áa]s"
+    r"|tal\s+vez)\b",
+    re.IGNORECASE,
+)
+_GPU_NO = re.compile(
+    r"\b(?:n[ãa]o|nem|sem|no|sin|without|don'?t|do\s+not)\b", re.IGNORECASE
+)
+_GPU_YES = re.compile(
+    r"\b(?:sim|yes|s[íi]|preciso|need|necesito|quero|want|quiero|com|with|con)\b",
+    re.IGNORECASE,
+)
+# "not for games", "não é para jogos": the purpose the client rules out.
+_GOAL_NO = re.compile(
+    r"\b(?:n[ãa]o|not|no|nem|sem|without|sin)\s+"
+    r"(?:(?:[ée]|is|es|para|pra|for|de|com|with)\s+){0,2}$",
+    re.IGNORECASE,
+)
+
+# Answers to a yes/no question; CJK words have no word boundaries to match on.
+_YES = re.compile(
+    r"\b(?:sim|isso|certo|correto|pode|claro|ok|okay|yes|yeah|yep|sure|correct|s[íi]"
+    r"|vale|oui|ja|genau)\b|是|好|对|はい|네|예",
+    re.IGNORECASE,
+)
+_NO = re.compile(
+    r"\b(?:n[ãa]o|nope|no|not|non|nein|mudar|change|cambiar)\b|不|いいえ|아니",
+    re.IGNORECASE,
+)
+
+# Purposes, each with the keywords of every language and the value saved for them.
+_GOALS = [
+    (
+        "games",
+        re.compile(
+            r"\b(?:(jogos|jogar)|(gaming|games)|(juegos|jugar))\b", re.IGNORECASE
+        ),
+    ),
+    (
+        "work",
+        re.compile(
+            r"\b(?:(trabalho|trabalhar)|(?:for|at|to)\s+(work)|(trabajo|trabajar))\b",
+            re.IGNORECASE,
+        ),
+    ),
+    (
+        "study",
+        re.compile(
+            r"\b(?:(estudos?|estudar|faculdade)|(study|studying|studies|college)"
+            r"|(estudiar|estudios|universidad))\b",
+            re.IGNORECASE,
+        ),
+    ),
+]
+# Value saved per purpose, in the language its keyword was written in.
+GOAL_VALUES = {
+    "games": ("jogos", "gaming", "juegos"),
+    "work": ("trabalho", "work", "trabajo"),
+    "study": ("estudo", "study", "estudios"),
+}
+
+
+def _name(text: str):
+    for match in _NAME.finditer(text):
+        name = match.group(1)
+        folded = name.casefold()
+        if folded not in _NOT_NAMES and not (len(name) > 4 and folded.endswith("ing")):
+            return name
+    return None
+
+
+def _age(text: str):
+    for pattern in _AGES:
+        if match := pattern.search(text):
+            return int(match.group(1))
+    return None
+
+
+def _gpu_memory(clause: str, match: re.Match) -> bool:
+    """Whether the size in `match` is the memory of a graphics card."""
+    if _RAM_NAMED.match(clause, match.end()):
+        return False
+    since = _RAM_CONTEXT.split(clause[: match.start()])[-1]
+    return bool(_GPU_MEMORY.search(since))
+
+
+def _ram(text: str):
+    sizes = {
+        int(match.group(1))
+        for clause in _CLAUSES.split(text)
+        for match in _RAM.finditer(clause)
+        if not _gpu_memory(clause, match)
+    } & RAM_SIZES
+    # Two different amounts ("8GB ou 16GB") are a question, not an answer.
+    return f"{sizes.pop()}GB" if len(sizes) == 1 else None
+
+
+def _gpu(text: str):
+    answers = set()
+    for clause in _CLAUSES.split(text):
+        if not (match := _GPU.search(clause)):
+            continue
+        before = clause[: match.start()]
+        if _GPU_UNSURE.search(clause):
+            return None
+        if _GPU_NO.search(before):
+            answers.add("Não")
+        elif _GPU_YES.search(before):
+            answers.add("Sim")
+    return answers.pop() if len(answers) == 1 else None
+
+
+def _goals(text: str) -> dict:
+    """Purpose -> value in the language of its keyword, for every purpose mentioned."""
+    found = {}
+    for goal, pattern in _GOALS:
+        for match in pattern.finditer(text):
+            clause = _CLAUSES.split(text[: match.start()])[-1]
+            if _GOAL_NO.search(clause):
+                continue
+            language = next(i for i, group in enumerate(match.groups()) if group)
+            found[goal] = GOAL_VALUES[goal][language]
+            break
+    return found
+
+
+def _goal(text: str):
+    found = _goals(text)
+    return found.popitem()[1] if len(found) == 1 else None
+
+
+def goal_category(goal: str) -> Optional[str]:
+    """ "games", "work" or "study" when a saved goal names exactly one of them."""
+    value = goal.strip().casefold()
+    for category, values in GOAL_VALUES.items():
+        if value in values:
+            return category
+    found = _goals(goal)
+    return found.popitem()[0] if len(found) == 1 else None
+
+
+def extract_slots(text: str) -> dict:
+    """
+    Return the SlotUpdate fields stated unambiguously in `text`.
+
+    Questions are skipped. A field is left out whenever the rules find nothing, more
+    than one candidate or a hedge ("talvez", "not sure"), or the value fails
+    SlotUpdate's validation.
+    """
+    text = _QUESTIONS.sub("\n", text)
+    candidates = {
+        "client_name": _name(text),
+        "age": _age(text),
+        "goal": _goal(text),
+        "ram": _ram(text),
+        "has_gpu": _gpu(text),
+    }
+    slots = {}
+    for field, value in candidates.items():
+        if value is None:
+            continue
+        try:
+            slots[field] = getattr(SlotUpdate(**{field: value}), field)
+        except ValidationError:
+            continue
+    return slots
+
+
+def slot_row(slots: dict) -> dict:
+    """Map SlotUpdate fields to the keyword arguments of create_or_update_user."""
+    return {SLOT_COLUMNS[field]: value for field, value in slots.items()}
+
+
+def confirms(text: str) -> bool:
+    """True for a plain yes ("sim", "pode gerar"); anything with a no or a change is not."""
+    return bool(_YES.search(text)) and not _NO.search(text)
@@ -3,6 +3,18 @@ from langchain_core.prompts import ChatPromptTemplate
 
 from src.slot_filling import slots_description
 
+# Languages the client can choose in the UI.
+languages = [
+    "Portuguese",
+    "English",
+    "Spanish",
+    "French",
+    "German",
+    "Chinese",
+    "Japanese",
+    "Korean",
+]
+
 _persona = """Your job is to gather information from the client about the notebook they need to purchase. \
 Be friendly and always call the customer by name using "Client Info" section!
 
@@ -17,6 +29,9 @@ Do not overwhelm the client with too many questions at once; ask for the informa
 do not have to write much in each response.
 Always remind them that if they are unsure about any detail, you can assist them in deciding.
 
+Whenever the client gives you one or more of these details, save all of them at once with a single \
+call to the `inform_slots` tool instead of one tool call per detail.
+Details already filled in "Client Info" have been saved for you; only save what is new or corrected.
 After you are able to discern all the information, call the relevant tool.
 
 Client Info: {user_info}
@@ -31,3 +46,33 @@ system_prompt_template = ChatPromptTemplate.from_messages(
         ("placeholder", "{messages}"),
     ]
 ).partial(slots_description=slots_description, time=datetime.now())
+
+# One-shot check of a saved profile before recommending from it, per UI language.
+confirmation_templates = {
+    "Portuguese": (
+        "{name}, encontrei o seu cadastro: {details}. "
+        "Posso gerar a recomendação com esses dados?"
+    ),
+    "English": (
+        "{name}, I found your profile: {details}. "
+        "Shall I generate the recommendation with these details?"
+    ),
+    "Spanish": (
+        "{name}, encontré tu perfil: {details}. "
+        "¿Genero la recomendación con estos datos?"
+    ),
+    "French": (
+        "{name}, j'ai retrouvé votre profil : {details}. "
+        "Je génère la recommandation avec ces informations ?"
+    ),
+    "German": (
+        "{name}, ich habe Ihr Profil gefunden: {details}. "
+        "Soll ich die Empfehlung mit diesen Angaben erstellen?"
+    ),
+    "Chinese": "{name}，我找到了您的资料：{details}。要按这些信息为您生成推荐吗？",
+    "Japanese": (
+        "{name}さん、プロフィールが見つかりました：{details}。"
+        "この内容でおすすめを作成してもよろしいですか？"
+    ),
+    "Korean": "{name}님, 프로필을 찾았습니다: {details}. 이 정보로 추천을 생성할까요?",
+}
@@ -0,0 +1,96 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+MISSING = object()
+
+
+class ProfileCache:
+    """
+    Bounded LRU cache of Clients rows with a time-to-live, keyed by user id.
+
+    `None` is a valid cached value and means "no such user". With `maxsize=0` nothing
+    is cached.
+    """
+
+    def __init__(self, maxsize: int = 4096, ttl: float = 300.0) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by every write so a slow reader cannot cache a row older than a write.
+        self._writes = 0
+
+    def get(self, key) -> object:
+        """Return the cached row of `key`, or MISSING."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+                self.evictions += 1
+            self.misses += 1
+            return MISSING
+
+    def token(self) -> int:
+        """Snapshot to pass to `put` after reading the row from the database."""
+        return self._writes
+
+    def put(self, key, value: Optional[tuple], token: Optional[int] = None) -> None:
+        """Cache a row read from the database, unless a write happened since `token`."""
+        with self._lock:
+            if token is not None and token != self._writes:
+                return
+            self._store(key, value)
+
+    def write(self, key, update: Callable[[Optional[tuple]], Optional[tuple]]) -> None:
+        """Write-through: apply `update` to the cached row of `key`, if it is cached."""
+        with self._lock:
+            self._writes += 1
+            entry = self._data.get(key)
+            if entry is not None:
+                self._store(key, update(entry[1]))
+
+    def set(self, key, value: Optional[tuple]) -> None:
+        """Write-through for writes whose result is known, e.g. a delete."""
+        with self._lock:
+            self._writes += 1
+            self._store(key, value)
+
+    def discard(self, key) -> None:
+        """Forget the row of `key`, so the next read goes to the database."""
+        with self._lock:
+            self._writes += 1
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._writes += 1
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _store(self, key, value: Optional[tuple]) -> None:
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
@@ -1,13 +1,25 @@
+from typing import List, Optional
+
 from langchain_core.messages import AIMessage, ToolMessage, SystemMessage
 
+# Added to the prompt when the catalog already picked the candidates.
+_candidates_section = """
+        [Notebooks disponíveis em estoque, do mais para o menos adequado]
+        {candidates}
+
+        Recomende apenas notebooks desta lista e explique por que cada um atende ao cliente.
+"""
 
-def simple_recommendation_system(user_info: str, messages: list, language: str):
+
+def simple_recommendation_system(
+    user_info: str, messages: list, language: str, candidates: Optional[List] = None
+):
     prompt_generate_recommendations = """
         Você é capaz gerar uma lista de notebooks recomendados com base nas informações a seguir:
 
         [Preferências do Usuário]
         {user_info}
-
+        {candidates_section}
         [Informações sobre o Idioma]
         "Respond in the {lang} language."
 
@@ -23,13 +35,22 @@ def simple_recommendation_system(user_info: str, messages: list, language: str):
             continue
         elif tool_call is not None:
             other_msgs.append(message)
-    print(other_msgs)
     return [
         SystemMessage(
             content=prompt_generate_recommendations.format(
                 user_info=user_info,
                 reqs=tool_call,
                 lang=language,
+                candidates_section=(
+                    _candidates_section.format(
+                        candidates="\n        ".join(
+                            f"{i}. {product.to_text()}"
+                            for i, product in enumerate(candidates, start=1)
+                        )
+                    )
+                    if candidates
+                    else ""
+                ),
             )
         )
     ] + other_msgs
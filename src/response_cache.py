@@ -0,0 +1,114 @@
+import hashlib
+import json
+import threading
+import time
+from typing import List
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+
+from src import instrumentation
+from src.async_database import run
+from src.connection import ConnectionManager
+
+
+class ResponseCache:
+    """
+    Persistent cache for model calls whose prompt does not depend on the dialogue state.
+
+    Entries are keyed by a hash of the prompt and the model parameters, kept in memory
+    and in a SQLite table so they survive restarts.
+    """
+
+    def __init__(self, db: ConnectionManager, table: str = "LLMResponses") -> None:
+        self.db = db
+        self.table = table
+        self.hits = 0
+        self.misses = 0
+        self._memory: dict = {}
+        self._lock = threading.Lock()
+        self._created = False
+
+    def _ensure_table(self) -> None:
+        if not self._created:
+            with instrumentation.timer("sql", "create_responses"):
+                with self.db.transaction() as cursor:
+                    cursor.execute(
+                        f"""
+                        CREATE TABLE IF NOT EXISTS {self.table}(
+                            key TEXT PRIMARY KEY NOT NULL,
+                            content TEXT NOT NULL,
+                            created_at REAL NOT NULL
+                        )
+                    """
+                    )
+            self._created = True
+
+    @staticmethod
+    def key(llm: BaseChatModel, messages: List[BaseMessage]) -> str:
+        payload = json.dumps(
+            {
+                "model": llm._identifying_params,
+                "messages": [(message.type, message.content) for message in messages],
+            },
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key: str):
+        """Return the cached content for `key`, or None."""
+        if (content := self._memory.get(key)) is not None:
+            return content
+        self._ensure_table()
+        with instrumentation.timer("sql", "select_response"):
+            row = (
+                self.db.connection()
+                .execute(f"SELECT content FROM {self.table} WHERE key = ?", (key,))
+                .fetchone()
+            )
+        if row is not None:
+            with self._lock:
+                self._memory[key] = row[0]
+            return row[0]
+        return None
+
+    def put(self, key: str, content: str) -> None:
+        self._ensure_table()
+        with instrumentation.timer("sql", "insert_response"):
+            with self.db.transaction() as cursor:
+                cursor.execute(
+                    f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?)",
+                    (key, content, time.time()),
+                )
+        with self._lock:
+            self._memory[key] = content
+
+    def invoke(self, llm: BaseChatModel, messages: List[BaseMessage]) -> AIMessage:
+        """Call `llm` only if this exact prompt was never answered before."""
+        key = self.key(llm, messages)
+        content = self.get(key)
+        if content is None:
+            self.misses += 1
+            content = llm.invoke(messages).content
+            self.put(key, content)
+        else:
+            self.hits += 1
+        # Always a new message: reusing one id would make add_messages replace it.
+        return AIMessage(content=content)
+
+    async def ainvoke(
+        self, llm: BaseChatModel, messages: List[BaseMessage]
+    ) -> AIMessage:
+        """Async invoke; memory hits are answered without leaving the event loop."""
+        key = self.key(llm, messages)
+        content = self._memory.get(key)
+        if content is None:
+            content = await run(self.get, key)
+        if content is None:
+            self.misses += 1
+            content = (await llm.ainvoke(messages)).content
+            await run(self.put, key, content)
+        else:
+            self.hits += 1
+        return AIMessage(content=content)
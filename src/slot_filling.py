@@ -1,4 +1,7 @@
-from pydantic import BaseModel, Field
+import re
+from typing import Optional
+
+from pydantic import BaseModel, Field, field_validator
 
 
 class SlotFilling(BaseModel):
@@ -13,6 +16,56 @@ class SlotFilling(BaseModel):
     has_gpu: bool = Field(description="Precisa ter GPU (Yes/No)")
 
 
+class SlotUpdate(BaseModel):
+    """Any subset of the SlotFilling fields informed by the client."""
+
+    client_name: Optional[str] = Field(default=None, description="O nome do cliente.")
+    age: Optional[int] = Field(default=None, description="A idade do cliente.")
+    goal: Optional[str] = Field(
+        default=None,
+        description="Proposito de uso do computador: trabalho, estudo, jogos e similares",
+    )
+    ram: Optional[str] = Field(
+        default=None, description="Quanto de memoria RAM: 4GB, 8GB, 16GB ou 32GB"
+    )
+    has_gpu: Optional[str] = Field(
+        default=None, description="Precisa ter GPU (Sim, Não ou Talvez)"
+    )
+
+    @field_validator("client_name", "goal", "has_gpu")
+    @classmethod
+    def strip_text(cls, value: Optional[str]) -> Optional[str]:
+        if value is not None:
+            value = value.strip()
+        return value or None
+
+    @field_validator("age")
+    @classmethod
+    def check_age(cls, value: Optional[int]) -> Optional[int]:
+        if value is not None and not 0 < value < 120:
+            raise ValueError("a idade deve estar entre 1 e 119 anos")
+        return value
+
+    @field_validator("ram")
+    @classmethod
+    def normalize_ram(cls, value: Optional[str]) -> Optional[str]:
+        if value is None:
+            return None
+        match = re.fullmatch(r"\s*(\d+)\s*(gb|g|gigas?)?\s*", value, re.IGNORECASE)
+        if not match:
+            raise ValueError("informe a memória RAM em GB, por exemplo 16GB")
+        return f"{match.group(1)}GB"
+
+
+# SlotUpdate field -> Clients column.
+SLOT_COLUMNS = {
+    "client_name": "name",
+    "age": "age",
+    "goal": "goal",
+    "ram": "ram",
+    "has_gpu": "needs_gpu",
+}
+
 slots_description = """
     - Client name: the client's name
     - Age: the client's age
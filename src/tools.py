@@ -1,8 +1,112 @@
+import asyncio
+import json
+from typing import Iterable, Optional
+
+from langchain_core.messages import ToolMessage
 from langchain_core.tools import tool
-from langchain_core.runnables.config import RunnableConfig
+from langchain_core.runnables.config import (
+    RunnableConfig,
+    get_config_list,
+    get_executor_for_config,
+)
+from langgraph.prebuilt import ToolNode
+from langgraph.prebuilt.tool_node import TOOL_CALL_ERROR_TEMPLATE
+from pydantic import ValidationError
+
+from src import instrumentation
+from src.async_database import acreate_or_update_user, aget_profile
+from src.database import COLUMNS, ClientProfile, create_or_update_user, get_profile
+from src.slot_filling import SLOT_COLUMNS, SlotFilling, SlotUpdate
+
+# Clients column -> name the model knows the slot by (the inform_slots arguments).
+SLOT_NAMES = {column: field for field, column in SLOT_COLUMNS.items()}
+
+
+def _value(value) -> str:
+    text = str(value)
+    # Quote only what would not read back as one value.
+    if not text or any(ch in text for ch in ' ,="\n'):
+        return json.dumps(text, ensure_ascii=False)
+    return text
+
+
+def profile_result(profile: Optional[ClientProfile], columns: Iterable[str]) -> str:
+    """
+    Compact tool result: the saved value of `columns` and the slots still missing.
+
+    The profile is already in the prompt as "Client Info", so tool results only carry
+    what changed, e.g. `age=30 missing=ram,has_gpu`.
+    """
+    record = profile._asdict() if profile else {}
+    saved = [f"{SLOT_NAMES[column]}={_value(record.get(column))}" for column in columns]
+    missing = [
+        name for column, name in SLOT_NAMES.items() if record.get(column) is None
+    ]
+    return " ".join(saved + [f"missing={','.join(missing) or 'none'}"])
+
+
+def _result(user_id: int, columns: Iterable[str]) -> str:
+    return profile_result(get_profile(id=user_id), columns)
+
+
+async def _aresult(user_id: int, columns: Iterable[str]) -> str:
+    return profile_result(await aget_profile(id=user_id), columns)
+
+
+def _informed(row: dict) -> list:
+    """Columns of a create_or_update_user call that carry a value."""
+    return [column for column, value in row.items() if value is not None]
 
-from src.database import create_or_update_user, get_user_by_id
-from src.slot_filling import SlotFilling
+
+def _user_id(config: RunnableConfig):
+    configuration = config.get("configurable", dict())
+    user_id = configuration.get("user_id")
+
+    if not user_id:
+        raise ValueError("No User ID configured.")
+
+    return user_id
+
+
+async def _asave(config: RunnableConfig, **row) -> str:
+    user_id = _user_id(config)
+    await acreate_or_update_user(id=user_id, **row)
+    return await _aresult(user_id, _informed(row))
+
+
+def _coroutine_of(sync_tool):
+    """Register the decorated coroutine as the async implementation of `sync_tool`."""
+
+    def register(coroutine):
+        sync_tool.coroutine = coroutine
+        return coroutine
+
+    return register
+
+
+@tool("inform_slots", args_schema=SlotUpdate)
+def inform_slots(
+    config: RunnableConfig,
+    client_name: str = None,
+    age: int = None,
+    goal: str = None,
+    ram: str = None,
+    has_gpu: str = None,
+) -> str:
+    """
+    Salva de uma só vez todas as informações que o cliente acabou de informar: nome, idade,
+    objetivo, memória RAM e/ou GPU. Informe apenas os campos conhecidos.
+    """
+
+    configuration = config.get("configurable", dict())
+    user_id = configuration.get("user_id")
+
+    if not user_id:
+        raise ValueError("No User ID configured.")
+
+    row = dict(name=client_name, age=age, goal=goal, ram=ram, needs_gpu=has_gpu)
+    create_or_update_user(id=user_id, **row)
+    return _result(user_id, _informed(row))
 
 
 @tool("inform_name")
@@ -16,9 +120,7 @@ def inform_name(client_name: str, config: RunnableConfig) -> str:
         raise ValueError("No User ID configured.")
 
     create_or_update_user(id=user_id, name=client_name)
-    user = get_user_by_id(id=user_id)
-
-    return user.to_string(index=False)
+    return _result(user_id, ["name"])
 
 
 @tool("inform_age")
@@ -32,9 +134,7 @@ def inform_age(age: int, config: RunnableConfig) -> str:
         raise ValueError("No User ID configured.")
 
     create_or_update_user(id=user_id, age=age)
-    user = get_user_by_id(id=user_id)
-
-    return user.to_string(index=False)
+    return _result(user_id, ["age"])
 
 
 @tool("inform_objective")
@@ -48,9 +148,7 @@ def inform_goal(description: str, config: RunnableConfig) -> str:
         raise ValueError("No User ID configured.")
 
     create_or_update_user(id=user_id, goal=description)
-    user = get_user_by_id(id=user_id)
-
-    return user.to_string(index=False)
+    return _result(user_id, ["goal"])
 
 
 @tool("inform_ram")
@@ -64,9 +162,7 @@ def inform_ram(capacity: str, config: RunnableConfig) -> str:
         raise ValueError("No User ID configured.")
 
     create_or_update_user(id=user_id, ram=capacity)
-    user = get_user_by_id(id=user_id)
-
-    return user.to_string(index=False)
+    return _result(user_id, ["ram"])
 
 
 @tool("inform_gpu")
@@ -80,9 +176,7 @@ def inform_gpu(needs_gpu: str, config: RunnableConfig) -> str:
         raise ValueError("No User ID configured.")
 
     create_or_update_user(id=user_id, needs_gpu=needs_gpu)
-    user = get_user_by_id(id=user_id)
-
-    return user.to_string(index=False)
+    return _result(user_id, ["needs_gpu"])
 
 
 @tool("get_info")
@@ -97,13 +191,57 @@ def get_info(config: RunnableConfig) -> str:
     if not user_id:
         raise ValueError("No User ID configured.")
 
-    user = get_user_by_id(id=user_id)
+    return _result(user_id, COLUMNS[1:])
+
+
+@_coroutine_of(inform_slots)
+async def ainform_slots(
+    config: RunnableConfig,
+    client_name: str = None,
+    age: int = None,
+    goal: str = None,
+    ram: str = None,
+    has_gpu: str = None,
+) -> str:
+    return await _asave(
+        config, name=client_name, age=age, goal=goal, ram=ram, needs_gpu=has_gpu
+    )
+
+
+@_coroutine_of(inform_name)
+async def ainform_name(client_name: str, config: RunnableConfig) -> str:
+    return await _asave(config, name=client_name)
+
 
-    return user.to_string(index=False)
+@_coroutine_of(inform_age)
+async def ainform_age(age: int, config: RunnableConfig) -> str:
+    return await _asave(config, age=age)
+
+
+@_coroutine_of(inform_goal)
+async def ainform_goal(description: str, config: RunnableConfig) -> str:
+    return await _asave(config, goal=description)
+
+
+@_coroutine_of(inform_ram)
+async def ainform_ram(capacity: str, config: RunnableConfig) -> str:
+    return await _asave(config, ram=capacity)
+
+
+@_coroutine_of(inform_gpu)
+async def ainform_gpu(needs_gpu: str, config: RunnableConfig) -> str:
+    return await _asave(config, needs_gpu=needs_gpu)
+
+
+@_coroutine_of(get_info)
+async def aget_info(config: RunnableConfig) -> str:
+    return await _aresult(_user_id(config), COLUMNS[1:])
 
 
 def load_tools() -> list:
+    # inform_slots comes first: it saves several slots with a single tool round trip.
     return [
+        inform_slots,
         inform_name,
         inform_age,
         inform_goal,
@@ -112,3 +250,150 @@ def load_tools() -> list:
         get_info,
         SlotFilling,
     ]
+
+
+# Slot tools: tool argument -> Clients column it is saved to.
+SLOT_TOOL_COLUMNS = {
+    "inform_slots": SLOT_COLUMNS,
+    "inform_name": {"client_name": "name"},
+    "inform_age": {"age": "age"},
+    "inform_objective": {"description": "goal"},
+    "inform_ram": {"capacity": "ram"},
+    "inform_gpu": {"needs_gpu": "needs_gpu"},
+}
+
+
+class SlotToolNode(ToolNode):
+    """
+    ToolNode that saves every slot tool call of a step with a single database write.
+
+    The slots are saved first, so the other tool calls of the step (e.g. get_info)
+    read them; those then run concurrently on the executor. The ToolMessages are
+    returned in the order of the tool calls.
+    """
+
+    @instrumentation.timed("node", "tools")
+    def _func(self, input, config: RunnableConfig, *, store) -> object:
+        tool_calls, output_type = self._parse_input(input, store)
+        slot_calls, other_calls = self._split(tool_calls)
+        outputs = self._save_slots(slot_calls, config)
+        with get_executor_for_config(config) as executor:
+            futures = {
+                call["id"]: executor.submit(self._run_one, call, call_config)
+                for call, call_config in zip(
+                    other_calls, get_config_list(config, len(other_calls))
+                )
+            }
+            outputs.update({id: future.result() for id, future in futures.items()})
+        return self._combine(tool_calls, outputs, output_type)
+
+    @instrumentation.timed("node", "tools")
+    async def _afunc(self, input, config: RunnableConfig, *, store) -> object:
+        tool_calls, output_type = self._parse_input(input, store)
+        slot_calls, other_calls = self._split(tool_calls)
+        outputs = await self._asave_slots(slot_calls, config)
+        other_outputs = await asyncio.gather(
+            *(self._arun_one(call, config) for call in other_calls)
+        )
+        outputs.update(zip((call["id"] for call in other_calls), other_outputs))
+        return self._combine(tool_calls, outputs, output_type)
+
+    def _run_one(self, call, config: RunnableConfig) -> ToolMessage:
+        with instrumentation.timer("tool", call["name"]):
+            return super()._run_one(call, config)
+
+    async def _arun_one(self, call, config: RunnableConfig) -> ToolMessage:
+        with instrumentation.timer("tool", call["name"]):
+            return await super()._arun_one(call, config)
+
+    @staticmethod
+    def _split(tool_calls: list) -> tuple:
+        slot_calls = [call for call in tool_calls if call["name"] in SLOT_TOOL_COLUMNS]
+        other_calls = [
+            call for call in tool_calls if call["name"] not in SLOT_TOOL_COLUMNS
+        ]
+        return slot_calls, other_calls
+
+    @staticmethod
+    def _combine(tool_calls: list, outputs: dict, output_type: str) -> object:
+        messages = [outputs[call["id"]] for call in tool_calls]
+        return messages if output_type == "list" else {"messages": messages}
+
+    def _error(self, call, error: Exception) -> ToolMessage:
+        """What ToolNode returns for a failing tool call."""
+        if not self.handle_tool_errors:
+            raise error
+        content = TOOL_CALL_ERROR_TEMPLATE.format(error=repr(error))
+        return ToolMessage(content, name=call["name"], tool_call_id=call["id"])
+
+    def _validate_slots(self, tool_calls: list) -> tuple:
+        """
+        Return error outputs, the valid calls with the columns each informs, and the
+        Clients row they inform.
+        """
+        outputs, saved, row = {}, [], {}
+        for call in tool_calls:
+            if invalid_tool_message := self._validate_tool_call(call):
+                outputs[call["id"]] = invalid_tool_message
+                continue
+            try:
+                args = self.tools_by_name[call["name"]].args_schema.model_validate(
+                    call["args"]
+                )
+            except ValidationError as e:
+                outputs[call["id"]] = self._error(call, e)
+                continue
+            columns = []
+            for arg, column in SLOT_TOOL_COLUMNS[call["name"]].items():
+                if (value := getattr(args, arg)) is not None:
+                    row[column] = value
+                    columns.append(column)
+            saved.append((call, columns))
+        return outputs, saved, row
+
+    @staticmethod
+    def _saved_messages(saved: list, profile: Optional[ClientProfile]) -> dict:
+        """One ToolMessage per saved call, with the columns that call informed."""
+        return {
+            call["id"]: ToolMessage(
+                profile_result(profile, columns),
+                name=call["name"],
+                tool_call_id=call["id"],
+            )
+            for call, columns in saved
+        }
+
+    def _failed(self, saved: list, error: Exception) -> dict:
+        return {call["id"]: self._error(call, error) for call, _ in saved}
+
+    @instrumentation.timed("tool", "save_slots")
+    def _save_slots(self, tool_calls: list, config: RunnableConfig) -> dict:
+        """Validate the slot tool calls, then save them all in one transaction."""
+        if not tool_calls:
+            return {}
+
+        user_id = _user_id(config)
+        outputs, saved, row = self._validate_slots(tool_calls)
+        if saved:
+            try:
+                create_or_update_user(id=user_id, **row)
+                outputs.update(self._saved_messages(saved, get_profile(id=user_id)))
+            except Exception as e:
+                outputs.update(self._failed(saved, e))
+        return outputs
+
+    @instrumentation.timed("tool", "save_slots")
+    async def _asave_slots(self, tool_calls: list, config: RunnableConfig) -> dict:
+        if not tool_calls:
+            return {}
+
+        user_id = _user_id(config)
+        outputs, saved, row = self._validate_slots(tool_calls)
+        if saved:
+            try:
+                await acreate_or_update_user(id=user_id, **row)
+                profile = await aget_profile(id=user_id)
+                outputs.update(self._saved_messages(saved, profile))
+            except Exception as e:
+                outputs.update(self._failed(saved, e))
+        return outputs
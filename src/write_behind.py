@@ -0,0 +1,164 @@
+import logging
+import sqlite3
+import threading
+import time
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Another connection holds the lock: the only error that goes away by waiting.
+_BUSY = (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+
+
+def _busy(error: sqlite3.Error) -> bool:
+    # Extended codes such as SQLITE_BUSY_SNAPSHOT keep the primary code in the low byte.
+    return (getattr(error, "sqlite_errorcode", 0) or 0) & 0xFF in _BUSY
+
+
+def merge_rows(old: Optional[tuple], new: tuple) -> tuple:
+    """Combine two partial Clients rows; informed fields of `new` win over `old`."""
+    if old is None:
+        return new
+    return tuple(o if n is None else n for o, n in zip(old, new))
+
+
+class WriteBehindQueue:
+    """
+    Group-commit writer: partial Clients rows are coalesced per user id and a single
+    background thread commits them in one transaction every `interval` seconds.
+
+    A batch that finds the database busy is retried up to `max_retries` times. Any
+    other failure commits the rows one by one, and a row the database rejects is
+    dropped and passed to `on_drop`, so it cannot hold back the writes of every other
+    user.
+    """
+
+    def __init__(
+        self,
+        commit: Callable[[list], object],
+        interval: float = 0.05,
+        on_drop: Optional[Callable[[tuple], object]] = None,
+        max_retries: int = 5,
+    ) -> None:
+        self.commit = commit
+        self.interval = interval
+        self.on_drop = on_drop
+        self.max_retries = max_retries
+        self.batches = 0
+        self.dropped = 0
+        self._pending: dict = {}
+        self._inflight: dict = {}
+        self._flushing = 0
+        self._stopped = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(
+            target=self._run, name="write-behind", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, row: tuple) -> None:
+        """Queue a partial row, merging it with any pending update for the same id."""
+        with self._cond:
+            if not self._stopped:
+                if not self._pending:
+                    self._cond.notify_all()
+                self._pending[row[0]] = merge_rows(self._pending.get(row[0]), row)
+                return
+        # The writer is gone, so fall back to a synchronous write.
+        self.commit([row])
+
+    def overlay(self, id: int) -> Optional[tuple]:
+        """Return the not yet durable update for `id`, if any (read-your-writes)."""
+        with self._cond:
+            inflight = self._inflight.get(id)
+            pending = self._pending.get(id)
+        if pending is None:
+            return inflight
+        return merge_rows(inflight, pending)
+
+    def discard(self, id: int) -> None:
+        """Drop the pending update of `id`, e.g. because the user is being deleted."""
+        with self._cond:
+            self._pending.pop(id, None)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until every update submitted so far has been committed."""
+        with self._cond:
+            self._flushing += 1
+            self._cond.notify_all()
+            try:
+                return self._cond.wait_for(
+                    lambda: not self._pending and not self._inflight, timeout
+                )
+            finally:
+                self._flushing -= 1
+
+    def stop(self) -> None:
+        """Commit what is still pending and stop the writer thread."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self._thread.join()
+        with self._cond:
+            # Only left behind if the writer thread died.
+            lost, self._pending = list(self._pending.values()), {}
+        for row in lost:
+            self._drop(row, "writer stopped")
+
+    def _run(self) -> None:
+        retries = 0
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._stopped)
+                if not self._pending:
+                    return
+                if not (self._stopped or self._flushing):
+                    # Let concurrent sessions pile up updates for the same commit.
+                    self._cond.wait(self.interval)
+                self._inflight, self._pending = self._pending, {}
+                batch = list(self._inflight.values())
+
+            try:
+                self.commit(batch)
+            except sqlite3.Error as e:
+                with self._cond:
+                    retry = _busy(e) and retries < self.max_retries
+                    retry = retry and not self._stopped
+                    if retry:
+                        self._requeue(batch)
+                        self._inflight = {}
+                if retry:
+                    if not retries:
+                        logger.warning("write_behind: %s, retrying", e)
+                    retries += 1
+                    time.sleep(self.interval)
+                    continue
+                logger.warning("write_behind: %s, committing rows one by one", e)
+                self._commit_each(batch)
+            retries = 0
+
+            with self._cond:
+                self._inflight = {}
+                self.batches += 1
+                self._cond.notify_all()
+
+    def _requeue(self, batch: list) -> None:
+        # Called with the lock held.
+        for row in batch:
+            # Updates submitted meanwhile are newer than the failed batch.
+            pending = self._pending.get(row[0])
+            self._pending[row[0]] = row if pending is None else merge_rows(row, pending)
+
+    def _commit_each(self, batch: list) -> None:
+        """Commit the rows of a rejected batch separately and drop the ones that fail."""
+        for row in batch:
+            try:
+                self.commit([row])
+            except sqlite3.Error as e:
+                self._drop(row, e)
+
+    def _drop(self, row: tuple, reason) -> None:
+        logger.error("write_behind: dropping %r: %s", row, reason)
+        self.dropped += 1
+        if self.on_drop is not None:
+            self.on_drop(row)